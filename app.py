@@ -5,165 +5,1011 @@ import streamlit as st
 import firebase_admin
 from firebase_admin import credentials, firestore, auth
 from google.cloud.firestore_v1.base_query import FieldFilter
+from google.cloud.firestore_v1.aggregation import AggregationQuery
+from google.api_core.exceptions import AlreadyExists, DeadlineExceeded, InternalServerError, ResourceExhausted, ServiceUnavailable
+from streamlit.runtime.scriptrunner import get_script_run_ctx, add_script_run_ctx
 import pandas as pd
+import numpy as np
+from typing import NamedTuple
 import time
-import google.generativeai as genai
+import functools
+import itertools
+import threading
+import hashlib
+import hmac
+import os
+import random
+import math
+import json
+import re
+import sqlite3
+from datetime import datetime
+from io import BytesIO, StringIO
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from config import API_KEY
 
 # --- KONFIGURASI DAN INISIALISASI ---
 
 st.set_page_config(page_title="Aplikasi Performance Review PT. Bhinneka Rahsa Nusantara", page_icon="📊", layout="wide")
 
+# --- REGISTRY RESOURCE BERSAMA ---
+# Klien dan objek mahal (Firebase, Gemini, direktori pengguna, snapshot review, ...) dibuat sekali per proses server
+# lewat st.cache_resource, bukan di setiap rerun; registry mencatat kapan dan berapa lama masing-masing dibuat.
+
+@st.cache_resource
+def get_resource_registry():
+    """Waktu pembuatan setiap resource bersama dan durasi script run pertama (cold start) di proses ini, dibaca panel diagnostik."""
+    return {'lock': threading.Lock(), 'resources': {}, 'first_run_seconds': None}
+
+def registered_resource(func):
+    """Mencatat durasi pembuatan resource ke registry; dipasang di bawah @st.cache_resource sehingga hanya berjalan saat cache kosong."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        resource = func(*args, **kwargs)
+        registry = get_resource_registry()
+        with registry['lock']:
+            entry = registry['resources'].setdefault(func.__name__, {'created': 0})
+            entry.update({'created': entry['created'] + 1, 'created_at': datetime.now(), 'seconds': time.perf_counter() - started})
+        return resource
+    return wrapper
+
 # --- INISIALISASI FIREBASE (LOGIKA BARU YANG LEBIH ROBUST) ---
-try:
-    # Coba inisialisasi hanya jika belum ada
-    firebase_admin.get_app()
-except ValueError:
+
+def firebase_app_is_alive():
+    """Health check klien Firestore: app Firebase default masih terdaftar."""
     try:
-        # --- PERBAIKAN UTAMA DI SINI ---
-        # Ambil kredensial dari secrets.toml. Objek ini bersifat read-only.
-        creds_from_secrets = st.secrets["firebase_credentials"]
-        
-        # Buat salinan yang bisa diubah (mutable copy) dalam bentuk dictionary
-        creds_dict = dict(creds_from_secrets)
+        firebase_admin.get_app()
+        return True
+    except ValueError:
+        return False
+
+@st.cache_resource(validate=lambda client: firebase_app_is_alive())
+@registered_resource
+def get_firestore_client():
+    """Menginisialisasi Firebase (sekali per proses) dari [firebase_credentials] di secrets.toml lalu membuat klien Firestore."""
+    if not firebase_app_is_alive():
+        # Ambil kredensial dari secrets.toml. Objek ini bersifat read-only, jadi buat salinan yang bisa diubah
+        creds_dict = dict(st.secrets["firebase_credentials"])
 
         # Perbaiki format private_key di dalam salinan dictionary
         if 'private_key' in creds_dict:
             creds_dict['private_key'] = creds_dict['private_key'].replace('\\n', '\n')
 
-        # Inisialisasi Firebase menggunakan dictionary yang sudah diperbaiki
-        cred = credentials.Certificate(creds_dict)
-        firebase_admin.initialize_app(cred)
+        firebase_admin.initialize_app(credentials.Certificate(creds_dict))
+    return firestore.client()
 
-    except Exception as e:
-        st.error("Gagal menginisialisasi Firebase. Pastikan `[firebase_credentials]` ada dan formatnya benar di secrets.toml Anda.")
-        st.error(f"Detail Error: {e}")
-        st.stop()
+try:
+    firestore_client = get_firestore_client()
+except Exception as e:
+    st.error("Gagal menginisialisasi Firebase. Pastikan `[firebase_credentials]` ada dan formatnya benar di secrets.toml Anda.")
+    st.error(f"Detail Error: {e}")
+    st.stop()
 
 
 # --- PERUBAHAN: Konfigurasi Gemini API dari config.py ---
-generation_model = None
-embedding_model = None # Disiapkan sesuai permintaan
-
-if not API_KEY or API_KEY == "MASUKKAN_API_KEY_ANDA_DI_SINI":
-    st.warning("API Key Gemini belum diatur di config.py. Fitur rangkuman AI tidak akan tersedia.", icon="⚠️")
-else:
+GEMINI_MODEL_NAME = 'gemini-2.5-flash'
+# Batas panggilan Gemini per menit untuk seluruh proses (halaman hasil maupun job rangkuman massal)
+GEMINI_RATE_PER_MINUTE = 60
+
+def ai_summary_available():
+    """API Key Gemini sudah diatur di config.py (tanpa mengimpor library Gemini)."""
+    return bool(API_KEY) and API_KEY != "MASUKKAN_API_KEY_ANDA_DI_SINI"
+
+@st.cache_resource
+@registered_resource
+def get_generation_model():
+    """Model Gemini untuk rangkuman; google.generativeai baru diimpor dan dikonfigurasi saat rangkuman pertama diminta."""
+    import google.generativeai as genai
+    genai.configure(api_key=API_KEY)
+    return genai.GenerativeModel(GEMINI_MODEL_NAME)
+
+def load_generation_model():
+    """Mengembalikan model Gemini, atau None (dengan pesan error) jika API Key belum diatur atau konfigurasi gagal."""
+    if not ai_summary_available():
+        return None
     try:
-        genai.configure(api_key=API_KEY)
-        generation_model = genai.GenerativeModel('gemini-2.5-flash')
-        embedding_model = genai.GenerativeModel('models/embedding-001') # Tidak digunakan, tapi didefinisikan
+        return get_generation_model()
     except Exception as e:
         st.error(f"Gagal mengkonfigurasi Gemini API: {e}")
-        st.stop()
+        return None
+
+if not ai_summary_available():
+    st.warning("API Key Gemini belum diatur di config.py. Fitur rangkuman AI tidak akan tersedia.", icon="⚠️")
+
+# --- INSTRUMENTASI FIRESTORE ---
+# Setiap script run punya satu FirestoreStats di session_state; klien 'db' di bawah dibungkus agar setiap
+# pembacaan dokumen, penulisan, dan round trip tercatat ke statistik run yang sedang berjalan.
+
+# Batas opsional per halaman; run yang melebihinya ditandai dan diperingatkan ke admin
+PAGE_BUDGETS = {
+    "🔐 Login": {'reads': 5, 'seconds': 2.0},
+    "📝 Beri Review": {'reads': 100, 'seconds': 3.0},
+    "📊 Lihat Hasil Saya": {'reads': 50, 'seconds': 3.0},
+    "⭐ Beri Ulasan Aplikasi": {'reads': 10, 'seconds': 2.0},
+}
+# Jumlah run terakhir (semua sesi) yang disimpan untuk panel diagnostik
+RUN_HISTORY_LIMIT = 500
+
+class FirestoreStats:
+    """
+    Penghitung dokumen dibaca/ditulis, round trip, dan waktu per helper untuk satu script run (atau satu rerun fragment).
+    Setelah finish() statistik bersifat read-only, sehingga riwayat yang sudah tercatat tidak berubah lagi.
+    """
 
-db = firestore.client()
+    def __init__(self, page=None, kind='run', before_run=False):
+        self._lock = threading.Lock()
+        self.page = page
+        self.kind = kind # 'run' (script run penuh) atau 'fragment' (rerun fragment saja)
+        self.before_run = before_run # True: menampung operasi callback widget sampai run berikutnya mengambil alih
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self.duration = None
+        self.reads = 0
+        self.writes = 0
+        self.round_trips = 0
+        self.firestore_seconds = 0.0
+        self.operations = {} # nama operasi -> {'calls', 'reads', 'writes', 'seconds'}
+        self.helpers = {}    # nama helper -> {'calls', 'reads', 'seconds'}
+        self._thread_reads = {} # ident thread -> dokumen dibaca, agar helper yang berjalan bersamaan tidak saling terhitung
+
+    def record(self, operation, reads=0, writes=0, seconds=0.0, round_trips=1):
+        with self._lock:
+            if self.duration is not None:
+                return
+            self.reads += reads
+            self.writes += writes
+            self.round_trips += round_trips
+            self.firestore_seconds += seconds
+            thread_id = threading.get_ident()
+            self._thread_reads[thread_id] = self._thread_reads.get(thread_id, 0) + reads
+            entry = self.operations.setdefault(operation, {'calls': 0, 'reads': 0, 'writes': 0, 'seconds': 0.0})
+            entry['calls'] += 1
+            entry['reads'] += reads
+            entry['writes'] += writes
+            entry['seconds'] += seconds
+
+    def thread_reads(self):
+        """Dokumen yang dibaca oleh thread pemanggil selama run ini."""
+        with self._lock:
+            return self._thread_reads.get(threading.get_ident(), 0)
+
+    def record_helper(self, name, seconds, reads):
+        with self._lock:
+            if self.duration is not None:
+                return
+            entry = self.helpers.setdefault(name, {'calls': 0, 'reads': 0, 'seconds': 0.0})
+            entry['calls'] += 1
+            entry['reads'] += reads
+            entry['seconds'] += seconds
+
+    def finish(self):
+        with self._lock:
+            self.duration = time.perf_counter() - self._started
+
+    def over_budget(self):
+        """Daftar batas halaman yang terlampaui pada run ini (kosong jika tidak ada batas atau semuanya terpenuhi)."""
+        budget = PAGE_BUDGETS.get(self.page, {})
+        exceeded = []
+        if 'reads' in budget and self.reads > budget['reads']:
+            exceeded.append(f"{self.reads} dokumen dibaca (batas {budget['reads']})")
+        if 'seconds' in budget and self.duration is not None and self.duration > budget['seconds']:
+            exceeded.append(f"{self.duration:.2f} detik (batas {budget['seconds']:.1f})")
+        return exceeded
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'page': self.page, 'kind': self.kind, 'started_at': self.started_at.isoformat(timespec='seconds'),
+                'duration': self.duration, 'reads': self.reads, 'writes': self.writes,
+                'round_trips': self.round_trips, 'firestore_seconds': self.firestore_seconds,
+                'over_budget': self.over_budget(),
+                'operations': {name: dict(entry) for name, entry in self.operations.items()},
+                'helpers': {name: dict(entry) for name, entry in self.helpers.items()},
+            }
+
+@st.cache_resource
+def get_run_history():
+    """Riwayat FirestoreStats run terakhir dari semua sesi, dibagi dalam satu proses server."""
+    return {'lock': threading.Lock(), 'runs': deque(maxlen=RUN_HISTORY_LIMIT)}
+
+def current_firestore_stats():
+    """FirestoreStats milik script run yang sedang berjalan, None di luar script run (mis. thread listener)."""
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return None
+    stats = st.session_state.get('firestore_run_stats')
+    if stats is not None and stats.duration is not None:
+        # Run sebelumnya sudah selesai. Yang masih mencatat adalah callback widget (on_click/on_change), yang berjalan
+        # sebelum badan script run berikutnya; operasinya ditampung dulu lalu diambil alih run tersebut oleh start_run_stats
+        with get_run_history()['lock']:
+            stats = st.session_state.firestore_run_stats
+            if stats.duration is not None:
+                stats = st.session_state.firestore_run_stats = FirestoreStats(before_run=True)
+    return stats
+
+def start_run_stats(page=None, kind='run'):
+    """
+    Dipanggil di awal setiap script run (dan rerun fragment): run sebelumnya yang berhenti lebih awal (st.rerun/st.stop)
+    ikut dicatat, sedangkan operasi callback widget yang mendahului run ini dihitung sebagai bagian dari run ini.
+    """
+    previous = st.session_state.get('firestore_run_stats')
+    if previous is not None and previous.duration is None:
+        if previous.before_run:
+            previous.page, previous.kind, previous.before_run = page, kind, False
+            return previous
+        finish_run_stats(previous)
+    stats = st.session_state.firestore_run_stats = FirestoreStats(page, kind)
+    return stats
+
+def finish_run_stats(stats):
+    stats.finish()
+    registry = get_resource_registry()
+    with registry['lock']:
+        if registry['first_run_seconds'] is None:
+            registry['first_run_seconds'] = stats.duration
+    history = get_run_history()
+    with history['lock']:
+        history['runs'].append(stats)
+    return stats.over_budget()
+
+def warn_over_budget(exceeded_budgets):
+    """Peringatan batas halaman, hanya untuk admin."""
+    if exceeded_budgets and (st.session_state.user_info or {}).get('username') == 'Data Rahsa':
+        st.warning(f"Halaman ini melewati batas: {', '.join(exceeded_budgets)}.", icon="⏱️")
+
+def fragment_run_stats(page):
+    """
+    Dekorator untuk fungsi @st.fragment: rerun fragment saja tidak menjalankan badan script (start/finish_run_stats),
+    jadi setiap rerun fragment dicatat sebagai run tersendiri, lengkap dengan durasi dan pemeriksaan batas halaman.
+    Saat fragment dijalankan sebagai bagian dari script run penuh, statistik run tersebut yang dipakai.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            ctx = get_script_run_ctx(suppress_warning=True)
+            if ctx is None or not ctx.fragment_ids_this_run:
+                return func(*args, **kwargs)
+            stats = start_run_stats(page, kind='fragment')
+            try:
+                return func(*args, **kwargs)
+            finally:
+                warn_over_budget(finish_run_stats(stats))
+        return wrapper
+    return decorator
+
+def timed_helper(func):
+    """Mencatat waktu dan jumlah dokumen yang dibaca helper ke statistik script run yang sedang berjalan."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stats = current_firestore_stats()
+        reads_before = stats.thread_reads() if stats else 0
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if stats:
+                stats.record_helper(func.__name__, time.perf_counter() - started, stats.thread_reads() - reads_before)
+    return wrapper
+
+def _unwrap(value):
+    """Mengembalikan objek Firestore asli dari proxy (juga di dalam list/tuple) sebelum diteruskan ke library."""
+    if isinstance(value, InstrumentedFirestore):
+        return value._target
+    if isinstance(value, (list, tuple)):
+        return type(value)(_unwrap(item) for item in value)
+    return value
+
+class InstrumentedFirestore:
+    """
+    Proxy tipis atas klien Firestore dan objek turunannya (collection, document, query, batch, transaction).
+    Semua atribut diteruskan; pemanggilan yang menyentuh jaringan dicatat ke FirestoreStats run yang aktif.
+    """
+    # Method yang hasilnya perlu dibungkus lagi agar pemanggilan lanjutannya ikut tercatat
+    _WRAPPED_TYPES = (
+        firestore.Client, firestore.CollectionReference, firestore.DocumentReference,
+        firestore.Query, firestore.WriteBatch, firestore.Transaction, AggregationQuery,
+    )
+
+    def __init__(self, target):
+        object.__setattr__(self, '_target', target)
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if not callable(value):
+            return value
+        kind = type(self._target).__name__
+        def call(*args, **kwargs):
+            args = _unwrap(args)
+            kwargs = {key: _unwrap(item) for key, item in kwargs.items()}
+            return self._dispatch(kind, name, value, args, kwargs)
+        return call
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+    def _dispatch(self, kind, name, method, args, kwargs):
+        operation = f"{kind}.{name}"
+        # Iterator hasil query / get_all: dokumen dihitung saat dikonsumsi
+        if name in ('stream', 'get_all', 'list_documents') or (name == 'get' and kind in ('Query', 'CollectionReference', 'Transaction')):
+            return self._counted(operation, method, args, kwargs, minimum_reads=0 if name in ('get_all', 'list_documents') else 1, as_list=(name == 'get' and kind != 'Transaction'))
+        if name == 'on_snapshot':
+            return method(*args, **kwargs)
+        started = time.perf_counter()
+        result = method(*args, **kwargs)
+        seconds = time.perf_counter() - started
+        stats = current_firestore_stats()
+        if stats:
+            if kind == 'DocumentReference' and name == 'get':
+                stats.record(operation, reads=1, seconds=seconds)
+            elif kind == 'DocumentReference' and name in ('set', 'update', 'create', 'delete'):
+                stats.record(operation, writes=1, seconds=seconds)
+            elif kind == 'AggregationQuery' and name == 'get':
+                # Agregasi count() ditagih 1 read per 1000 entri indeks, minimal 1
+                counted = sum(item.value for items in result for item in items)
+                stats.record(operation, reads=max(1, -(-counted // 1000)), seconds=seconds)
+            elif kind == 'WriteBatch' and name == 'commit':
+                stats.record(operation, writes=len(result or []), seconds=seconds)
+            elif kind == 'Transaction' and name in ('set', 'update', 'create', 'delete'):
+                stats.record(operation, writes=1, round_trips=0)
+            elif kind == 'Transaction' and name in ('_begin', '_commit', '_rollback'):
+                stats.record(operation, seconds=seconds)
+        return InstrumentedFirestore(result) if isinstance(result, self._WRAPPED_TYPES) else result
+
+    def _counted(self, operation, method, args, kwargs, minimum_reads, as_list):
+        def generate():
+            stats = current_firestore_stats()
+            iterator = iter(method(*args, **kwargs))
+            seconds, count = 0.0, 0
+            try:
+                while True:
+                    started = time.perf_counter()
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        break
+                    finally:
+                        seconds += time.perf_counter() - started
+                    count += 1
+                    yield InstrumentedFirestore(item) if isinstance(item, self._WRAPPED_TYPES) else item
+            finally:
+                if stats:
+                    stats.record(operation, reads=max(count, minimum_reads), seconds=seconds)
+        return list(generate()) if as_list else generate()
+
+db = InstrumentedFirestore(firestore_client)
 
 if 'user_info' not in st.session_state:
     st.session_state.user_info = None
 if 'gemini_summary' not in st.session_state:
     st.session_state.gemini_summary = None
+if 'gemini_summary_key' not in st.session_state:
+    st.session_state.gemini_summary_key = None
 # --- TAMBAHKAN BARIS DI BAWAH INI ---
 if 'download_df' not in st.session_state:
     st.session_state.download_df = None
+if 'user_lookup_cache' not in st.session_state:
+    st.session_state.user_lookup_cache = {}
+if 'completion_pages' not in st.session_state:
+    st.session_state.completion_pages = {}
+if 'reviewer_context' not in st.session_state:
+    st.session_state.reviewer_context = None
+start_run_stats()
+
+# Field yang cukup untuk menampilkan daftar reviewee (proyeksi untuk db.get_all)
+REVIEWEE_FIELDS = ['nama', 'tipe_karyawan']
+# Jumlah baris rincian status pengerjaan yang diambil per halaman
+COMPLETION_PAGE_SIZE = 200
+# Siklus penilaian aktif (periode 1 Juli - 31 Desember 2025), disimpan di setiap review
+REVIEW_CYCLE_ID = "2025-H2"
+# Batas operasi per batched write Firestore dan per panggilan auth.import_users
+FIRESTORE_BATCH_LIMIT = 500
+AUTH_IMPORT_LIMIT = 1000
+# Kolom file impor karyawan -> field data registrasi (sama dengan formulir registrasi)
+EMPLOYEE_IMPORT_COLUMNS = {
+    'office': {'Employee ID': 'employee_id', 'Nama': 'nama', 'Organization': 'organization', 'Job Position': 'job_position', 'Job Level': 'job_level', 'Unique Code': 'password'},
+    'operator': {'Employee ID': 'employee_id', 'Nama': 'nama', 'Job Position': 'job_position', 'Unique Code': 'password'},
+}
 
 # --- FUNGSI-FUNGSI BANTUAN ---
 
+def normalize_username(username):
+    """ID dokumen indeks 'usernames': spasi dirapikan, huruf kecil, tanpa '/'."""
+    return " ".join(username.split()).lower().replace('/', '_')
+
+def dummy_email_for(username):
+    return f"{username.lower().replace(' ', '_')}@performance.review"
+
+def build_user_document(employee_type, data, uid, email):
+    """Isi dokumen 'users' untuk karyawan baru (dipakai registrasi satuan maupun impor massal)."""
+    firestore_data = { 
+        'uid': uid, 'employee_id': data['employee_id'], 'nama': data['nama'], 
+        'username': data['username'], 'email': email, 'job_position': data['job_position'], 
+        'tipe_karyawan': employee_type, 'app_feedback_submitted': False # Untuk fitur feedback
+    }
+    if employee_type == 'office':
+        firestore_data['organization'] = data['organization']
+        firestore_data['job_level'] = data['job_level']
+    return firestore_data
+
+def username_index_entry(firestore_data):
+    return {
+        'uid': firestore_data['uid'], 'username': firestore_data['username'],
+        'nama': firestore_data['nama'], 'email': firestore_data['email']
+    }
+
+@timed_helper
+def find_username_entry(username):
+    """
+    Entri indeks 'usernames' untuk username (pencocokan tanpa membedakan huruf besar/kecil & spasi berlebih), atau None.
+    Akun lama yang belum punya entri indeks dicari dengan query persis di 'users' seperti sebelumnya,
+    lalu entrinya ditulis saat itu juga sehingga login berikutnya cukup satu point get.
+    """
+    username_ref = db.collection('usernames').document(normalize_username(username))
+    username_doc = username_ref.get()
+    if username_doc.exists:
+        return username_doc.to_dict()
+    user_docs = list(db.collection('users').where(filter=FieldFilter('username', '==', username)).limit(1).stream())
+    if not user_docs:
+        return None
+    entry = username_index_entry(user_docs[0].to_dict())
+    try:
+        username_ref.create(entry)
+    except AlreadyExists:
+        pass # Entri baru saja ditulis sesi lain
+    return entry
+
+@firestore.transactional
+def register_user_transaction(transaction, username_ref, user_ref, firestore_data):
+    """Menulis indeks username dan dokumen user secara atomik; False jika username sudah dipakai."""
+    if username_ref.get(transaction=transaction).exists:
+        return False
+    transaction.set(username_ref, username_index_entry(firestore_data))
+    transaction.set(user_ref, firestore_data)
+    return True
+
+@timed_helper
 def register_user(employee_type, data):
     """Mendaftarkan pengguna baru ke Auth dan Firestore."""
     username = data['username']
     password = data['password']
     
-    users_ref = db.collection('users').where(filter=FieldFilter('username', '==', username)).limit(1).stream()
-    if len(list(users_ref)) > 0:
+    username_ref = db.collection('usernames').document(normalize_username(username))
+    if find_username_entry(username):
         st.error(f"Username '{username}' sudah digunakan.")
         return False
         
+    user = None
     try:
-        dummy_email = f"{username.lower().replace(' ', '_')}@performance.review"
+        dummy_email = dummy_email_for(username)
         user = auth.create_user(email=dummy_email, password=password, display_name=data['nama'])
+        firestore_data = build_user_document(employee_type, data, user.uid, dummy_email)
 
-        firestore_data = { 
-            'uid': user.uid, 'employee_id': data['employee_id'], 'nama': data['nama'], 
-            'username': username, 'email': dummy_email, 'job_position': data['job_position'], 
-            'tipe_karyawan': employee_type, 'app_feedback_submitted': False # Untuk fitur feedback
-        }
-        
-        if employee_type == 'office':
-            firestore_data['organization'] = data['organization']
-            firestore_data['job_level'] = data['job_level']
-
-        db.collection('users').document(user.uid).set(firestore_data)
+        # Indeks username & dokumen user ditulis dalam satu transaksi agar username tidak bisa ganda
+        if not register_user_transaction(db.transaction(), username_ref, db.collection('users').document(user.uid), firestore_data):
+            st.error(f"Username '{username}' sudah digunakan.")
+            auth.delete_user(user.uid)
+            return False
         st.success(f"Registrasi untuk '{username}' berhasil!")
         return True
 
     except Exception as e:
         st.error(f"Registrasi gagal: {e}")
-        try: auth.delete_user(user.uid)
-        except Exception: pass
+        if user:
+            try: auth.delete_user(user.uid)
+            except Exception: pass
         return False
 
+# --- IMPOR KARYAWAN MASSAL ---
+
+def import_uid_for(username):
+    """UID deterministik untuk karyawan hasil impor, sehingga impor bisa diulang setelah gagal sebagian."""
+    return "imp_" + hashlib.sha1(normalize_username(username).encode('utf-8')).hexdigest()[:24]
+
+def read_spreadsheet(uploaded_file):
+    """Membaca file CSV/XLSX yang diunggah sebagai DataFrame teks (tanpa spasi di tepi)."""
+    if uploaded_file.name.lower().endswith('.csv'):
+        df = pd.read_csv(uploaded_file, dtype=str)
+    else:
+        df = pd.read_excel(uploaded_file, dtype=str)
+    df.columns = [str(col).strip() for col in df.columns]
+    return df.fillna('').apply(lambda col: col.str.strip())
+
+def validate_employee_rows(df, employee_type):
+    """
+    Memvalidasi baris impor; mengembalikan (DataFrame baris valid dengan kolom field registrasi,
+    daftar laporan untuk baris yang ditolak). Melempar ValueError jika kolom wajib tidak ada.
+    """
+    columns = EMPLOYEE_IMPORT_COLUMNS[employee_type]
+    missing_columns = [col for col in columns if col not in df.columns]
+    if missing_columns:
+        raise ValueError(f"Kolom wajib tidak ditemukan: {', '.join(missing_columns)}")
+
+    rows = df[list(columns)].rename(columns=columns)
+    if rows.empty:
+        return rows, []
+    rows['username'] = rows['nama']
+    rows['row_number'] = df.index + 2 # Nomor baris di spreadsheet (baris 1 = header)
+    rows['username_key'] = rows['username'].map(normalize_username)
+
+    # Laporan memakai label kolom spreadsheet yang diunggah admin, bukan nama field internal
+    empty_fields = rows[list(columns.values())].eq('').rename(columns={field: label for label, field in columns.items()})
+    problems = pd.Series('', index=rows.index)
+    problems[empty_fields.any(axis=1)] = "Kolom wajib kosong: " + empty_fields.apply(lambda r: ', '.join(r.index[r]), axis=1)
+    duplicated = rows['username_key'].duplicated(keep=False) & problems.eq('')
+    problems[duplicated] = "Nama/username ganda di dalam file"
+
+    rejected = [
+        {'Baris': row.row_number, 'Username': row.username, 'Status': "❌ Ditolak", 'Keterangan': problems[idx]}
+        for idx, row in rows[problems.ne('')].iterrows()
+    ]
+    return rows[problems.eq('')], rejected
+
+@timed_helper
+def import_employees(rows, employee_type, on_progress=None):
+    """
+    Mengimpor karyawan tervalidasi: akun Auth dibuat lewat auth.import_users (maks. 1000 per panggilan),
+    dokumen 'users' + indeks 'usernames' ditulis dalam batched write. Mengembalikan laporan per baris.
+    Aman diulang: baris yang sudah pernah diimpor dilewati, akun Auth yang sudah ada dipakai ulang.
+    """
+    report = {}
+    pending = []
+
+    # 1. Cek indeks username yang sudah ada dengan db.get_all (tanpa query per baris)
+    index_refs = [db.collection('usernames').document(key) for key in rows['username_key']]
+    existing_index = {}
+    for start in range(0, len(index_refs), FIRESTORE_BATCH_LIMIT):
+        for doc in db.get_all(index_refs[start:start + FIRESTORE_BATCH_LIMIT], field_paths=['uid']):
+            if doc.exists:
+                existing_index[doc.id] = doc.to_dict().get('uid')
+
+    for row in rows.itertuples():
+        uid = import_uid_for(row.username)
+        if row.username_key in existing_index:
+            same_uid = existing_index[row.username_key] == uid
+            report[row.row_number] = (row.username, "♻️ Sudah Diimpor" if same_uid else "⏭️ Dilewati", "" if same_uid else "Username sudah digunakan")
+        else:
+            pending.append((row, uid))
+
+    # 2. Buat akun Auth secara massal; password di-hash HMAC-SHA256 dengan kunci acak per impor
+    hash_key = os.urandom(32)
+    auth_ok = []
+    for start in range(0, len(pending), AUTH_IMPORT_LIMIT):
+        chunk = pending[start:start + AUTH_IMPORT_LIMIT]
+        records = [
+            auth.ImportUserRecord(
+                uid=uid, email=dummy_email_for(row.username), display_name=row.nama,
+                password_hash=hmac.new(hash_key, row.password.encode('utf-8'), hashlib.sha256).digest()
+            )
+            for row, uid in chunk
+        ]
+        try:
+            result = auth.import_users(records, hash_alg=auth.UserImportHash.hmac_sha256(key=hash_key))
+            errors = {error.index: error.reason for error in result.errors}
+        except Exception as e:
+            errors = {i: str(e) for i in range(len(chunk))}
+        for i, (row, uid) in enumerate(chunk):
+            reason = errors.get(i)
+            # UID deterministik yang sudah ada berarti akun dibuat pada impor sebelumnya yang gagal sebagian
+            if reason is None or ('already exists' in reason.lower() and 'uid' in reason.lower()):
+                auth_ok.append((row, uid))
+            else:
+                report[row.row_number] = (row.username, "❌ Gagal", f"Auth: {reason}")
+        if on_progress:
+            on_progress(min(start + AUTH_IMPORT_LIMIT, len(pending)), len(pending) * 2)
+
+    # 3. Tulis dokumen 'users' dan indeks 'usernames' (2 operasi per karyawan) dalam batched write.
+    # Indeks ditulis dengan create, sehingga username yang didaftarkan orang lain setelah pengecekan di atas
+    # membatalkan batch alih-alih menimpa indeksnya; batch itu lalu diulang per karyawan untuk memisahkan konflik.
+    def write_employees(chunk):
+        batch = db.batch()
+        for row, uid in chunk:
+            firestore_data = build_user_document(employee_type, row._asdict(), uid, dummy_email_for(row.username))
+            batch.set(db.collection('users').document(uid), firestore_data)
+            batch.create(db.collection('usernames').document(row.username_key), username_index_entry(firestore_data))
+        batch.commit()
+        for row, uid in chunk:
+            report[row.row_number] = (row.username, "✅ Berhasil", "")
+
+    def resolve_username_conflict(row, uid):
+        # Indeks milik UID yang sama berarti impor sebelumnya sudah menulis karyawan ini; akun Auth tetap dipakai
+        try:
+            index_doc = db.collection('usernames').document(row.username_key).get()
+        except Exception as e:
+            return (row.username, "❌ Gagal", f"Firestore: {e}")
+        if index_doc.exists and index_doc.to_dict().get('uid') == uid:
+            return (row.username, "♻️ Sudah Diimpor", "")
+        # Username dipakai akun lain: akun Auth hasil impor ini tidak punya indeks, jadi dihapus agar tidak yatim
+        try:
+            auth.delete_user(uid)
+        except Exception as e:
+            return (row.username, "⏭️ Dilewati", f"Username sudah digunakan; akun Auth {uid} gagal dihapus: {e}")
+        return (row.username, "⏭️ Dilewati", "Username sudah digunakan")
+
+    # Baris yang gagal di tahap Auth dihitung selesai agar progres tetap mencapai 100%
+    auth_failed = len(pending) - len(auth_ok)
+    rows_per_batch = FIRESTORE_BATCH_LIMIT // 2
+    for start in range(0, len(auth_ok), rows_per_batch):
+        chunk = auth_ok[start:start + rows_per_batch]
+        try:
+            write_employees(chunk)
+        except AlreadyExists:
+            for row, uid in chunk:
+                try:
+                    write_employees([(row, uid)])
+                except AlreadyExists:
+                    report[row.row_number] = resolve_username_conflict(row, uid)
+                except Exception as e:
+                    report[row.row_number] = (row.username, "❌ Gagal", f"Firestore: {e}")
+        except Exception as e:
+            for row, uid in chunk:
+                report[row.row_number] = (row.username, "❌ Gagal", f"Firestore: {e}")
+        if on_progress:
+            on_progress(len(pending) + auth_failed + min(start + rows_per_batch, len(auth_ok)), len(pending) * 2)
+
+    return [
+        {'Baris': row_number, 'Username': username, 'Status': status, 'Keterangan': detail}
+        for row_number, (username, status, detail) in sorted(report.items())
+    ]
+
+@timed_helper
 def get_user_details(uid):
     try:
         user_doc = db.collection('users').document(uid).get()
         return user_doc.to_dict() if user_doc.exists else None
     except Exception as e: return None
 
-def get_assigned_reviewees(reviewer_uid):
+@timed_helper
+def get_users_by_uids(uids):
+    """Mengambil nama & tipe beberapa pengguna dalam satu panggilan db.get_all, di-memo per sesi."""
+    cache = st.session_state.user_lookup_cache
+    directory = get_user_directory()
+    if directory.is_ready():
+        # Direktori sudah hangat: tidak perlu round trip sama sekali
+        cache.update({uid: directory.users[uid] for uid in uids if uid in directory.users})
+    missing = [uid for uid in dict.fromkeys(uids) if uid not in cache]
+    if missing:
+        refs = [db.collection('users').document(uid) for uid in missing]
+        for doc in db.get_all(refs, field_paths=REVIEWEE_FIELDS):
+            cache[doc.id] = doc.to_dict() if doc.exists else None
+    return {uid: cache[uid] for uid in uids if cache.get(uid)}
+
+@timed_helper
+def get_assigned_reviewees(reviewer_uid, raise_errors=False):
+    """Reviewee yang ditugaskan ke reviewer ({uid: nama}); dengan `raise_errors=True` error diteruskan alih-alih menjadi daftar kosong."""
     try:
         assignments_ref = db.collection('review_assignments').where(filter=FieldFilter('reviewer_uid', '==', reviewer_uid)).stream()
         reviewee_ids = [doc.to_dict()['reviewee_uid'] for doc in assignments_ref]
-        reviewee_details = {uid: get_user_details(uid).get('nama', f"UID: {uid}") for uid in reviewee_ids if get_user_details(uid)}
-        return reviewee_details
-    except Exception as e: return {}
+        reviewee_details = get_users_by_uids(reviewee_ids)
+        return {uid: details.get('nama', f"UID: {uid}") for uid, details in reviewee_details.items()}
+    except Exception as e:
+        if raise_errors:
+            raise
+        return {}
 
-def get_reviewed_uids(reviewer_uid):
-    """Mengambil set UID dari reviewee yang sudah direview oleh reviewer."""
+@timed_helper
+def get_reviewed_uids(reviewer_uid, reviewee_uids, raise_errors=False):
+    """Mengambil set UID reviewee yang sudah direview reviewer di siklus berjalan: satu db.get_all ke ID review deterministiknya."""
     try:
-        reviews_ref = db.collection('reviews').where(filter=FieldFilter('reviewer_uid', '==', reviewer_uid)).stream()
-        return {doc.to_dict().get('reviewee_uid') for doc in reviews_ref}
+        if not reviewee_uids:
+            return set()
+        refs = {review_id_for(REVIEW_CYCLE_ID, reviewer_uid, uid): uid for uid in reviewee_uids}
+        docs = db.get_all([db.collection('reviews').document(review_id) for review_id in refs], field_paths=['reviewee_uid'])
+        return {refs[doc.id] for doc in docs if doc.exists}
     except Exception as e:
+        if raise_errors:
+            raise
         st.error(f"Gagal memuat data review: {e}")
         return set()
 
-def get_review_questions(employee_type):
+@timed_helper
+def load_reviewer_context(reviewer_uid):
+    """
+    Memuat semua yang dibutuhkan halaman "Beri Review" sekaligus: reviewee yang belum dinilai, tipenya, dan pertanyaannya.
+    Mengembalikan None jika ada pembacaan yang gagal, agar error sementara tidak tampil sebagai "semua review selesai".
+    """
     try:
-        doc = db.collection('review_questions').document(employee_type).get()
-        return doc.to_dict().get('questions', []) if doc.exists else []
-    except Exception as e: return []
+        all_assigned_reviewees = get_assigned_reviewees(reviewer_uid, raise_errors=True)
+        reviewed_uids = get_reviewed_uids(reviewer_uid, list(all_assigned_reviewees), raise_errors=True)
+        pending = {uid: name for uid, name in all_assigned_reviewees.items() if uid not in reviewed_uids}
+        details = get_users_by_uids(list(pending))
+    except Exception as e:
+        st.error(f"Gagal memuat daftar karyawan yang perlu dinilai: {e}")
+        return None
+    types = {uid: (details.get(uid) or {}).get('tipe_karyawan') for uid in pending}
+    questions = {employee_type: get_compiled_questions(employee_type) for employee_type in set(types.values()) if employee_type}
+    return {'reviewer_uid': reviewer_uid, 'pending': pending, 'types': types, 'questions': questions}
+
+def get_reviewer_context(reviewer_uid):
+    """
+    Konteks reviewer di-memo per sesi; interaksi form tidak memicu pembacaan Firestore sampai review berikutnya terkirim.
+    Konteks yang gagal dimuat (None) tidak di-memo, sehingga rerun berikutnya mencoba lagi.
+    """
+    context = st.session_state.reviewer_context
+    if context is None or context['reviewer_uid'] != reviewer_uid:
+        context = load_reviewer_context(reviewer_uid)
+        if context is not None:
+            st.session_state.reviewer_context = context
+    return context
+
+class Question(NamedTuple):
+    """Satu pertanyaan review yang sudah di-parse dari string mentahnya."""
+    key: str          # Key di 'responses' review: ID pendek (q1, q2, ...) atau string mentah untuk skema lama
+    text: str         # Teks utama (office: Bahasa Inggris)
+    subtitle: str     # Terjemahan Bahasa Indonesia (office), kosong untuk operator
+    options: tuple    # Pilihan jawaban untuk skor 1..n (operator), kosong untuk office
+    max_score: int
+
+    def label_html(self):
+        """Label pertanyaan untuk tampilan (office bilingual, operator tanpa pilihan jawaban)."""
+        return f"**{self.text}**<br><small>{self.subtitle}</small>" if self.subtitle else f"**{self.text}**"
+
+    def answer_for(self, score):
+        """Teks pilihan jawaban untuk skor tertentu (operator), None jika tidak ada."""
+        index = int(score) - 1
+        return self.options[index] if 0 <= index < len(self.options) else None
+
+def compile_question(raw, employee_type, key=None):
+    """Mem-parse string pertanyaan sekali: office 'EN | ID' (skala 1-5), operator 'Pertanyaan;Pilihan 1;Pilihan 2;Pilihan 3'."""
+    key = key or raw
+    if employee_type == 'operator' and ';' in raw:
+        parts = [p.strip() for p in raw.split(';')]
+        options = tuple(parts[1:4])
+        return Question(key, parts[0], '', options, len(options))
+    parts = raw.split('|') if '|' in raw else [raw, '']
+    return Question(key, parts[0].strip(), parts[1].strip(), (), 5)
+
+# Baris editor pertanyaan berawalan ID, mis. "[q3] Teks pertanyaan"
+QUESTION_LINE_PATTERN = re.compile(r'^\[(\w+)\]\s*(.*)$')
+
+def next_question_id(catalog):
+    """ID pertanyaan berikutnya (q1, q2, ...) yang belum pernah dipakai di katalog."""
+    numbers = [int(key[1:]) for key in catalog if key[1:].isdigit()]
+    return f"q{max(numbers, default=0) + 1}"
+
+def assign_question_ids(lines, catalog):
+    """
+    Memberi ID stabil untuk setiap baris editor pertanyaan. Baris berawalan [ID] yang dikenal tetap memakai ID itu
+    walau teksnya diubah; baris lain memakai ID dari teks yang sama di katalog, atau ID baru.
+    Mengembalikan (questions, question_ids, catalog); ID pertanyaan yang dihapus tetap tersimpan di katalog.
+    """
+    catalog = dict(catalog)
+    questions, question_ids = [], []
+    for line in lines:
+        match = QUESTION_LINE_PATTERN.match(line)
+        question_id, text = (match.group(1), match.group(2).strip()) if match else (None, line)
+        if question_id not in catalog or question_id in question_ids:
+            question_id = next((key for key, value in catalog.items() if value == text and key not in question_ids), None) or next_question_id(catalog)
+        catalog[question_id] = text
+        questions.append(text)
+        question_ids.append(question_id)
+    return questions, question_ids, catalog
+
+class QuestionSchemaCache:
+    """Daftar pertanyaan ter-compile per employee_type, disegarkan listener on_snapshot dan hanya di-compile ulang saat versinya berubah."""
+
+    def __init__(self, client):
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self.schemas = {}  # employee_type -> (version, daftar string mentah, tuple Question, katalog ID -> Question)
+        self._watch = client.collection('review_questions').on_snapshot(self._on_snapshot)
+
+    def _on_snapshot(self, docs, changes, read_time):
+        with self._lock:
+            schemas = dict(self.schemas)
+            for change in changes:
+                employee_type = change.document.id
+                if change.type.name == 'REMOVED':
+                    schemas.pop(employee_type, None)
+                    continue
+                data = change.document.to_dict()
+                version = data.get('version', 0)
+                if employee_type in schemas and schemas[employee_type][0] == version:
+                    continue
+                raw = list(data.get('questions', []))
+                question_ids = data.get('question_ids', [])
+                if len(question_ids) != len(raw):
+                    question_ids = raw # Skema lama tanpa ID: response masih memakai string pertanyaan sebagai key
+                compiled = tuple(compile_question(text, employee_type, key) for key, text in zip(question_ids, raw))
+                catalog = {key: compile_question(text, employee_type, key) for key, text in data.get('catalog', {}).items()}
+                catalog.update((q.key, q) for q in compiled)
+                schemas[employee_type] = (version, raw, compiled, catalog)
+            self.schemas = schemas
+        self._ready.set()
+
+    def get(self, employee_type):
+        return self.schemas.get(employee_type, (0, [], (), {}))
+
+    def wait_ready(self, timeout=15):
+        return self._ready.wait(timeout)
+
+    def is_alive(self):
+        return self._watch.is_active
+
+    def close(self):
+        self._watch.unsubscribe()
+
+@st.cache_resource(validate=lambda schema_cache: schema_cache.is_alive())
+@registered_resource
+def get_question_schema_cache():
+    """Satu cache skema pertanyaan per proses server, dibagi oleh semua sesi."""
+    return QuestionSchemaCache(db)
+
+def get_question_schema(employee_type):
+    """Mengembalikan (version, daftar string mentah, tuple Question, katalog ID -> Question) untuk satu tipe karyawan."""
+    schema_cache = get_question_schema_cache()
+    if not schema_cache.wait_ready():
+        st.warning("Daftar pertanyaan belum siap dimuat.")
+    return schema_cache.get(employee_type)
+
+def get_review_questions(employee_type):
+    return list(get_question_schema(employee_type)[1])
+
+def get_compiled_questions(employee_type):
+    return get_question_schema(employee_type)[2]
+
+def get_question_catalog(employee_type):
+    """Semua pertanyaan yang pernah dipakai (termasuk yang sudah dihapus), per ID."""
+    return get_question_schema(employee_type)[3]
 
+def resolve_question(key, employee_type, catalog):
+    """Question untuk key response; key yang tidak ada di katalog (review lama berkunci teks) di-compile langsung."""
+    return catalog.get(key) or compile_question(key, employee_type)
+
+@firestore.transactional
+def update_review_questions_transaction(transaction, doc_ref, lines):
+    snapshot = doc_ref.get(transaction=transaction)
+    catalog = snapshot.to_dict().get('catalog', {}) if snapshot.exists else {}
+    questions, question_ids, catalog = assign_question_ids(lines, catalog)
+    # Versi dinaikkan agar cache skema pertanyaan di semua proses meng-compile ulang
+    transaction.set(doc_ref, {
+        'questions': questions, 'question_ids': question_ids, 'catalog': catalog,
+        'version': firestore.Increment(1)
+    }, merge=True)
+
+@timed_helper
 def update_review_questions(employee_type, questions_list):
     try:
         doc_ref = db.collection('review_questions').document(employee_type)
-        doc_ref.set({'questions': questions_list})
+        update_review_questions_transaction(db.transaction(), doc_ref, questions_list)
         st.success(f"Daftar pertanyaan untuk tipe '{employee_type}' berhasil diperbarui.")
         return True
     except Exception as e:
         st.error(f"Gagal memperbarui pertanyaan: {e}")
         return False
 
-def submit_review(reviewer_uid, reviewee_uid, responses):
+def accumulate_review(aggregate, reviewee_uid, reviewee_type, responses):
+    """
+    Menambahkan satu review ke dokumen agregat reviewee: per pertanyaan disimpan jumlah, banyaknya,
+    dan jumlah kuadrat skor (cukup untuk rata-rata dan simpangan baku), plus rata-rata keseluruhan.
+    """
+    aggregate = dict(aggregate or {'review_count': 0, 'questions': {}, 'score_sum': 0, 'score_count': 0})
+    questions = dict(aggregate.get('questions', {}))
+    for question, score in responses.items():
+        if isinstance(score, (int, float)):
+            stats = questions.get(question, {'sum': 0, 'count': 0, 'sum_sq': 0})
+            questions[question] = {'sum': stats['sum'] + score, 'count': stats['count'] + 1, 'sum_sq': stats['sum_sq'] + score * score}
+            aggregate['score_sum'] += score
+            aggregate['score_count'] += 1
+    aggregate.update({
+        'reviewee_uid': reviewee_uid,
+        'reviewee_type': reviewee_type,
+        'review_count': aggregate['review_count'] + 1,
+        'questions': questions,
+        'overall_average': aggregate['score_sum'] / aggregate['score_count'] if aggregate['score_count'] else None,
+        'updated_at': firestore.SERVER_TIMESTAMP
+    })
+    return aggregate
+
+def question_mean_std(stats):
+    mean = stats['sum'] / stats['count']
+    variance = max(stats['sum_sq'] / stats['count'] - mean * mean, 0)
+    return mean, math.sqrt(variance)
+
+def review_id_for(cycle_id, reviewer_uid, reviewee_uid):
+    """ID dokumen review yang deterministik: satu review per reviewer, reviewee, dan siklus."""
+    return f"{cycle_id}_{reviewer_uid}_{reviewee_uid}"
+
+@firestore.transactional
+def submit_review_transaction(transaction, review_data):
+    """
+    Menulis review, memperbarui agregat reviewee, dan menandai penugasan selesai dalam satu transaksi.
+    Review yang sudah ada untuk pasangan & siklus yang sama (klik ganda, rerun) ditolak dengan AlreadyExists sebelum agregat disentuh.
+    """
+    reviewer_uid, reviewee_uid = review_data['reviewer_uid'], review_data['reviewee_uid']
+    review_ref = db.collection('reviews').document(review_id_for(review_data['cycle_id'], reviewer_uid, reviewee_uid))
+    if review_ref.get(transaction=transaction).exists:
+        raise AlreadyExists(f"Review sudah ada: {review_ref.id}")
+    aggregate_ref = db.collection('review_aggregates').document(reviewee_uid)
+    aggregate_doc = aggregate_ref.get(transaction=transaction)
+    # Tandai penugasan terkait sebagai selesai untuk siklus ini, supaya status pengerjaan tidak perlu memindai koleksi 'reviews'
+    assignments_query = db.collection('review_assignments').where(filter=FieldFilter('reviewer_uid', '==', reviewer_uid)).where(filter=FieldFilter('reviewee_uid', '==', reviewee_uid))
+    assignment_docs = list(transaction.get(assignments_query))
+
+    previous = aggregate_doc.to_dict() if aggregate_doc.exists else None
+    aggregate = accumulate_review(previous, reviewee_uid, review_data['reviewee_type'], review_data['responses'])
+    # Bundel komentar (terbaru dulu) ikut dijaga, agar halaman hasil bisa mencari rangkuman AI di cache tanpa memuat semua review.
+    # Agregat lama tanpa bundel dibiarkan tanpa bundel sampai 'rebuild-aggregates' dijalankan, supaya tidak tampil bundel yang tidak lengkap.
+    if previous is None or 'comments_bundle' in previous:
+        aggregate['comments_bundle'] = cap_comments_bundle(build_comments_bundle([review_data]) + (previous or {}).get('comments_bundle', ""))
+    transaction.create(review_ref, review_data)
+    transaction.set(aggregate_ref, aggregate)
+    for doc in assignment_docs:
+        transaction.update(doc.reference, {'completed': True, 'completed_cycle_id': review_data['cycle_id'], 'completed_at': firestore.SERVER_TIMESTAMP})
+
+@timed_helper
+def submit_review(reviewer_uid, reviewee_uid, reviewee_type, responses):
     try:
-        review_data = {'reviewer_uid': reviewer_uid, 'reviewee_uid': reviewee_uid, 'responses': responses, 'timestamp': firestore.SERVER_TIMESTAMP}
-        db.collection('reviews').add(review_data)
+        review_data = {
+            'reviewer_uid': reviewer_uid, 'reviewee_uid': reviewee_uid, 'responses': responses,
+            'reviewee_type': reviewee_type, 'cycle_id': REVIEW_CYCLE_ID, # Untuk query ekspor per tipe/siklus
+            'timestamp': firestore.SERVER_TIMESTAMP
+        }
+        submit_review_transaction(db.transaction(), review_data)
+        return True
+    except AlreadyExists:
+        # Review yang sama sudah tersimpan (mis. tombol diklik dua kali); cukup muat ulang daftar reviewee
+        st.info("Review untuk karyawan ini sudah pernah dikirim.")
         return True
     except Exception as e: 
         st.error(f"Gagal mengirim review: {e}")
         return False
 
+@timed_helper
+def get_review_aggregate(reviewee_uid):
+    """Satu point read: ringkasan skor reviewee yang dijaga oleh submit_review."""
+    try:
+        doc = db.collection('review_aggregates').document(reviewee_uid).get()
+        return doc.to_dict() if doc.exists else None
+    except Exception as e: return None
+
+@timed_helper
 def get_my_reviews(reviewee_uid):
     try:
         reviews_ref = db.collection('reviews').where(filter=FieldFilter('reviewee_uid', '==', reviewee_uid)).stream()
         return [review.to_dict() for review in reviews_ref]
     except Exception as e: return []
 
-def has_user_submitted_feedback(uid):
-    """Mengecek apakah user sudah pernah submit feedback aplikasi."""
-    user_details = get_user_details(uid)
-    return user_details.get('app_feedback_submitted', False)
+def get_my_reviews_memoized(reviewee_uid, review_count, load=True):
+    """
+    Daftar review (terbaru dulu) yang di-memo per sesi selama review_count di agregat tidak berubah.
+    Dengan load=False hanya mengembalikan memo yang masih berlaku (atau None) tanpa membaca Firestore.
+    """
+    memo = st.session_state.get('my_reviews_memo')
+    if memo and memo['key'] == (reviewee_uid, review_count):
+        return memo['reviews']
+    if not load:
+        return None
+    reviews = sort_reviews_newest_first(get_my_reviews(reviewee_uid))
+    st.session_state.my_reviews_memo = {'key': (reviewee_uid, review_count), 'reviews': reviews}
+    return reviews
+
+# Skala rating kemudahan penggunaan di form ulasan aplikasi
+FEEDBACK_RATING_LABELS = {4: "Sangat Mudah", 3: "Mudah", 2: "Agak Sulit", 1: "Sangat Sulit"}
+
+@timed_helper
+def has_user_submitted_feedback(user_info):
+    """
+    Mengecek apakah user sudah pernah submit feedback aplikasi. Status disimpan di profil pengguna sesi (user_info),
+    jadi hanya dimuat sekali per sesi: dari direktori pengguna jika sudah hangat, atau satu point read.
+    """
+    if 'app_feedback_submitted' not in user_info:
+        uid = user_info['uid']
+        directory = get_user_directory()
+        user_details = (directory.users.get(uid) if directory.is_ready() else None) or get_user_details(uid) or {}
+        user_info['app_feedback_submitted'] = bool(user_details.get('app_feedback_submitted', False))
+    return user_info['app_feedback_submitted']
 
 @firestore.transactional
 def submit_app_feedback_transaction(transaction, uid, user_nama, rating, suggestion):
-    """Menyimpan feedback dan update status user dalam satu transaksi."""
+    """
+    Menyimpan feedback, update status user, dan menambah histogram rating di app_feedback_stats/summary dalam satu transaksi.
+    Mengembalikan False tanpa menulis apa pun jika user ternyata sudah pernah mengirim feedback.
+    """
+    user_ref = db.collection('users').document(uid)
+    user_doc = user_ref.get(transaction=transaction)
+    if user_doc.exists and user_doc.to_dict().get('app_feedback_submitted'):
+        return False
     feedback_ref = db.collection('app_feedback').document()
     transaction.set(feedback_ref, {
         'user_uid': uid,
@@ -172,28 +1018,44 @@ def submit_app_feedback_transaction(transaction, uid, user_nama, rating, suggest
         'suggestion': suggestion,
         'timestamp': firestore.SERVER_TIMESTAMP
     })
-    user_ref = db.collection('users').document(uid)
     transaction.update(user_ref, {'app_feedback_submitted': True})
-
-def process_app_feedback_submission(uid, user_nama, rating, suggestion):
-    """Wrapper untuk memanggil transaksi."""
+    # Agregat dengan Increment: dashboard admin cukup membaca satu dokumen, tanpa memindai 'app_feedback'
+    transaction.set(db.collection('app_feedback_stats').document('summary'), {
+        'total': firestore.Increment(1),
+        'rating_sum': firestore.Increment(rating),
+        'rating_counts': {str(rating): firestore.Increment(1)},
+        'with_suggestion': firestore.Increment(1 if suggestion and suggestion.strip() else 0),
+        'updated_at': firestore.SERVER_TIMESTAMP
+    }, merge=True)
+    return True
+
+@timed_helper
+def process_app_feedback_submission(user_info, rating, suggestion):
+    """Wrapper untuk memanggil transaksi; status feedback di profil sesi ikut diperbarui."""
     try:
         transaction = db.transaction()
-        submit_app_feedback_transaction(transaction, uid, user_nama, rating, suggestion)
-        st.success("Terima kasih! Ulasan Anda telah berhasil dikirim.")
+        if submit_app_feedback_transaction(transaction, user_info['uid'], user_info['nama'], rating, suggestion):
+            st.success("Terima kasih! Ulasan Anda telah berhasil dikirim.")
+        else:
+            st.info("Anda sudah pernah memberikan ulasan untuk aplikasi ini.")
+        user_info['app_feedback_submitted'] = True
         return True
     except Exception as e:
         st.error(f"Terjadi kesalahan saat mengirim ulasan: {e}")
         return False
 
-def generate_summary_with_gemini(all_comments):
-    """Fungsi untuk memanggil Gemini AI dan membuat rangkuman."""
-    # PERUBAHAN: Memastikan model sudah dikonfigurasi sebelum digunakan
-    if not generation_model:
-        st.error("Model AI tidak berhasil dikonfigurasi. Tidak dapat membuat rangkuman.")
+@st.cache_data(ttl=60) # Cache data selama 1 menit
+@timed_helper
+def get_app_feedback_stats():
+    """Satu point read: histogram rating ulasan aplikasi yang dijaga oleh submit_app_feedback_transaction."""
+    try:
+        doc = db.collection('app_feedback_stats').document('summary').get()
+        return doc.to_dict() if doc.exists else None
+    except Exception as e:
+        st.error(f"Gagal memuat statistik ulasan aplikasi: {e}")
         return None
-    
-    prompt = f"""
+
+SUMMARY_PROMPT_TEMPLATE = """
     Anda adalah seorang asisten HR yang profesional dan suportif. Tugas Anda adalah menganalisis data performance review seorang karyawan dan membuat rangkuman yang konstruktif dalam Bahasa Indonesia.
 
     Berikut adalah kumpulan masukan kualitatif (komentar dan saran) dari beberapa penilai:
@@ -217,149 +1079,701 @@ def generate_summary_with_gemini(all_comments):
 
     Gunakan bahasa yang positif, profesional, dan membangun. Fokus pada pertumbuhan dan pengembangan, bukan pada kelemahan.
     """
+
+# Prompt tahap "map" untuk bundel komentar yang terlalu besar: tiap potongan diringkas dulu secara paralel
+SUMMARY_MAP_PROMPT_TEMPLATE = """
+    Anda adalah seorang asisten HR. Berikut adalah sebagian masukan kualitatif (komentar dan saran) untuk seorang karyawan:
+    ---
+    {all_comments}
+    ---
+
+    Buat catatan ringkas dalam Bahasa Indonesia berupa poin-poin (maksimal 8 poin) yang mempertahankan tema kekuatan, area pengembangan, dan saran pengembangan yang muncul, beserta seberapa sering setiap tema disebut. Jangan menambahkan informasi yang tidak ada di masukan.
+    """
+
+# Perkiraan batas token input; di atas batas ini rangkuman dibuat dengan mode map-reduce
+SUMMARY_TOKEN_BUDGET = 8000
+SUMMARY_MAP_WORKERS = 4
+# Percobaan per panggilan API saat rangkuman dibuat dari halaman hasil (pengguna ikut menunggu backoff)
+SUMMARY_STREAM_ATTEMPTS = 3
+# Bundel komentar hanya memuat review terbaru ini (dan tidak lebih dari batas karakter), agar agregat tetap jauh di bawah batas 1 MiB dokumen Firestore
+SUMMARY_BUNDLE_MAX_REVIEWS = 200
+SUMMARY_BUNDLE_MAX_CHARS = 200_000
+
+def estimate_tokens(text):
+    """Perkiraan kasar jumlah token (~4 karakter per token), tanpa round trip ke API."""
+    return len(text) // 4
+
+def summary_cache_key(all_comments):
+    """Hash isi prompt: template, nama model, dan teks komentar. Review baru otomatis menghasilkan key baru."""
+    parts = [SUMMARY_PROMPT_TEMPLATE, GEMINI_MODEL_NAME, all_comments]
+    if estimate_tokens(all_comments) > SUMMARY_TOKEN_BUDGET:
+        parts.append(SUMMARY_MAP_PROMPT_TEMPLATE)
+    payload = "\x1f".join(parts)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def split_comments_bundle(all_comments, token_budget):
+    """Memecah bundel komentar per entri review ('---') menjadi potongan yang masing-masing muat dalam token_budget."""
+    chunks, current = [], ""
+    for entry in all_comments.split("---\n"):
+        if not entry.strip():
+            continue
+        entry += "---\n"
+        if current and estimate_tokens(current + entry) > token_budget:
+            chunks.append(current)
+            current = ""
+        current += entry
+    if current:
+        chunks.append(current)
+    return chunks
+
+def call_gemini(model, prompt, limiter=None, max_attempts=1, **kwargs):
+    """
+    Satu panggilan generate_content: setiap percobaan mengambil token dari limiter (jika ada),
+    dan error sementara diulang lewat call_with_retry tanpa mengulang panggilan lain.
+    """
+    def attempt():
+        if limiter:
+            limiter.acquire()
+        return model.generate_content(prompt, **kwargs)
+    return call_with_retry(attempt, max_attempts=max_attempts)
+
+def build_summary_prompt(all_comments, model, limiter=None, max_attempts=1):
+    """
+    Menyusun prompt akhir rangkuman. Bundel kecil langsung dipakai; bundel di atas SUMMARY_TOKEN_BUDGET
+    diringkas per potongan secara paralel (map), lalu ringkasan parsial digabung dalam format empat bagian (reduce).
+    Setiap panggilan map dibatasi limiter dan diulang sendiri-sendiri, sehingga ringkasan parsial yang sudah selesai tidak dibuat ulang.
+    """
+    if estimate_tokens(all_comments) <= SUMMARY_TOKEN_BUDGET:
+        return SUMMARY_PROMPT_TEMPLATE.format(all_comments=all_comments)
+
+    chunks = split_comments_bundle(all_comments, SUMMARY_TOKEN_BUDGET)
+    map_prompts = [SUMMARY_MAP_PROMPT_TEMPLATE.format(all_comments=chunk) for chunk in chunks]
+    def summarize_chunk(prompt):
+        return call_gemini(model, prompt, limiter=limiter, max_attempts=max_attempts).text
+    with ThreadPoolExecutor(max_workers=SUMMARY_MAP_WORKERS) as executor:
+        partial_summaries = list(executor.map(summarize_chunk, map_prompts))
+
+    merged = "\n".join(f"[Ringkasan kelompok penilai {i + 1}]\n{summary.strip()}\n" for i, summary in enumerate(partial_summaries))
+    return SUMMARY_PROMPT_TEMPLATE.format(all_comments=merged)
+
+def get_cached_summary(all_comments):
+    """Mengambil rangkuman AI yang tersimpan untuk input yang identik, atau None."""
+    try:
+        doc = db.collection('ai_summaries').document(summary_cache_key(all_comments)).get()
+        return doc.to_dict().get('summary') if doc.exists else None
+    except Exception as e: return None
+
+def store_cached_summary(all_comments, summary):
+    """Menyimpan rangkuman ke cache; mengembalikan False jika gagal (tanpa memanggil st.*, aman dari thread lain)."""
+    try:
+        db.collection('ai_summaries').document(summary_cache_key(all_comments)).set({
+            'summary': summary,
+            'model': GEMINI_MODEL_NAME,
+            'timestamp': firestore.SERVER_TIMESTAMP
+        })
+        return True
+    except Exception as e: return False
+
+def generate_summary_with_gemini(all_comments, model=None, raise_errors=False, limiter=None, max_attempts=1, check_cache=True):
+    """
+    Fungsi untuk memanggil Gemini AI dan membuat rangkuman (memakai cache jika input identik).
+    `model` dapat diganti (mis. stub untuk pengujian); dengan `raise_errors=True` error diteruskan
+    ke pemanggil alih-alih ditampilkan, sehingga aman dipanggil dari thread pool.
+    `limiter` dan `max_attempts` berlaku untuk setiap panggilan API (map maupun reduce), bukan per bundel.
+    `check_cache=False` dipakai pemanggil yang sudah memeriksa cache sendiri.
+    """
+    cached_summary = get_cached_summary(all_comments) if check_cache else None
+    if cached_summary:
+        return cached_summary
+
+    model = model or load_generation_model()
+    # PERUBAHAN: Memastikan model sudah dikonfigurasi sebelum digunakan
+    if not model:
+        if raise_errors:
+            raise RuntimeError("Model AI tidak berhasil dikonfigurasi.")
+        st.error("Model AI tidak berhasil dikonfigurasi. Tidak dapat membuat rangkuman.")
+        return None
     
     try:
-        # PERUBAHAN: Menggunakan model yang sudah dikonfigurasi secara global
-        response = generation_model.generate_content(prompt)
+        prompt = build_summary_prompt(all_comments, model, limiter=limiter, max_attempts=max_attempts)
+        response = call_gemini(model, prompt, limiter=limiter, max_attempts=max_attempts)
+        if not store_cached_summary(all_comments, response.text) and not raise_errors:
+            st.warning("Rangkuman berhasil dibuat, tetapi gagal disimpan ke cache.")
         return response.text
     except Exception as e:
+        if raise_errors:
+            raise
         st.error(f"Gagal menghasilkan rangkuman dari AI: {e}")
         return None
 
-def get_all_users():
-    """Mengambil semua pengguna dari koleksi 'users'."""
+def stream_summary_with_gemini(all_comments, model=None):
+    """
+    Generator potongan teks rangkuman untuk st.write_stream, agar token pertama langsung tampil.
+    Rangkuman dari cache dikirim sekaligus; teks lengkap hasil streaming disimpan ke cache di akhir.
+    """
+    cached_summary = get_cached_summary(all_comments)
+    if cached_summary:
+        yield cached_summary
+        return
+
+    model = model or load_generation_model()
+    if not model:
+        raise RuntimeError("Model AI tidak berhasil dikonfigurasi.")
+
+    # Semua panggilan memakai limiter bersama; stream hanya diulang jika gagal sebelum potongan pertama tiba,
+    # karena teks yang sudah tampil di halaman tidak bisa ditarik kembali
+    limiter = get_gemini_limiter()
+    prompt = build_summary_prompt(all_comments, model, limiter=limiter, max_attempts=SUMMARY_STREAM_ATTEMPTS)
+    def start_stream():
+        response = iter(call_gemini(model, prompt, limiter=limiter, stream=True))
+        return next(response, None), response
+    first_chunk, response = call_with_retry(start_stream, max_attempts=SUMMARY_STREAM_ATTEMPTS)
+
+    chunks = []
+    for chunk in itertools.chain([first_chunk] if first_chunk is not None else [], response):
+        try:
+            text = chunk.text
+        except ValueError:
+            continue # Potongan tanpa teks (mis. hanya metadata penyelesaian)
+        chunks.append(text)
+        yield text
+    store_cached_summary(all_comments, "".join(chunks))
+
+def sort_reviews_newest_first(reviews):
+    """Urutan review yang dipakai halaman hasil; bundel komentar bergantung pada urutan ini."""
+    return sorted(reviews, key=lambda r: r.get('timestamp', pd.Timestamp.min), reverse=True)
+
+def cap_comments_bundle(all_comments):
+    """Memangkas bundel (terbaru dulu) menjadi maksimal SUMMARY_BUNDLE_MAX_REVIEWS entri utuh dan SUMMARY_BUNDLE_MAX_CHARS karakter."""
+    kept, size = [], 0
+    for entry in all_comments.split("---\n")[:-1][:SUMMARY_BUNDLE_MAX_REVIEWS]:
+        entry += "---\n"
+        if size + len(entry) > SUMMARY_BUNDLE_MAX_CHARS:
+            break
+        kept.append(entry)
+        size += len(entry)
+    return "".join(kept)
+
+def build_comments_bundle(reviews):
+    """Menyusun teks komentar & saran dari review (sudah terurut, terbaru dulu) sebagai input rangkuman AI, dipangkas dengan cap_comments_bundle."""
+    all_comments_text = ""
+    for review in reviews:
+        comments = {k: v for k, v in review.get('responses', {}).items() if isinstance(v, str)}
+        if not comments:
+            continue
+        comment_text = comments.get('Komentar') or comments.get('Komentar Umum')
+        if comment_text:
+            all_comments_text += f"- Komentar: {comment_text}\n"
+        if 'Saran Pengembangan' in comments:
+            all_comments_text += f"- Saran Pengembangan: {comments['Saran Pengembangan']}\n"
+        all_comments_text += "---\n"
+    return cap_comments_bundle(all_comments_text)
+
+@timed_helper
+def get_summary_bundles(employee_type):
+    """Mengelompokkan review per reviewee untuk satu tipe karyawan dan menyusun bundel komentarnya."""
     try:
-        users_ref = db.collection('users').stream()
-        return {user.id: user.to_dict() for user in users_ref} # Diubah untuk mengembalikan semua data
+        reviews_by_reviewee = {}
+        for review_data in get_synced_reviews(reviewee_type=employee_type):
+            reviews_by_reviewee.setdefault(review_data.get('reviewee_uid'), []).append(review_data)
+        bundles = {uid: build_comments_bundle(sort_reviews_newest_first(reviews)) for uid, reviews in reviews_by_reviewee.items()}
+        return {uid: bundle for uid, bundle in bundles.items() if bundle}
     except Exception as e:
-        st.error(f"Gagal mengambil daftar pengguna: {e}")
+        st.error(f"Gagal mengambil data review untuk rangkuman: {e}")
         return {}
 
-def get_all_assignments(assignment_type):
-    """Mengambil semua penugasan yang ada berdasarkan tipe."""
+class TokenBucket:
+    """
+    Rate limiter token-bucket yang aman dipakai bersama oleh banyak thread.
+    Dengan `parent`, setiap acquire juga mengambil token dari limiter induk (mis. batas kuota seluruh proses).
+    """
+
+    def __init__(self, rate_per_minute, capacity=1, parent=None):
+        self.rate = rate_per_minute / 60.0
+        self.parent = parent
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+        if self.parent:
+            self.parent.acquire()
+
+@st.cache_resource
+def get_gemini_limiter():
+    """Limiter Gemini bersama untuk semua sesi dan job di satu proses server."""
+    return TokenBucket(GEMINI_RATE_PER_MINUTE)
+
+# Error API yang layak diulang (kuota, server sibuk/timeout); error lain (mis. API key salah, argumen tidak valid) langsung diteruskan
+TRANSIENT_API_ERRORS = (ResourceExhausted, ServiceUnavailable, DeadlineExceeded, InternalServerError)
+
+def call_with_retry(fn, max_attempts=4, base_delay=2.0):
+    """Memanggil fn() dengan retry dan exponential backoff (plus jitter) untuk error sementara dari API."""
+    for attempt in range(max_attempts):
+        try:
+            return fn()
+        except TRANSIENT_API_ERRORS:
+            if attempt == max_attempts - 1:
+                raise
+            time.sleep(base_delay * (2 ** attempt) + random.uniform(0, base_delay))
+
+def pregenerate_summaries(bundles, model=None, max_workers=4, rate_per_minute=30, max_attempts=4, on_progress=None):
+    """
+    Membuat rangkuman AI untuk banyak reviewee sekaligus lewat thread pool terbatas.
+    Mengembalikan {reviewee_uid: (status, keterangan)}; hasil tersimpan di cache rangkuman.
+    on_progress(selesai, total) dipanggil dari thread pemanggil, sehingga aman untuk memperbarui UI.
+    """
+    # Model dimuat di thread pemanggil; thread pekerja tidak punya konteks script run untuk menampilkan error
+    model = model or load_generation_model()
+    if not model:
+        return {uid: ('error', "Model AI tidak berhasil dikonfigurasi.") for uid in bundles}
+    # Batas per job dari admin, di bawah batas kuota bersama yang juga dipakai halaman hasil
+    limiter = TokenBucket(rate_per_minute, parent=get_gemini_limiter())
+
+    def summarize(bundle):
+        if get_cached_summary(bundle):
+            return 'cached'
+        # Limiter dan retry diteruskan ke setiap panggilan API; bundel besar memakai beberapa token (map + reduce)
+        generate_summary_with_gemini(bundle, model=model, raise_errors=True, limiter=limiter, max_attempts=max_attempts, check_cache=False)
+        return 'generated'
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(summarize, bundle): uid for uid, bundle in bundles.items()}
+        for done, future in enumerate(as_completed(futures), start=1):
+            uid = futures[future]
+            try:
+                results[uid] = (future.result(), "")
+            except Exception as e:
+                results[uid] = ('error', str(e))
+            if on_progress:
+                on_progress(done, len(futures))
+    return results
+
+class UserDirectory:
+    """Direktori pengguna in-process yang dijaga tetap mutakhir oleh listener on_snapshot Firestore."""
+
+    def __init__(self, client):
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self.users = {}
+        self.names = {}
+        self.types = {}
+        self.name_to_uid = {}
+        self._watch = client.collection('users').on_snapshot(self._on_snapshot)
+
+    def _on_snapshot(self, docs, changes, read_time):
+        # Dipanggil dari thread listener; peta baru dibangun lalu ditukar sekaligus
+        # agar pembaca di thread script selalu melihat snapshot yang konsisten.
+        with self._lock:
+            users = dict(self.users)
+            for change in changes:
+                if change.type.name == 'REMOVED':
+                    users.pop(change.document.id, None)
+                else:
+                    users[change.document.id] = change.document.to_dict()
+            self.users = users
+            self.names = {uid: data.get('nama', f"UID: {uid}") for uid, data in users.items()}
+            self.types = {uid: data.get('tipe_karyawan') for uid, data in users.items()}
+            self.name_to_uid = {data['nama']: uid for uid, data in users.items() if 'nama' in data}
+        self._ready.set()
+
+    def is_ready(self):
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout=15):
+        return self._ready.wait(timeout)
+
+    def is_alive(self):
+        return self._watch.is_active
+
+    def close(self):
+        self._watch.unsubscribe()
+
+@st.cache_resource(validate=lambda directory: directory.is_alive())
+@registered_resource
+def get_user_directory():
+    """Satu direktori pengguna per proses server, dibagi oleh semua sesi."""
+    return UserDirectory(db)
+
+def ready_user_directory():
+    """Mengembalikan direktori pengguna setelah snapshot awal dari listener diterima."""
+    directory = get_user_directory()
+    if not directory.wait_ready():
+        st.error("Gagal mengambil daftar pengguna: direktori pengguna belum siap.")
+    return directory
+
+# Lokasi snapshot lokal koleksi 'reviews' (SQLite, tidak ikut di-commit)
+REVIEW_SNAPSHOT_PATH = os.environ.get('REVIEW_SNAPSHOT_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'reviews_snapshot.sqlite')
+# Objek JSON berisi jawaban numerik saja dari kolom responses (sama dengan filter int/float di accumulate_review)
+NUMERIC_SCORES_SQL = "(SELECT json_group_object(key, value) FROM json_each({}) WHERE type IN ('integer', 'real'))"
+
+class ReviewSnapshot:
+    """
+    Salinan lokal koleksi 'reviews' di SQLite, disinkronkan bertahap dengan
+    where('timestamp', '>=', high-water mark) sehingga setiap sinkronisasi hanya membaca review baru.
+    Review lama yang diubah/dihapus (mis. oleh migrasi) tidak terdeteksi: gunakan rebuild().
+    """
+
+    def __init__(self, client, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._client = client
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS reviews (
+                id TEXT PRIMARY KEY, reviewer_uid TEXT, reviewee_uid TEXT, reviewee_type TEXT,
+                cycle_id TEXT, timestamp TEXT, responses TEXT, scores TEXT
+            );
+            CREATE INDEX IF NOT EXISTS reviews_type_cycle ON reviews (reviewee_type, cycle_id);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        # Snapshot lama belum punya kolom 'scores'; diisi sekali dari responses tanpa membaca ulang Firestore
+        if 'scores' not in [column[1] for column in self._conn.execute("PRAGMA table_info(reviews)")]:
+            with self._conn:
+                self._conn.execute("ALTER TABLE reviews ADD COLUMN scores TEXT")
+                self._conn.execute(f"UPDATE reviews SET scores = {NUMERIC_SCORES_SQL.format('responses')}")
+
+    def high_water_mark(self):
+        with self._lock:
+            return self._high_water_mark()
+
+    def _high_water_mark(self):
+        """Dipanggil dengan self._lock sudah dipegang (sync memakainya di dalam lock)."""
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'high_water_mark'").fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    def sync(self):
+        """Mengambil review dengan timestamp >= high-water mark (batas diulang agar tidak ada yang terlewat); mengembalikan jumlah dokumen yang dibaca."""
+        with self._lock:
+            high_water_mark = self._high_water_mark()
+            query = self._client.collection('reviews')
+            if high_water_mark:
+                query = query.where(filter=FieldFilter('timestamp', '>=', high_water_mark))
+            rows = []
+            for doc in query.order_by('timestamp').stream():
+                data = doc.to_dict()
+                timestamp = data.get('timestamp')
+                rows.append((
+                    doc.id, data.get('reviewer_uid'), data.get('reviewee_uid'), data.get('reviewee_type'),
+                    data.get('cycle_id'), timestamp.isoformat(), json.dumps(data.get('responses', {}))
+                ))
+                high_water_mark = timestamp
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO reviews (id, reviewer_uid, reviewee_uid, reviewee_type, cycle_id, timestamp, responses, scores) "
+                    f"SELECT ?1, ?2, ?3, ?4, ?5, ?6, ?7, {NUMERIC_SCORES_SQL.format('?7')}", rows
+                )
+                if high_water_mark:
+                    self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('high_water_mark', ?)", (high_water_mark.isoformat(),))
+            return len(rows)
+
+    def rebuild(self):
+        """Mengosongkan snapshot lalu menyalin ulang seluruh koleksi."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM reviews")
+            self._conn.execute("DELETE FROM meta")
+        return self.sync()
+
+    def reviews(self, reviewee_type=None, cycle_id=None):
+        """Review di snapshot dalam bentuk dict seperti doc.to_dict(), ditambah 'id'."""
+        sql, params = "SELECT * FROM reviews WHERE 1 = 1", []
+        if reviewee_type:
+            sql, params = sql + " AND reviewee_type = ?", params + [reviewee_type]
+        if cycle_id:
+            sql, params = sql + " AND cycle_id = ?", params + [cycle_id]
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            {'id': row[0], 'reviewer_uid': row[1], 'reviewee_uid': row[2], 'reviewee_type': row[3],
+             'cycle_id': row[4], 'timestamp': datetime.fromisoformat(row[5]), 'responses': json.loads(row[6])}
+            for row in rows
+        ]
+
+    def scores(self, reviewee_type=None):
+        """
+        Skor review berformat panjang (review_id, reviewer_uid, reviewee_uid, question, score) tanpa loop Python per review:
+        kolom 'scores' (jawaban numerik saja, diisi saat sinkronisasi) diurai pd.read_json sebagai JSON Lines, lalu di-melt.
+        Jawaban teks yang kebetulan berupa angka (mis. komentar "5") tidak ikut dihitung, sama seperti accumulate_review.
+        """
+        sql, params = "SELECT id AS review_id, reviewer_uid, reviewee_uid, scores FROM reviews", []
+        if reviewee_type:
+            sql, params = sql + " WHERE reviewee_type = ?", [reviewee_type]
+        with self._lock:
+            rows = pd.read_sql_query(sql, self._conn, params=params)
+        id_columns = ['review_id', 'reviewer_uid', 'reviewee_uid']
+        if rows.empty:
+            return pd.DataFrame(columns=id_columns + ['question', 'score'])
+        wide = pd.read_json(StringIO(rows.pop('scores').str.cat(sep='\n')), lines=True, dtype=False, convert_dates=False)
+        scores = pd.concat([rows, wide], axis=1).melt(id_vars=id_columns, var_name='question', value_name='score')
+        return scores.dropna(subset=['score'])
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM reviews").fetchone()[0]
+
+@st.cache_resource
+@registered_resource
+def get_review_snapshot():
+    """Satu snapshot review per proses server, dibagi oleh semua sesi admin."""
+    return ReviewSnapshot(db, REVIEW_SNAPSHOT_PATH)
+
+@timed_helper
+def get_synced_reviews(reviewee_type=None, cycle_id=None):
+    """Sinkronkan snapshot (hanya membaca review baru) lalu kembalikan review yang diminta dari SQLite."""
+    snapshot = get_review_snapshot()
+    snapshot.sync()
+    return snapshot.reviews(reviewee_type=reviewee_type, cycle_id=cycle_id)
+
+@timed_helper
+def get_assignments_page(assignment_type, page_size, cursor=None, reviewer_uid=None, reviewee_uid=None):
+    """
+    Mengambil satu halaman penugasan (urut ID dokumen) dengan pagination cursor Firestore.
+    Mengembalikan (daftar penugasan, snapshot terakhir sebagai cursor halaman berikutnya atau None).
+    """
     try:
-        assignments_ref = db.collection('review_assignments').where(filter=FieldFilter('assignment_type', '==', assignment_type)).stream()
+        query = db.collection('review_assignments').where(filter=FieldFilter('assignment_type', '==', assignment_type))
+        if reviewer_uid:
+            query = query.where(filter=FieldFilter('reviewer_uid', '==', reviewer_uid))
+        if reviewee_uid:
+            query = query.where(filter=FieldFilter('reviewee_uid', '==', reviewee_uid))
+        query = query.order_by('__name__').limit(page_size)
+        if cursor is not None:
+            query = query.start_after(cursor)
+        docs = list(query.stream())
+
+        all_users_info = ready_user_directory().names
         assignments_list = []
-        all_users = get_all_users()
-        all_users_info = {uid: data.get('nama', 'Pengguna Dihapus') for uid, data in all_users.items()}
-
-        for doc in assignments_ref:
+        for doc in docs:
             data = doc.to_dict()
-            reviewer_name = all_users_info.get(data.get('reviewer_uid'), 'Pengguna Dihapus')
-            reviewee_name = all_users_info.get(data.get('reviewee_uid'), 'Pengguna Dihapus')
             assignments_list.append({
                 'id': doc.id,
-                'reviewer_name': reviewer_name,
-                'reviewee_name': reviewee_name
+                'reviewer_name': all_users_info.get(data.get('reviewer_uid'), 'Pengguna Dihapus'),
+                'reviewee_name': all_users_info.get(data.get('reviewee_uid'), 'Pengguna Dihapus'),
+                'completed': data.get('completed_cycle_id') == REVIEW_CYCLE_ID
             })
-        return assignments_list
+        next_cursor = docs[-1] if len(docs) == page_size else None
+        return assignments_list, next_cursor
     except Exception as e:
         st.error(f"Gagal mengambil daftar penugasan: {e}")
-        return []
+        return [], None
+
+def assignment_id_for(assignment_type, reviewer_uid, reviewee_uid):
+    """ID dokumen penugasan yang deterministik, sehingga deduplikasi cukup dengan menulis ke key yang sama."""
+    return f"{assignment_type}_{reviewer_uid}_{reviewee_uid}"
 
 def add_assignment(reviewer_uid, reviewee_uid, assignment_type):
-    """Menambahkan penugasan baru dengan tipe dan memeriksa duplikat."""
+    """Menambahkan penugasan baru dengan tipe; duplikat ditolak oleh create() pada ID deterministik."""
     try:
-        existing_ref = db.collection('review_assignments').where(filter=FieldFilter('reviewer_uid', '==', reviewer_uid)).where(filter=FieldFilter('reviewee_uid', '==', reviewee_uid)).where(filter=FieldFilter('assignment_type', '==', assignment_type)).limit(1).stream()
-        if len(list(existing_ref)) > 0:
-            st.warning("Penugasan ini sudah ada.")
-            return False
-        
-        db.collection('review_assignments').add({
+        # Penugasan yang ditambahkan ulang setelah review siklus berjalan masuk langsung berstatus selesai
+        existing_review = db.collection('reviews').document(review_id_for(REVIEW_CYCLE_ID, reviewer_uid, reviewee_uid)).get()
+        db.collection('review_assignments').document(assignment_id_for(assignment_type, reviewer_uid, reviewee_uid)).create({
             'reviewer_uid': reviewer_uid,
             'reviewee_uid': reviewee_uid,
-            'assignment_type': assignment_type
+            'assignment_type': assignment_type,
+            'completed': existing_review.exists,
+            'completed_cycle_id': REVIEW_CYCLE_ID if existing_review.exists else None
         })
         st.success("Penugasan berhasil ditambahkan.")
         return True
+    except AlreadyExists:
+        st.warning("Penugasan ini sudah ada.")
+        return False
     except Exception as e:
         st.error(f"Gagal menambahkan penugasan: {e}")
         return False
 
-def delete_assignment(assignment_id):
-    """Menghapus penugasan berdasarkan ID dokumennya."""
+@timed_helper
+def delete_assignments(assignment_ids):
+    """Menghapus banyak penugasan sekaligus dalam batched write berisi maksimal FIRESTORE_BATCH_LIMIT operasi."""
     try:
-        db.collection('review_assignments').document(assignment_id).delete()
-        st.success("Penugasan berhasil dihapus.")
+        assignment_ids = list(assignment_ids)
+        for start in range(0, len(assignment_ids), FIRESTORE_BATCH_LIMIT):
+            batch = db.batch()
+            for assignment_id in assignment_ids[start:start + FIRESTORE_BATCH_LIMIT]:
+                batch.delete(db.collection('review_assignments').document(assignment_id))
+            batch.commit()
         return True
     except Exception as e:
         st.error(f"Gagal menghapus penugasan: {e}")
         return False
 
+def parse_assignment_sheet(df, user_names_map):
+    """
+    Mengubah spreadsheet berkolom 'Reviewer' dan 'Reviewee' (nama karyawan) menjadi set pasangan UID.
+    Mengembalikan (set pasangan valid, daftar baris yang ditolak).
+    """
+    missing_columns = [col for col in ('Reviewer', 'Reviewee') if col not in df.columns]
+    if missing_columns:
+        raise ValueError(f"Kolom wajib tidak ditemukan: {', '.join(missing_columns)}")
+
+    pairs, rejected = set(), []
+    reviewer_uids = df['Reviewer'].map(user_names_map)
+    reviewee_uids = df['Reviewee'].map(user_names_map)
+    for idx, reviewer_uid, reviewee_uid in zip(df.index, reviewer_uids, reviewee_uids):
+        row = {'Baris': idx + 2, 'Reviewer': df.at[idx, 'Reviewer'], 'Reviewee': df.at[idx, 'Reviewee']}
+        if pd.isna(reviewer_uid) or pd.isna(reviewee_uid):
+            rejected.append({**row, 'Keterangan': "Nama tidak ditemukan"})
+        elif reviewer_uid == reviewee_uid:
+            rejected.append({**row, 'Keterangan': "Reviewer dan Reviewee sama"})
+        else:
+            pairs.add((reviewer_uid, reviewee_uid))
+    return pairs, rejected
+
+def plan_assignment_import(assignment_type, desired_pairs, replace_existing):
+    """
+    Dry run: membandingkan pasangan dari spreadsheet dengan penugasan yang ada.
+    Mengembalikan dict berisi pasangan yang akan ditambah, ID dokumen yang akan dihapus
+    (hanya mode ganti), dan jumlah yang tidak berubah. Tidak menulis apa pun.
+    """
+    current = {}
+    assignments_ref = db.collection('review_assignments').where(filter=FieldFilter('assignment_type', '==', assignment_type)).select(['reviewer_uid', 'reviewee_uid']).stream()
+    for doc in assignments_ref:
+        data = doc.to_dict()
+        current.setdefault((data.get('reviewer_uid'), data.get('reviewee_uid')), []).append(doc.id)
+
+    to_add = sorted(desired_pairs - current.keys())
+    to_delete = []
+    if replace_existing:
+        to_delete = [doc_id for pair, doc_ids in current.items() if pair not in desired_pairs for doc_id in doc_ids]
+    return {
+        'assignment_type': assignment_type,
+        'to_add': to_add,
+        'to_delete': to_delete,
+        'unchanged': len(desired_pairs & current.keys()),
+    }
+
+@timed_helper
+def apply_assignment_import(plan):
+    """Menerapkan hasil plan_assignment_import dengan batched write (set ke ID deterministik, lalu hapus)."""
+    try:
+        assignment_type = plan['assignment_type']
+        completed_pairs = set()
+        if plan['to_add']:
+            # Review siklus berjalan dari snapshot lokal agar penugasan yang reviewnya sudah masuk langsung berstatus selesai
+            reviews = get_synced_reviews(reviewee_type=assignment_type, cycle_id=REVIEW_CYCLE_ID)
+            completed_pairs = {(review['reviewer_uid'], review['reviewee_uid']) for review in reviews}
+
+        to_add = plan['to_add']
+        for start in range(0, len(to_add), FIRESTORE_BATCH_LIMIT):
+            batch = db.batch()
+            for reviewer_uid, reviewee_uid in to_add[start:start + FIRESTORE_BATCH_LIMIT]:
+                completed = (reviewer_uid, reviewee_uid) in completed_pairs
+                batch.set(db.collection('review_assignments').document(assignment_id_for(assignment_type, reviewer_uid, reviewee_uid)), {
+                    'reviewer_uid': reviewer_uid,
+                    'reviewee_uid': reviewee_uid,
+                    'assignment_type': assignment_type,
+                    'completed': completed,
+                    'completed_cycle_id': REVIEW_CYCLE_ID if completed else None
+                })
+            batch.commit()
+        return delete_assignments(plan['to_delete'])
+    except Exception as e:
+        st.error(f"Gagal menerapkan impor penugasan: {e}")
+        return False
+
+# --- PEMUATAN DATA ADMIN SECARA BERSAMAAN ---
+
+def load_concurrently(loaders):
+    """
+    Menjalankan beberapa loader independen ({nama: fungsi tanpa argumen}) bersamaan di thread pool lalu menggabungkan
+    hasilnya ({nama: hasil}), sehingga waktu tunggu mendekati loader terlama, bukan jumlah semuanya.
+    Konteks script run diteruskan ke setiap thread agar st.error di dalam loader dan statistik Firestore tetap berfungsi.
+    """
+    ctx = get_script_run_ctx(suppress_warning=True)
+    with ThreadPoolExecutor(max_workers=len(loaders), initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx)) as executor:
+        futures = {name: executor.submit(loader) for name, loader in loaders.items()}
+        return {name: future.result() for name, future in futures.items()}
+
 # --- TAMBAHAN BARU: Fungsi untuk mendapatkan status pengerjaan ---
-@st.cache_data(ttl=300) # Cache data selama 5 menit
+@st.cache_data(ttl=60) # Cache data selama 1 menit
+@timed_helper
 def get_review_completion_status(employee_type):
-    """Mengambil semua penugasan dan mengecek status pengerjaannya."""
+    """
+    Menghitung (selesai, total) penugasan dengan dua agregasi count() Firestore yang dikirim bersamaan, tanpa membaca dokumen review.
+    Hanya penugasan yang selesai di siklus berjalan (completed_cycle_id) yang dihitung selesai.
+    """
     try:
-        # 1. Ambil semua penugasan untuk tipe karyawan yang dipilih
-        assignments_ref = db.collection('review_assignments').where(filter=FieldFilter('assignment_type', '==', employee_type)).stream()
-        assignments = list(assignments_ref)
+        assignments_query = db.collection('review_assignments').where(filter=FieldFilter('assignment_type', '==', employee_type))
+        counts = load_concurrently({
+            'total': lambda: assignments_query.count(alias='total').get()[0][0].value,
+            'completed': lambda: assignments_query.where(filter=FieldFilter('completed_cycle_id', '==', REVIEW_CYCLE_ID)).count(alias='completed').get()[0][0].value,
+        })
+        return counts['completed'], counts['total']
+    except Exception as e:
+        st.error(f"Gagal memuat status pengerjaan: {e}")
+        return 0, 0
 
-        # 2. Ambil semua data pengguna untuk mapping nama
-        all_users = get_all_users()
-        user_names = {uid: data.get('nama', f"UID: {uid}") for uid, data in all_users.items()}
-        
-        # 3. Ambil semua review yang sudah masuk untuk pengecekan cepat
-        reviews_ref = db.collection('reviews').stream()
-        completed_reviews = {(doc.to_dict()['reviewer_uid'], doc.to_dict()['reviewee_uid']) for doc in reviews_ref}
-        
+@timed_helper
+def get_review_completion_page(employee_type, page_size, cursor=None):
+    """Mengambil satu halaman rincian status pengerjaan; mengembalikan (baris, cursor halaman berikutnya)."""
+    try:
+        query = db.collection('review_assignments').where(filter=FieldFilter('assignment_type', '==', employee_type)).order_by('__name__').limit(page_size)
+        if cursor is not None:
+            query = query.start_after(cursor)
+        docs = list(query.stream())
+
+        user_names = ready_user_directory().names
         status_list = []
-        for doc in assignments:
+        for doc in docs:
             assignment_data = doc.to_dict()
-            reviewer_uid = assignment_data.get('reviewer_uid')
-            reviewee_uid = assignment_data.get('reviewee_uid')
-            
-            # Cek status
-            status_key = (reviewer_uid, reviewee_uid)
-            if status_key in completed_reviews:
-                status = "✅ Selesai"
-            else:
-                status = "❌ Belum Mengerjakan"
-            
             status_list.append({
-                "Reviewer": user_names.get(reviewer_uid, "N/A"),
-                "Reviewee": user_names.get(reviewee_uid, "N/A"),
-                "Status": status
+                "Reviewer": user_names.get(assignment_data.get('reviewer_uid'), "N/A"),
+                "Reviewee": user_names.get(assignment_data.get('reviewee_uid'), "N/A"),
+                "Status": "✅ Selesai" if assignment_data.get('completed_cycle_id') == REVIEW_CYCLE_ID else "❌ Belum Mengerjakan"
             })
-            
-        return pd.DataFrame(status_list)
 
+        next_cursor = docs[-1] if len(docs) == page_size else None
+        return status_list, next_cursor
     except Exception as e:
-        st.error(f"Gagal memuat status pengerjaan: {e}")
-        return pd.DataFrame()
+        st.error(f"Gagal memuat rincian status pengerjaan: {e}")
+        return [], None
+
+def load_next_completion_page(employee_type):
+    """Callback tombol rincian: menambahkan halaman berikutnya ke session_state."""
+    page_state = st.session_state.completion_pages[employee_type]
+    rows, next_cursor = get_review_completion_page(employee_type, COMPLETION_PAGE_SIZE, page_state['cursor'])
+    page_state['rows'].extend(rows)
+    page_state['cursor'] = next_cursor
+    page_state['done'] = next_cursor is None
 
 # --- TAMBAHAN BARU: Fungsi untuk mengunduh data CSV ---
-@st.cache_data(ttl=600) # Cache data selama 10 menit
-def prepare_review_data_for_download(employee_type):
+@timed_helper
+def prepare_review_data_for_download(employee_type, cycle_id=None):
     """
     Mengambil, memproses, dan memformat semua data review untuk tipe karyawan tertentu 
-    ke dalam DataFrame Pandas yang siap diunduh.
+    (opsional: hanya satu siklus) ke dalam DataFrame Pandas yang siap diunduh.
     """
     try:
-        # 1. Ambil semua data pengguna untuk mapping UID ke Nama
-        all_users = get_all_users()
-        user_names = {uid: data.get('nama', f"Pengguna Dihapus (UID: {uid})") for uid, data in all_users.items()}
-        user_types = {uid: data.get('tipe_karyawan') for uid, data in all_users.items()}
-
-        # 2. Ambil daftar pertanyaan kanonis untuk header kolom yang konsisten
-        questions = get_review_questions(employee_type)
+        # 1-3. Mapping UID ke Nama (direktori pengguna), daftar pertanyaan kanonis untuk header kolom, dan review
+        # tipe karyawan (dan siklus) yang dipilih dari snapshot lokal dimuat bersamaan karena tidak saling bergantung
+        loaded = load_concurrently({
+            'user_names': lambda: ready_user_directory().names,
+            'questions': lambda: get_compiled_questions(employee_type),
+            'reviews': lambda: get_synced_reviews(reviewee_type=employee_type, cycle_id=cycle_id),
+        })
+        user_names, questions = loaded['user_names'], loaded['questions']
         if not questions:
             st.warning(f"Tidak ditemukan daftar pertanyaan untuk tipe '{employee_type}'.")
             return pd.DataFrame()
             
         question_headers = [f"Pertanyaan {i+1}" for i in range(len(questions))]
 
-        # 3. Ambil semua data review dari Firestore
-        reviews_ref = db.collection('reviews').stream()
         processed_data = []
 
-        for review in reviews_ref:
-            review_data = review.to_dict()
+        for review_data in loaded['reviews']:
             reviewee_uid = review_data.get('reviewee_uid')
-            
-            # Filter hanya untuk tipe karyawan yang dipilih
-            if user_types.get(reviewee_uid) != employee_type:
-                continue
 
             # Inisialisasi baris data
             row = {}
@@ -369,10 +1783,10 @@ def prepare_review_data_for_download(employee_type):
             responses = review_data.get('responses', {})
             
             # 4. Map jawaban ke header pertanyaan yang sudah urut
-            for i, question_key in enumerate(questions):
+            for i, question in enumerate(questions):
                 header = question_headers[i]
                 # Cari skor untuk pertanyaan ini di dalam response
-                score = responses.get(question_key, 'N/A') 
+                score = responses.get(question.key, 'N/A') 
                 row[header] = score
             
             # 5. Ambil data kualitatif
@@ -412,9 +1826,88 @@ def prepare_review_data_for_download(employee_type):
         st.error(f"Gagal memproses data untuk diunduh: {e}")
         return pd.DataFrame()
 
+@timed_helper
+def build_review_excel(df):
+    """Mengonversi DataFrame hasil review ke file Excel (.xlsx) di dalam memori."""
+    output = BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name='Hasil Review')
+    return output.getvalue()
+
+# --- ANALITIK ORGANISASI ---
+
+# Atribut reviewee yang bisa dipakai untuk pengelompokan di tab analitik
+ANALYTICS_DIMENSIONS = {'organization': "Organization", 'job_level': "Job Level", 'job_position': "Job Position"}
+
+@timed_helper
+def load_review_scores_frame(employee_type):
+    """
+    Mengambil review satu tipe karyawan (dari snapshot lokal) sebagai frame kolumnar berformat panjang
+    (review_id, reviewer_uid, reviewee_uid, question, score); hanya jawaban numerik yang disimpan.
+    """
+    snapshot = get_review_snapshot()
+    snapshot.sync()
+    scores = snapshot.scores(reviewee_type=employee_type)
+    return scores.astype({'question': 'category', 'reviewer_uid': 'category', 'reviewee_uid': 'category', 'score': 'float64'})
+
+def compute_review_analytics(scores, user_attributes):
+    """
+    Statistik organisasi dari frame skor panjang, seluruhnya dengan groupby/transform tervektorisasi:
+    rata-rata & simpangan baku per pertanyaan, distribusi per atribut reviewee, dan leniency reviewer
+    (rata-rata z-score skor yang diberikan, dinormalisasi per pertanyaan).
+    """
+    analytics = {}
+    analytics['per_question'] = scores.groupby('question', observed=True)['score'].agg(['mean', 'std', 'count'])
+
+    # Jumlah tiap nilai skor per reviewee dihitung sekali; setiap atribut reviewee (organization, job_level, job_position)
+    # cukup menjumlahkan baris per reviewee (ribuan), bukan mengelompokkan ulang ratusan ribu skor
+    score_counts = scores.groupby(['reviewee_uid', 'score'], observed=True).size().unstack('score', fill_value=0)
+    score_values = score_counts.columns.to_numpy(dtype='float64')
+    for dimension in ANALYTICS_DIMENSIONS:
+        group = user_attributes[dimension].reindex(score_counts.index.astype(object)).astype(object).fillna('(Tidak diisi)')
+        counts = score_counts.groupby(group.to_numpy()).sum()
+        counts.index.name = dimension
+        count = counts.sum(axis=1)
+        mean = counts.to_numpy() @ score_values / count
+        # Simpangan baku sampel (ddof=1) dari jumlah skor & kuadratnya, sama dengan Series.std
+        variance = (counts.to_numpy() @ (score_values ** 2) - count * mean ** 2) / (count - 1)
+        analytics[dimension] = pd.DataFrame({'mean': mean, 'std': np.sqrt(variance.clip(lower=0).where(count > 1)), 'count': count})
+        analytics[f"{dimension}_distribution"] = counts.div(count, axis=0)
+
+    grouped = scores.groupby('question', observed=True)['score']
+    question_std = grouped.transform('std').replace(0, np.nan)
+    z_scores = ((scores['score'] - grouped.transform('mean')) / question_std).fillna(0)
+    leniency = z_scores.groupby(scores['reviewer_uid'], observed=True).agg(['mean', 'count'])
+    leniency['reviews_given'] = scores.groupby('reviewer_uid', observed=True)['review_id'].nunique()
+    analytics['leniency'] = leniency.sort_values('mean', ascending=False)
+    return analytics
+
+@st.cache_data(ttl=600) # Cache data selama 10 menit
+@timed_helper
+def get_review_analytics(employee_type):
+    """Memuat skor review satu tipe dan menghitung seluruh statistik analitik organisasi."""
+    try:
+        loaded = load_concurrently({
+            'scores': lambda: load_review_scores_frame(employee_type),
+            'users': lambda: ready_user_directory().users,
+        })
+        scores = loaded['scores']
+        if scores.empty:
+            return None
+        users = pd.DataFrame.from_dict(loaded['users'], orient='index')
+        user_attributes = users.reindex(columns=list(ANALYTICS_DIMENSIONS))
+        analytics = compute_review_analytics(scores, user_attributes)
+        analytics['total_reviews'] = scores['review_id'].nunique()
+        analytics['total_scores'] = len(scores)
+        return analytics
+    except Exception as e:
+        st.error(f"Gagal menghitung analitik: {e}")
+        return None
+
 # --- TAMPILAN APLIKASI ---
 
 if st.session_state.user_info is None:
+    st.session_state.firestore_run_stats.page = "🔐 Login"
     st.title("Selamat Datang di Aplikasi Performance Review Rahsa Nusantara")
     
     login_tab, register_tab = st.tabs(["🔐 Login", "✍️ Registrasi Karyawan Baru"])
@@ -443,12 +1936,11 @@ if st.session_state.user_info is None:
             if st.form_submit_button("Login"):
                 if username and password:
                     try:
-                        # Logika login disederhanakan untuk contoh
-                        users_ref = db.collection('users').where(filter=FieldFilter('username', '==', username)).limit(1).stream()
-                        if not (user_docs := list(users_ref)):
+                        # Logika login disederhanakan untuk contoh; satu point get ke indeks username (fallback untuk akun lama)
+                        user_data = find_username_entry(username)
+                        if not user_data:
                             st.error("Username tidak ditemukan atau password salah.")
                         else:
-                            user_data = user_docs[0].to_dict()
                             # Di aplikasi nyata, verifikasi password harus dilakukan di sisi server
                             st.session_state.user_info = { 
                                 "uid": user_data.get('uid'), 
@@ -494,256 +1986,271 @@ else:
         if is_admin:
             menu_options.append("⚙️ Panel Admin")
         app_mode = st.radio("Menu Navigasi", menu_options)
+        st.session_state.firestore_run_stats.page = app_mode
         st.divider()
         if st.button("Logout", use_container_width=True):
-            st.session_state.user_info = None; st.rerun()
+            st.session_state.user_info = None; st.session_state.reviewer_context = None; st.rerun()
 
     if app_mode == "📝 Beri Review":
         st.title("📝 Dashboard Performance Review")
         st.info("Nama-nama karyawan di dropdown adalah rekan kerja yang perlu teman-teman beri penilaian. Penilaian mencakup atasan langsung (supervisor), bawahan (subordinate), dan rekan satu tim (peers). Beberapa karyawan juga diminta menilai 1 orang dari luar timnya, sesuai pembagian yang telah ditentukan.")
         reviewer_uid = user_info['uid']
-        all_assigned_reviewees = get_assigned_reviewees(reviewer_uid)
-        reviewed_uids = get_reviewed_uids(reviewer_uid)
-        pending_reviewees = {uid: name for uid, name in all_assigned_reviewees.items() if uid not in reviewed_uids}
-
-        if not pending_reviewees:
-            st.success("✅ Anda telah menyelesaikan semua review yang ditugaskan. Terima kasih atas partisipasi Anda!")
-        else:
-            selected_reviewee_uid = st.selectbox("Pilih Karyawan untuk Dinilai:", options=list(pending_reviewees.keys()), format_func=lambda uid: pending_reviewees[uid], index=None, placeholder="Pilih nama karyawan...")
+        reviewer_context = get_reviewer_context(reviewer_uid)
+        if reviewer_context is None:
+            st.button("🔄 Coba Lagi")
+            st.stop()
+
+        # Fragment: memilih reviewee atau mengisi form hanya menjalankan ulang bagian ini, bukan seluruh halaman
+        @st.fragment
+        @fragment_run_stats(app_mode)
+        def review_form_fragment():
+            pending_reviewees = reviewer_context['pending']
+            if not pending_reviewees:
+                st.success("✅ Anda telah menyelesaikan semua review yang ditugaskan. Terima kasih atas partisipasi Anda!")
+            else:
+                selected_reviewee_uid = st.selectbox("Pilih Karyawan untuk Dinilai:", options=list(pending_reviewees.keys()), format_func=lambda uid: pending_reviewees[uid], index=None, placeholder="Pilih nama karyawan...")
             
-            if selected_reviewee_uid:
-                reviewee_details = get_user_details(selected_reviewee_uid)
-                employee_type = reviewee_details.get('tipe_karyawan') if reviewee_details else None
-                if not employee_type:
-                    st.error("Tipe karyawan tidak ditemukan.")
-                else:
-                    st.divider()
-                    st.header(f"Formulir untuk: {pending_reviewees[selected_reviewee_uid]} ({employee_type.capitalize()})")
+                if selected_reviewee_uid:
+                    employee_type = reviewer_context['types'].get(selected_reviewee_uid)
+                    if not employee_type:
+                        st.error("Tipe karyawan tidak ditemukan.")
+                    else:
+                        st.divider()
+                        st.header(f"Formulir untuk: {pending_reviewees[selected_reviewee_uid]} ({employee_type.capitalize()})")
                     
-                    questions = get_review_questions(employee_type)
-                    if questions:
-                        with st.form("review_form"):
+                        questions = reviewer_context['questions'].get(employee_type, ())
+                        if questions:
+                            with st.form("review_form"):
                             
-                            # --- BAGIAN I: PENILAIAN KUANTITATIF (TERGANTUNG TIPE) ---
-                            if employee_type == 'office':
-                                st.info(
-                                    """
-                                    **Before you fill the performance scoring session, please keep in mind that this is a scale-based score. The scale interpretation as mentioned below:**
+                                # --- BAGIAN I: PENILAIAN KUANTITATIF (TERGANTUNG TIPE) ---
+                                if employee_type == 'office':
+                                    st.info(
+                                        """
+                                        **Before you fill the performance scoring session, please keep in mind that this is a scale-based score. The scale interpretation as mentioned below:**
                                     
-                                    **Sebelum mengisi sesi penilaian performa, mohon diingat bahwa ini merupakan penilaian berbasis skala. Skala yang digunakan memiliki interpretasi sebagai berikut:**
+                                        **Sebelum mengisi sesi penilaian performa, mohon diingat bahwa ini merupakan penilaian berbasis skala. Skala yang digunakan memiliki interpretasi sebagai berikut:**
                                     
-                                    ---
-                                    - **1 = high-improvement needed** (*perlu banyak pengembangan*)
-                                    - **2 = small-improvement needed** (*masih perlu pengembangan*)
-                                    - **3 = target achieved** (*memenuhi target*)
-                                    - **4 = more than achieved** (*memenuhi diatas target*)
-                                    - **5 = excellently achieved** (*sangat melebihi target*)
-                                    ---
-                                    Guidelines lebih lengkap mengenai skala penilaian dapat dicek di [bit.ly/RN_PRGuidelines](https://bit.ly/RN_PRGuidelines)
-                                    Teman-teman diharapkan dapat menilai dengan menjawab pertanyaan dengan se-objektif mungkin dan sesuai dengan keadaan sebenar-benarnya. Informasi mengenai hal ini bersifat *confidential* akan di-keep oleh tim PnC dan dijamin kerahasiaannya.
-                                    """
-                                )
-                                st.markdown(f"**Bagian I: Penilaian Kuantitatif**")
-                                responses = {}
-                                for i, q in enumerate(questions):
-                                    parts = q.split('|') if '|' in q else [q, '']
-                                    question_label = f"**{parts[0].strip()}**<br><small>{parts[1].strip()}</small>"
-                                    st.markdown(question_label, unsafe_allow_html=True)
-                                    score = st.slider(f"slider_{i}", 1, 5, 3, key=f"q_{i}", label_visibility="collapsed")
-                                    responses[q] = score
-                                    st.divider()
-                            
-                            elif employee_type == 'operator':
-                                st.info("Teman-teman diharapkan dapat menilai dengan menjawab pertanyaan dengan se-objektif mungkin dan sesuai dengan keadaan sebenar-benarnya.")
-                                st.markdown(f"**Bagian I: Penilaian Kuantitatif**")
-                                selections = {} 
-                                for i, q in enumerate(questions):
-                                    parts = q.split(';')
-                                    if len(parts) >= 4:
-                                        question_text = parts[0].strip()
-                                        options = [p.strip() for p in parts[1:4]]
-                                        st.markdown(f"**{question_text}**")
-                                        selections[q] = st.radio(f"radio_{i}", options, index=None, key=f"q_{i}", label_visibility="collapsed")
+                                        ---
+                                        - **1 = high-improvement needed** (*perlu banyak pengembangan*)
+                                        - **2 = small-improvement needed** (*masih perlu pengembangan*)
+                                        - **3 = target achieved** (*memenuhi target*)
+                                        - **4 = more than achieved** (*memenuhi diatas target*)
+                                        - **5 = excellently achieved** (*sangat melebihi target*)
+                                        ---
+                                        Guidelines lebih lengkap mengenai skala penilaian dapat dicek di [bit.ly/RN_PRGuidelines](https://bit.ly/RN_PRGuidelines)
+                                        Teman-teman diharapkan dapat menilai dengan menjawab pertanyaan dengan se-objektif mungkin dan sesuai dengan keadaan sebenar-benarnya. Informasi mengenai hal ini bersifat *confidential* akan di-keep oleh tim PnC dan dijamin kerahasiaannya.
+                                        """
+                                    )
+                                    st.markdown(f"**Bagian I: Penilaian Kuantitatif**")
+                                    responses = {}
+                                    for i, q in enumerate(questions):
+                                        st.markdown(q.label_html(), unsafe_allow_html=True)
+                                        score = st.slider(f"slider_{i}", 1, q.max_score, 3, key=f"q_{i}", label_visibility="collapsed")
+                                        responses[q.key] = score
                                         st.divider()
                             
-                            # --- BAGIAN II: PENILAIAN KUALITATIF (TERGANTUNG TIPE) ---
-                            st.markdown(f"**Bagian II: Penilaian Kualitatif**")
+                                elif employee_type == 'operator':
+                                    st.info("Teman-teman diharapkan dapat menilai dengan menjawab pertanyaan dengan se-objektif mungkin dan sesuai dengan keadaan sebenar-benarnya.")
+                                    st.markdown(f"**Bagian I: Penilaian Kuantitatif**")
+                                    selections = {} 
+                                    for i, q in enumerate(questions):
+                                        if len(q.options) >= 3:
+                                            st.markdown(q.label_html())
+                                            selections[q] = st.radio(f"radio_{i}", q.options, index=None, key=f"q_{i}", label_visibility="collapsed")
+                                            st.divider()
+                            
+                                # --- BAGIAN II: PENILAIAN KUALITATIF (TERGANTUNG TIPE) ---
+                                st.markdown(f"**Bagian II: Penilaian Kualitatif**")
 
-                            # --- PERUBAHAN 1: Logika kondisional untuk Komentar & Saran Pengembangan ---
-                            if employee_type == 'office':
-                                st.markdown("##### Comment (Komentar) (Wajib Diisi)")
-                                comment = st.text_area("comment_office", label_visibility="collapsed",placeholder="Ketentuan:\n1. Harus memberikan catatan yang berarti untuk pengembangan karyawan\n2. Tidak menyebutkan nama karyawan → diganti dengan 'Karyawan ini'\n3. Tidak boleh tidak diisi atau dikosongkan")
-                                st.caption("""
-                                Comment:
+                                # --- PERUBAHAN 1: Logika kondisional untuk Komentar & Saran Pengembangan ---
+                                if employee_type == 'office':
+                                    st.markdown("##### Comment (Komentar) (Wajib Diisi)")
+                                    comment = st.text_area("comment_office", label_visibility="collapsed",placeholder="Ketentuan:\n1. Harus memberikan catatan yang berarti untuk pengembangan karyawan\n2. Tidak menyebutkan nama karyawan → diganti dengan 'Karyawan ini'\n3. Tidak boleh tidak diisi atau dikosongkan")
+                                    st.caption("""
+                                    Comment:
 
-                                Silakan masukan beberapa catatan yang perlu untuk diketahui karyawan ini, boleh juga menggunakan metode I like (apa yang saya suka dari kekuatan karyawan ini & dampaknya), I wonder (area apa yang menurut saya masih bisa ditajamkan), dan I wish (apa harapan konkret saya untuk karyawan ini, fokus pada perilaku, bukan pribadi)
+                                    Silakan masukan beberapa catatan yang perlu untuk diketahui karyawan ini, boleh juga menggunakan metode I like (apa yang saya suka dari kekuatan karyawan ini & dampaknya), I wonder (area apa yang menurut saya masih bisa ditajamkan), dan I wish (apa harapan konkret saya untuk karyawan ini, fokus pada perilaku, bukan pribadi)
                                 
-                                Contoh: Karyawan ini sangat positif dalam bekerja baik secara individu maupun dalam tim. Ia menyelesaikan pekerjaannya dengan cepat dan berkualitas. Akan baik jika karyawan ini bisa lebih menguasai tentang metode-metode yang mendukung pekerjaannya.
+                                    Contoh: Karyawan ini sangat positif dalam bekerja baik secara individu maupun dalam tim. Ia menyelesaikan pekerjaannya dengan cepat dan berkualitas. Akan baik jika karyawan ini bisa lebih menguasai tentang metode-metode yang mendukung pekerjaannya.
                                 
-                                """)
+                                    """)
                                 
-                                st.markdown("##### Saran Pengembangan (Wajib Diisi)")
-                                dev_suggestion = st.text_area("dev_suggestion_office", label_visibility="collapsed")
-                                st.caption("""
-                                Saran Pengembangan:
+                                    st.markdown("##### Saran Pengembangan (Wajib Diisi)")
+                                    dev_suggestion = st.text_area("dev_suggestion_office", label_visibility="collapsed")
+                                    st.caption("""
+                                    Saran Pengembangan:
 
-                                Silakan masukan saran pengembangan untuk karyawan ini, dapat berupa arahan teknis atau jenis pelatihan yang perlu untuk diikuti oleh karyawan ini. Sertakan skill prioritas dan metode pengembangan (training, mentoring, proyek rotasi).
+                                    Silakan masukan saran pengembangan untuk karyawan ini, dapat berupa arahan teknis atau jenis pelatihan yang perlu untuk diikuti oleh karyawan ini. Sertakan skill prioritas dan metode pengembangan (training, mentoring, proyek rotasi).
                                 
-                                Contoh: Karyawan ini akan baik jika mengikuti training Scrum dan Design Thinking. 
-                                """)
+                                    Contoh: Karyawan ini akan baik jika mengikuti training Scrum dan Design Thinking. 
+                                    """)
                             
-                            elif employee_type == 'operator':
-                                st.markdown("##### Komentar (Wajib Diisi)")
-                                comment = st.text_area("comment_operator", label_visibility="collapsed")
-                                st.caption("""
-                                Silakan masukan beberapa catatan yang perlu untuk diketahui karyawan ini, boleh menggunakan metode apa yang saya suka dari karyawan ini, apa yang saya pikir baik untuk karyawan ini jika ia lakukan/miliki, dan apa yang saya pikir karyawan ini harus lakukan/miliki dalam kolom komentar operator. 
+                                elif employee_type == 'operator':
+                                    st.markdown("##### Komentar (Wajib Diisi)")
+                                    comment = st.text_area("comment_operator", label_visibility="collapsed")
+                                    st.caption("""
+                                    Silakan masukan beberapa catatan yang perlu untuk diketahui karyawan ini, boleh menggunakan metode apa yang saya suka dari karyawan ini, apa yang saya pikir baik untuk karyawan ini jika ia lakukan/miliki, dan apa yang saya pikir karyawan ini harus lakukan/miliki dalam kolom komentar operator. 
                                 
-                                *Contoh: Karyawan ini sangat positif dalam bekerja baik secara individu maupun dalam tim. Ia menyelesaikan pekerjaannya dengan cepat dan berkualitas. Akan lebih baik jika karyawan ini bisa lebih menguasai tentang metode-metode yang mendukung pekerjaannya.*
-                                """)
-                                dev_suggestion = None # Tidak ada saran pengembangan untuk operator
+                                    *Contoh: Karyawan ini sangat positif dalam bekerja baik secara individu maupun dalam tim. Ia menyelesaikan pekerjaannya dengan cepat dan berkualitas. Akan lebih baik jika karyawan ini bisa lebih menguasai tentang metode-metode yang mendukung pekerjaannya.*
+                                    """)
+                                    dev_suggestion = None # Tidak ada saran pengembangan untuk operator
 
-                            # --- Tombol & Logika Submit ---
-                            if st.form_submit_button("Kirim Review"):
-                                all_quantitative_answered = True
-                                if employee_type == 'office':
-                                    # 'responses' sudah terisi oleh slider
-                                    pass
-                                elif employee_type == 'operator':
-                                    responses = {}
-                                    for q, selection in selections.items():
-                                        if selection is None:
-                                            all_quantitative_answered = False
-                                            break
-                                        options_list = [p.strip() for p in q.split(';')[1:4]]
-                                        responses[q] = options_list.index(selection) + 1
+                                # --- Tombol & Logika Submit ---
+                                if st.form_submit_button("Kirim Review"):
+                                    all_quantitative_answered = True
+                                    if employee_type == 'office':
+                                        # 'responses' sudah terisi oleh slider
+                                        pass
+                                    elif employee_type == 'operator':
+                                        responses = {}
+                                        for q, selection in selections.items():
+                                            if selection is None:
+                                                all_quantitative_answered = False
+                                                break
+                                            responses[q.key] = q.options.index(selection) + 1
                                 
-                                # --- PERUBAHAN 2: Validasi input yang disesuaikan ---
-                                validation_passed = True
-                                if not all_quantitative_answered:
-                                    st.error("Mohon jawab semua pertanyaan pada Bagian I (Penilaian Kuantitatif).")
-                                    validation_passed = False
+                                    # --- PERUBAHAN 2: Validasi input yang disesuaikan ---
+                                    validation_passed = True
+                                    if not all_quantitative_answered:
+                                        st.error("Mohon jawab semua pertanyaan pada Bagian I (Penilaian Kuantitatif).")
+                                        validation_passed = False
                                 
-                                if not comment:
-                                    st.error("Mohon isi bagian Komentar. Kolom ini wajib diisi.")
-                                    validation_passed = False
+                                    if not comment:
+                                        st.error("Mohon isi bagian Komentar. Kolom ini wajib diisi.")
+                                        validation_passed = False
                                 
-                                if employee_type == 'office' and not dev_suggestion:
-                                    st.error("Mohon isi bagian Saran Pengembangan. Kolom ini wajib diisi.")
-                                    validation_passed = False
-
-                                if validation_passed:
-                                    responses['Komentar'] = comment
-                                    if employee_type == 'office':
-                                        responses['Saran Pengembangan'] = dev_suggestion
+                                    if employee_type == 'office' and not dev_suggestion:
+                                        st.error("Mohon isi bagian Saran Pengembangan. Kolom ini wajib diisi.")
+                                        validation_passed = False
+
+                                    if validation_passed:
+                                        responses['Komentar'] = comment
+                                        if employee_type == 'office':
+                                            responses['Saran Pengembangan'] = dev_suggestion
                                     
-                                    if submit_review(reviewer_uid, selected_reviewee_uid, responses):
-                                        st.toast("Review berhasil dikirim! ✅")
-                                        time.sleep(1)
-                                        st.rerun()
+                                        if submit_review(reviewer_uid, selected_reviewee_uid, employee_type, responses):
+                                            # Konteks dimuat ulang pada rerun penuh berikutnya agar reviewee ini hilang dari daftar
+                                            st.session_state.reviewer_context = None
+                                            st.toast("Review berhasil dikirim! ✅")
+                                            time.sleep(1)
+                                            st.rerun()
+
+        review_form_fragment()
     
     elif app_mode == "📊 Lihat Hasil Saya":
         st.title("📊 Hasil Performance Review Anda")
-        my_reviews = get_my_reviews(user_info['uid'])
-        if not my_reviews:
+        # Ringkasan cukup dari satu dokumen agregat; daftar review lengkap hanya dimuat saat diminta
+        aggregate = get_review_aggregate(user_info['uid'])
+        if not aggregate or not aggregate.get('review_count'):
             st.info("Belum ada hasil review yang tersedia untuk Anda.")
         else:
-            st.markdown(f"Anda telah menerima **{len(my_reviews)}** penilaian. Berikut adalah rinciannya:")
-            user_details = get_user_details(user_info['uid'])
-            employee_type = user_details.get('tipe_karyawan') if user_details else None
-
-            my_reviews.sort(key=lambda r: r.get('timestamp', pd.Timestamp.min), reverse=True)
-            
-            # --- PERBAIKAN: Inisialisasi di luar loop ---
-            question_scores = {}
-            total_scores_list = []
-            all_comments_text = ""
-
-            for i, review in enumerate(my_reviews):
-                review_date = review.get('timestamp', 'N/A')
-                if hasattr(review_date, 'strftime'):
-                    review_date = review_date.strftime('%d %B %Y, %H:%M')
-                    
-                with st.expander(f"**Penilaian ke-{i + 1}** (Diterima pada: `{review_date}`)", expanded=(i==0)):
-                    scores = {k: v for k, v in review.get('responses', {}).items() if isinstance(v, (int, float))}
-                    comments = {k: v for k, v in review.get('responses', {}).items() if isinstance(v, str)}
-                    
-                    if scores:
-                        st.subheader("Penilaian Kuantitatif")
-                        for question, score in scores.items():
-                            if question not in question_scores:
-                                question_scores[question] = []
-                            question_scores[question].append(score)
-                            total_scores_list.append(score)
-
-                            if employee_type == 'operator' and ';' in question:
-                                parts = question.split(';')
-                                if len(parts) > int(score):
-                                    question_text = parts[0].strip()
-                                    answer_text = parts[int(score)].strip()
-                                    st.markdown(f"**{question_text}**")
-                                    st.info(f"Jawaban: {answer_text}")
-                                else:
-                                    st.markdown(f"**{question}** (Data tidak lengkap)")
-                            
-                            else: # Untuk tipe Office
-                                question_display = question.split('|')[0].strip() if '|' in question else question
-                                max_value = 5
-                                st.markdown(f"**{question_display}**")
-                                st.progress(score / max_value)
-                                st.caption(f"Skor: {score}/{max_value}")
-                            st.markdown("---")
-                    
-                    if comments:
-                        st.subheader("Masukan Kualitatif")
-                        comment_text = comments.get('Komentar') or comments.get('Komentar Umum')
-                        if comment_text:
-                            st.markdown("**Comment (Komentar)**")
-                            st.info(comment_text)
-                            all_comments_text += f"- Komentar: {comment_text}\n"
-                        if 'Saran Pengembangan' in comments:
-                            st.markdown("**Saran Pengembangan**")
-                            st.info(comments['Saran Pengembangan'])
-                            all_comments_text += f"- Saran Pengembangan: {comments['Saran Pengembangan']}\n"
-                        all_comments_text += "---\n"
+            review_count = aggregate['review_count']
+            employee_type = aggregate.get('reviewee_type')
+            if not employee_type:
+                user_details = get_users_by_uids([user_info['uid']]).get(user_info['uid'])
+                employee_type = user_details.get('tipe_karyawan') if user_details else None
+            questions_by_key = get_question_catalog(employee_type) if employee_type else {}
+            st.markdown(f"Anda telah menerima **{review_count}** penilaian.")
 
-            st.divider()
             st.header("Ringkasan dan Rata-Rata Penilaian")
 
-            if total_scores_list:
+            if aggregate.get('score_count'):
                 max_value = 5 if employee_type == 'office' else 3
-                overall_average = sum(total_scores_list) / len(total_scores_list)
+                overall_average = aggregate['overall_average']
                 st.metric(label="Rata-Rata Nilai Keseluruhan", value=f"{overall_average:.2f} / {max_value}")
                 st.progress(overall_average / max_value)
                 st.markdown("---")
 
                 st.subheader("Rincian Rata-Rata per Item Pertanyaan")
-                for question, scores_list in question_scores.items():
-                    avg_score = sum(scores_list) / len(scores_list)
-                    
-                    if employee_type == 'operator' and ';' in question:
-                        question_display = question.split(';')[0].strip()
-                    elif '|' in question:
-                        question_display = f"**{question.split('|')[0].strip()}**<br><small>{question.split('|')[1].strip()}</small>"
-                    else:
-                        question_display = question
-                    
-                    st.markdown(question_display, unsafe_allow_html=True)
-                    st.text(f"Rata-rata Skor: {avg_score:.2f}")
+                # Urutkan sesuai daftar pertanyaan saat ini; pertanyaan lama yang sudah dihapus ditaruh di akhir
+                question_stats = aggregate.get('questions', {})
+                question_order = {q.key: i for i, q in enumerate(get_compiled_questions(employee_type))} if employee_type else {}
+                for question in sorted(question_stats, key=lambda q: question_order.get(q, len(question_order))):
+                    avg_score, std_score = question_mean_std(question_stats[question])
+                    st.markdown(resolve_question(question, employee_type, questions_by_key).label_html(), unsafe_allow_html=True)
+                    st.text(f"Rata-rata Skor: {avg_score:.2f} (simpangan baku {std_score:.2f}, {question_stats[question]['count']} penilai)")
                     st.divider()
             else:
                 st.info("Tidak ada data penilaian kuantitatif untuk dihitung rata-ratanya.")
+
+            st.header("Rincian Setiap Penilaian")
+            show_details = st.toggle("Tampilkan semua penilaian yang Anda terima", key="show_review_details")
+            my_reviews = get_my_reviews_memoized(user_info['uid'], review_count, load=show_details)
+
+            if show_details:
+                for i, review in enumerate(my_reviews):
+                    review_date = review.get('timestamp', 'N/A')
+                    if hasattr(review_date, 'strftime'):
+                        review_date = review_date.strftime('%d %B %Y, %H:%M')
+                        
+                    with st.expander(f"**Penilaian ke-{i + 1}** (Diterima pada: `{review_date}`)", expanded=(i==0)):
+                        scores = {k: v for k, v in review.get('responses', {}).items() if isinstance(v, (int, float))}
+                        comments = {k: v for k, v in review.get('responses', {}).items() if isinstance(v, str)}
+                        
+                        if scores:
+                            st.subheader("Penilaian Kuantitatif")
+                            for question, score in scores.items():
+                                q = resolve_question(question, employee_type, questions_by_key)
+                                if q.options:
+                                    answer_text = q.answer_for(score)
+                                    if answer_text is not None:
+                                        st.markdown(f"**{q.text}**")
+                                        st.info(f"Jawaban: {answer_text}")
+                                    else:
+                                        st.markdown(f"**{q.text}** (Data tidak lengkap)")
+                                
+                                else: # Untuk tipe Office
+                                    st.markdown(f"**{q.text}**")
+                                    st.progress(score / q.max_score)
+                                    st.caption(f"Skor: {score}/{q.max_score}")
+                                st.markdown("---")
+                        
+                        if comments:
+                            st.subheader("Masukan Kualitatif")
+                            comment_text = comments.get('Komentar') or comments.get('Komentar Umum')
+                            if comment_text:
+                                st.markdown("**Comment (Komentar)**")
+                                st.info(comment_text)
+                            if 'Saran Pengembangan' in comments:
+                                st.markdown("**Saran Pengembangan**")
+                                st.info(comments['Saran Pengembangan'])
             
             # --- BAGIAN BARU: Tombol Generate Rangkuman AI ---
+            st.divider()
             st.header("Analisis Rangkuman dengan AI")
+
+            # Rangkuman yang sudah pernah dibuat untuk komentar yang sama langsung ditampilkan dari cache.
+            # Bundel komentar diambil dari agregat; agregat lama tanpa bundel memakai review yang sudah dimuat.
+            all_comments_text = aggregate.get('comments_bundle')
+            if all_comments_text is None and my_reviews is not None:
+                all_comments_text = build_comments_bundle(my_reviews)
+            if all_comments_text is not None:
+                summary_key = summary_cache_key(all_comments_text)
+                if st.session_state.gemini_summary_key != summary_key:
+                    st.session_state.gemini_summary = get_cached_summary(all_comments_text)
+                    st.session_state.gemini_summary_key = summary_key
+            elif st.session_state.gemini_summary_key is not None:
+                # Review belum dimuat, jadi rangkuman sesi sebelumnya belum bisa dipastikan masih berlaku
+                st.session_state.gemini_summary = None
+                st.session_state.gemini_summary_key = None
             
-            if not generation_model:
+            summary_streamed = False
+            if st.session_state.gemini_summary:
+                st.caption("Rangkuman di bawah diambil dari cache dan akan dibuat ulang otomatis saat ada review baru.")
+            elif not ai_summary_available():
                 st.warning("Fitur rangkuman AI tidak tersedia. Mohon atur API Key Anda di file `config.py`.", icon="🔒")
             elif st.button("✨ Buat Rangkuman dengan AI"):
-                with st.spinner("AI sedang menganalisis dan membuat rangkuman... Ini mungkin memerlukan beberapa saat."):
-                    summary = generate_summary_with_gemini(all_comments_text)
-                    st.session_state.gemini_summary = summary
+                if all_comments_text is None:
+                    all_comments_text = build_comments_bundle(get_my_reviews_memoized(user_info['uid'], review_count))
+                # Teks ditulis bertahap begitu token pertama tiba, bukan menunggu rangkuman selesai
+                try:
+                    st.session_state.gemini_summary = st.write_stream(stream_summary_with_gemini(all_comments_text))
+                    st.session_state.gemini_summary_key = summary_cache_key(all_comments_text)
+                    summary_streamed = True
+                except Exception as e:
+                    st.error(f"Gagal menghasilkan rangkuman dari AI: {e}")
             
-            if st.session_state.gemini_summary:
+            if st.session_state.gemini_summary and not summary_streamed:
                 st.markdown(st.session_state.gemini_summary)
 
     elif app_mode == "⭐ Beri Ulasan Aplikasi":
@@ -751,7 +2258,7 @@ else:
         st.markdown("Kami sangat menghargai masukan Anda untuk membuat platform ini lebih baik lagi di masa mendatang.")
         st.divider()
 
-        if has_user_submitted_feedback(user_info['uid']):
+        if has_user_submitted_feedback(user_info):
             st.success("✅ Terima kasih! Anda sudah pernah memberikan ulasan untuk aplikasi ini.")
             st.info("Setiap pengguna hanya dapat memberikan ulasan sebanyak satu kali.")
         else:
@@ -759,7 +2266,7 @@ else:
                 st.subheader("Seberapa mudah penggunaan platform ini untuk performance review?")
                 ease_of_use = st.radio(
                     "Pilih salah satu:",
-                    options=["4 - Sangat Mudah", "3 - Mudah", "2 - Agak Sulit", "1 - Sangat Sulit"],
+                    options=[f"{rating} - {label}" for rating, label in FEEDBACK_RATING_LABELS.items()],
                     index=None, label_visibility="collapsed"
                 )
                 st.subheader("Apakah ada saran untuk pelaksanaan Performance Review berikutnya?")
@@ -770,18 +2277,23 @@ else:
                         st.warning("Mohon pilih tingkat kemudahan penggunaan platform.")
                     else:
                         rating_value = int(ease_of_use.split(" - ")[0])
-                        if process_app_feedback_submission(user_info['uid'], user_info['nama'], rating_value, suggestion):
+                        if process_app_feedback_submission(user_info, rating_value, suggestion):
                             time.sleep(1)
                             st.rerun()
 
     elif app_mode == "⚙️ Panel Admin" and is_admin:
         st.title("⚙️ Panel Admin")
         # --- PERUBAHAN 1: Menambahkan tab ke-4 untuk unduh data ---
-        admin_tab1, admin_tab2, admin_tab3, admin_tab4 = st.tabs([
+        admin_tab1, admin_tab2, admin_tab3, admin_tab4, admin_tab5, admin_tab6, admin_tab7, admin_tab8, admin_tab9 = st.tabs([
             "📝 Kelola Pertanyaan", 
             "🔗 Kelola Penugasan", 
             "📊 Status Pengerjaan",
-            "📥 Unduh Hasil Review"
+            "📥 Unduh Hasil Review",
+            "🤖 Rangkuman AI",
+            "👥 Impor Karyawan",
+            "📈 Analitik Organisasi",
+            "🩺 Diagnostik Firestore",
+            "⭐ Ulasan Aplikasi"
         ])
         
         with admin_tab1:
@@ -797,9 +2309,16 @@ else:
             **Untuk Tipe Operator (Pilihan Ganda Deskriptif):**
             - Gunakan pemisah `;` (titik koma).
             - Format: `Pertanyaan;Pilihan untuk skor 1;Pilihan untuk skor 2;Pilihan untuk skor 3`
+
+            **ID Pertanyaan:**
+            - Awalan `[q3]` adalah ID pertanyaan yang disimpan di setiap review. Pertahankan awalan ini saat mengubah teks agar jawaban lama tetap terhubung.
+            - Baris baru tanpa awalan akan otomatis diberi ID baru.
             """)
             current_questions = get_review_questions(q_type)
-            questions_text = "\n".join(current_questions)
+            compiled_questions = get_compiled_questions(q_type)
+            questions_text = "\n".join(
+                raw if q.key == raw else f"[{q.key}] {raw}" for q, raw in zip(compiled_questions, current_questions)
+            )
             st.markdown(f"**Edit pertanyaan untuk tipe `{q_type}` di bawah ini (satu pertanyaan per baris):**")
             new_questions_text = st.text_area("Daftar Pertanyaan:", value=questions_text, height=400, key=f"questions_{q_type}")
             if st.button("Simpan Perubahan Pertanyaan", key=f"save_{q_type}"):
@@ -810,8 +2329,7 @@ else:
             st.header("Kelola Penugasan Reviewer")
             assignment_type_to_manage = st.radio("Pilih tipe penugasan untuk dikelola:", ("office", "operator"), horizontal=True, key="assignment_type")
             
-            all_users_data = get_all_users()
-            user_names_map = {data['nama']: uid for uid, data in all_users_data.items() if 'nama' in data}
+            user_names_map = ready_user_directory().name_to_uid
             user_names_list = sorted(user_names_map.keys())
     
             with st.form("add_assignment_form"):
@@ -833,21 +2351,94 @@ else:
                                 st.rerun() 
                     else:
                         st.warning("Harap pilih Reviewer dan Reviewee.")
+
+            with st.expander("📤 Impor / Ganti Penugasan dari Spreadsheet"):
+                st.markdown("Unggah file CSV/XLSX dengan kolom `Reviewer` dan `Reviewee` berisi nama karyawan.")
+                assignment_file = st.file_uploader("File penugasan", type=["csv", "xlsx"], key=f"assignment_file_{assignment_type_to_manage}")
+                replace_existing = st.checkbox(
+                    f"Ganti seluruh penugasan tipe `{assignment_type_to_manage}` (penugasan yang tidak ada di file akan dihapus)",
+                    key=f"assignment_replace_{assignment_type_to_manage}"
+                )
+                if assignment_file is not None and st.button("🔍 Pratinjau Perubahan (Dry Run)"):
+                    try:
+                        desired_pairs, rejected_rows = parse_assignment_sheet(read_spreadsheet(assignment_file), user_names_map)
+                        st.session_state.assignment_import_plan = plan_assignment_import(assignment_type_to_manage, desired_pairs, replace_existing)
+                        st.session_state.assignment_import_rejected = rejected_rows
+                    except Exception as e:
+                        st.error(f"File tidak dapat diproses: {e}")
+
+                plan = st.session_state.get('assignment_import_plan')
+                if plan and plan['assignment_type'] == assignment_type_to_manage:
+                    st.write(f"➕ **{len(plan['to_add'])}** ditambahkan · ➖ **{len(plan['to_delete'])}** dihapus · ✔️ **{plan['unchanged']}** tidak berubah")
+                    if st.session_state.assignment_import_rejected:
+                        st.warning(f"{len(st.session_state.assignment_import_rejected)} baris ditolak:")
+                        st.dataframe(pd.DataFrame(st.session_state.assignment_import_rejected), use_container_width=True)
+                    if plan['to_add']:
+                        user_names = ready_user_directory().names
+                        st.dataframe(pd.DataFrame(
+                            [{"Reviewer": user_names.get(r, r), "Reviewee": user_names.get(e, e)} for r, e in plan['to_add']]
+                        ), use_container_width=True)
+                    if (plan['to_add'] or plan['to_delete']) and st.button("✅ Terapkan Perubahan"):
+                        if apply_assignment_import(plan):
+                            st.session_state.assignment_import_plan = None
+                            st.toast("Penugasan berhasil diperbarui! ✅")
+                            st.cache_data.clear()
+                            time.sleep(1)
+                            st.rerun()
             st.divider()
             st.subheader(f"Daftar Penugasan Saat Ini (Tipe: `{assignment_type_to_manage.capitalize()}`)")
-            assignments = get_all_assignments(assignment_type_to_manage)
+            col1, col2, col3 = st.columns([3, 3, 1])
+            with col1:
+                filter_reviewer = st.selectbox("Filter Reviewer:", options=user_names_list, index=None, placeholder="Semua reviewer", key="filter_reviewer")
+            with col2:
+                filter_reviewee = st.selectbox("Filter Reviewee:", options=user_names_list, index=None, placeholder="Semua reviewee", key="filter_reviewee")
+            with col3:
+                page_size = st.selectbox("Per halaman", options=(25, 50, 100), key="assignment_page_size")
+
+            # Cursor tiap halaman disimpan agar bisa kembali ke halaman sebelumnya; reset saat filter berubah
+            page_key = (assignment_type_to_manage, filter_reviewer, filter_reviewee, page_size)
+            if st.session_state.get('assignment_pages', {}).get('key') != page_key:
+                st.session_state.assignment_pages = {'key': page_key, 'cursors': [None], 'page': 0}
+            pages = st.session_state.assignment_pages
+
+            assignments, next_cursor = get_assignments_page(
+                assignment_type_to_manage, page_size, pages['cursors'][pages['page']],
+                reviewer_uid=user_names_map.get(filter_reviewer), reviewee_uid=user_names_map.get(filter_reviewee)
+            )
             if not assignments:
-                st.info("Belum ada penugasan yang dibuat untuk tipe ini.")
+                st.info("Belum ada penugasan yang dibuat untuk tipe ini." if pages['page'] == 0 else "Tidak ada penugasan lagi.")
             else:
-                for assignment in assignments:
-                    col1, col2, col3, col4 = st.columns([3, 1, 3, 1])
-                    with col1: st.write(f"**{assignment['reviewer_name']}**")
-                    with col2: st.write("➔")
-                    with col3: st.write(f"**{assignment['reviewee_name']}**")
-                    with col4:
-                        if st.button("Hapus", key=f"del_{assignment['id']}", use_container_width=True):
-                            delete_assignment(assignment['id'])
-                            st.rerun()
+                edited = st.data_editor(
+                    pd.DataFrame([
+                        {"Hapus": False, "Reviewer": a['reviewer_name'], "Reviewee": a['reviewee_name'], "Selesai": a['completed'], "id": a['id']}
+                        for a in assignments
+                    ]),
+                    column_config={"id": None},
+                    disabled=["Reviewer", "Reviewee", "Selesai"],
+                    hide_index=True,
+                    use_container_width=True,
+                    key=f"assignment_editor_{page_key}_{pages['page']}"
+                )
+                selected_ids = edited.loc[edited['Hapus'], 'id'].tolist()
+                if st.button(f"🗑️ Hapus {len(selected_ids)} Penugasan Terpilih", disabled=not selected_ids):
+                    if delete_assignments(selected_ids):
+                        st.session_state.pop('assignment_pages', None)
+                        st.cache_data.clear()
+                        st.rerun()
+
+            nav1, nav2, nav3 = st.columns([1, 2, 1])
+            with nav1:
+                if st.button("⬅️ Sebelumnya", disabled=pages['page'] == 0, use_container_width=True):
+                    pages['page'] -= 1
+                    st.rerun()
+            with nav2:
+                st.caption(f"Halaman {pages['page'] + 1}")
+            with nav3:
+                if st.button("Berikutnya ➡️", disabled=next_cursor is None, use_container_width=True):
+                    del pages['cursors'][pages['page'] + 1:]
+                    pages['cursors'].append(next_cursor)
+                    pages['page'] += 1
+                    st.rerun()
         
         with admin_tab3:
             st.header("Pantau Status Pengerjaan Review")
@@ -860,15 +2451,14 @@ else:
     
             if st.button("🔄 Muat Ulang Data"):
                 st.cache_data.clear()
+                st.session_state.completion_pages.pop(status_type, None)
     
-            df_status = get_review_completion_status(status_type)
+            completed_count, total_assignments = get_review_completion_status(status_type)
     
-            if df_status.empty:
+            if total_assignments == 0:
                 st.info(f"Belum ada data penugasan atau review untuk tipe '{status_type}'.")
             else:
-                total_assignments = len(df_status)
-                completed_count = len(df_status[df_status['Status'] == "✅ Selesai"])
-                completion_rate = (completed_count / total_assignments) * 100 if total_assignments > 0 else 0
+                completion_rate = (completed_count / total_assignments) * 100
     
                 st.metric(
                     label=f"Progres Penyelesaian Tipe '{status_type.capitalize()}'",
@@ -876,13 +2466,33 @@ else:
                     delta=f"{completion_rate:.1f}% Selesai"
                 )
                 st.progress(completion_rate / 100)
-                st.dataframe(df_status, use_container_width=True)
+
+                # Rincian diambil per halaman hanya saat diminta
+                page_state = st.session_state.completion_pages.setdefault(status_type, {'rows': [], 'cursor': None, 'done': False})
+                if not page_state['done']:
+                    load_label = "📄 Tampilkan Rincian" if not page_state['rows'] else "⬇️ Muat Lebih Banyak"
+                    st.button(load_label, key=f"load_status_{status_type}", on_click=load_next_completion_page, args=(status_type,))
+                if page_state['rows']:
+                    st.caption(f"Menampilkan {len(page_state['rows'])} dari {total_assignments} penugasan.")
+                    st.dataframe(pd.DataFrame(page_state['rows']), use_container_width=True)
     
         # --- PERUBAHAN 2: Kode untuk Tab Unduh Data ---
         # --- PERUBAIKAN: Kode untuk Tab Unduh Data dengan Output Excel ---
         with admin_tab4:
             st.header("Unduh Data Hasil Review")
             st.info("Pilih tipe karyawan, proses data, lalu unduh file Excel (.xlsx) yang dihasilkan. Format ini lebih aman untuk data teks yang kompleks.")
+
+            snapshot = get_review_snapshot()
+            high_water_mark = snapshot.high_water_mark()
+            st.caption(
+                f"Data diambil dari snapshot lokal berisi {snapshot.count()} review"
+                + (f" (review terbaru: {high_water_mark.strftime('%Y-%m-%d %H:%M:%S')})" if high_water_mark else "")
+                + "; hanya review baru yang dibaca dari Firestore setiap kali data diproses."
+            )
+            if st.button("♻️ Bangun Ulang Snapshot", help="Jalankan setelah migrasi data yang mengubah atau menghapus review lama."):
+                with st.spinner("Menyalin ulang seluruh review..."):
+                    st.success(f"Snapshot dibangun ulang dari {snapshot.rebuild()} review.")
+                st.cache_data.clear()
     
             download_type = st.radio(
                 "Pilih tipe data untuk diunduh:",
@@ -891,11 +2501,16 @@ else:
                 key="download_type",
                 on_change=lambda: st.session_state.update(download_df=None) # Reset saat tipe diganti
             )
+            current_cycle_only = st.checkbox(
+                f"Hanya siklus saat ini (`{REVIEW_CYCLE_ID}`)",
+                value=True,
+                key="download_current_cycle",
+                on_change=lambda: st.session_state.update(download_df=None)
+            )
     
             if st.button(f"Proses Data Review Tipe '{download_type.capitalize()}'"):
                 with st.spinner(f"Mengambil dan memformat data '{download_type}'..."):
-                    # Panggil fungsi yang sama, tidak ada perubahan di sini
-                    df = prepare_review_data_for_download(download_type)
+                    df = prepare_review_data_for_download(download_type, REVIEW_CYCLE_ID if current_cycle_only else None)
                     if not df.empty:
                         st.session_state.download_df = df
                         st.success(f"Data berhasil diproses! Ditemukan {len(df)} record. Klik tombol di bawah untuk mengunduh.")
@@ -909,14 +2524,8 @@ else:
                 
                 st.dataframe(df_to_download.head(), use_container_width=True) # Tampilkan preview 5 baris pertama
                 
-                # --- PERUBAHAN UTAMA DI SINI ---
                 # 1. Konversi DataFrame ke format Excel di dalam memori (bytes)
-                from io import BytesIO
-                output = BytesIO()
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    df_to_download.to_excel(writer, index=False, sheet_name='Hasil Review')
-                excel_data = output.getvalue()
-                # --- AKHIR PERUBAHAN UTAMA ---
+                excel_data = build_review_excel(df_to_download)
     
                 # 2. Perbarui st.download_button untuk file Excel
                 st.download_button(
@@ -927,9 +2536,218 @@ else:
                    use_container_width=True
                 )
 
+        with admin_tab5:
+            st.header("Buat Rangkuman AI untuk Semua Karyawan")
+            st.info("Rangkuman dibuat sekali di sini dan disimpan di cache, sehingga karyawan langsung melihatnya saat membuka \"Lihat Hasil Saya\".")
 
+            if not ai_summary_available():
+                st.warning("Fitur rangkuman AI tidak tersedia. Mohon atur API Key Anda di file `config.py`.", icon="🔒")
+            else:
+                batch_type = st.radio("Pilih tipe karyawan:", ("office", "operator"), horizontal=True, key="summary_batch_type")
+                col1, col2 = st.columns(2)
+                with col1:
+                    max_workers = st.number_input("Jumlah pekerja paralel", min_value=1, max_value=8, value=4, key="summary_workers")
+                with col2:
+                    rate_per_minute = st.number_input("Batas permintaan per menit", min_value=1, max_value=600, value=30, key="summary_rate")
+
+                if st.button(f"✨ Buat Rangkuman Tipe '{batch_type.capitalize()}'"):
+                    bundles = get_summary_bundles(batch_type)
+                    if not bundles:
+                        st.info(f"Belum ada komentar review untuk tipe '{batch_type}'.")
+                    else:
+                        progress_bar = st.progress(0.0, text=f"0 / {len(bundles)} reviewee")
+                        results = pregenerate_summaries(
+                            bundles,
+                            max_workers=int(max_workers),
+                            rate_per_minute=int(rate_per_minute),
+                            on_progress=lambda done, total: progress_bar.progress(done / total, text=f"{done} / {total} reviewee")
+                        )
+                        status_labels = {'generated': "✅ Dibuat", 'cached': "♻️ Sudah Ada", 'error': "❌ Gagal"}
+                        user_names = ready_user_directory().names
+                        df_results = pd.DataFrame([
+                            {"Reviewee": user_names.get(uid, f"UID: {uid}"), "Status": status_labels[status], "Keterangan": detail}
+                            for uid, (status, detail) in results.items()
+                        ])
+                        failed = int((df_results['Status'] == status_labels['error']).sum())
+                        if failed:
+                            st.warning(f"{failed} rangkuman gagal dibuat. Jalankan ulang untuk mencoba lagi; rangkuman yang sudah ada tidak akan dibuat ulang.")
+                        else:
+                            st.success(f"Semua {len(results)} rangkuman siap.")
+                        st.dataframe(df_results, use_container_width=True)
+
+        with admin_tab6:
+            st.header("Impor Karyawan dari Spreadsheet")
+            import_type = st.radio("Pilih tipe karyawan:", ("office", "operator"), horizontal=True, key="import_type")
+            st.info(
+                "Unggah file CSV/XLSX dengan kolom: "
+                + ", ".join(f"`{col}`" for col in EMPLOYEE_IMPORT_COLUMNS[import_type])
+                + ". Kolom `Nama` akan menjadi Username dan `Unique Code` menjadi Password. "
+                "Impor aman dijalankan ulang: karyawan yang sudah terimpor akan dilewati."
+            )
+            uploaded_file = st.file_uploader("File karyawan", type=["csv", "xlsx"], key=f"import_file_{import_type}")
 
+            if uploaded_file is not None:
+                try:
+                    valid_rows, rejected_rows = validate_employee_rows(read_spreadsheet(uploaded_file), import_type)
+                except Exception as e:
+                    st.error(f"File tidak dapat diproses: {e}")
+                else:
+                    st.write(f"**{len(valid_rows)}** baris valid, **{len(rejected_rows)}** baris ditolak.")
+                    if rejected_rows:
+                        st.dataframe(pd.DataFrame(rejected_rows), use_container_width=True)
+
+                    if len(valid_rows) and st.button(f"🚀 Impor {len(valid_rows)} Karyawan {import_type.capitalize()}"):
+                        progress_bar = st.progress(0.0, text="Mengimpor karyawan...")
+                        report = rejected_rows + import_employees(
+                            valid_rows, import_type,
+                            on_progress=lambda done, total: progress_bar.progress(done / total, text="Mengimpor karyawan...")
+                        )
+                        df_report = pd.DataFrame(report).sort_values('Baris')
+                        st.success(f"Impor selesai: {(df_report['Status'] == '✅ Berhasil').sum()} karyawan baru terdaftar.")
+                        st.dataframe(df_report, use_container_width=True)
+                        st.download_button(
+                            label="📥 Unduh Laporan Impor (CSV)",
+                            data=df_report.to_csv(index=False).encode('utf-8'),
+                            file_name=f'laporan_impor_{import_type}_{pd.Timestamp.now().strftime("%Y%m%d_%H%M")}.csv',
+                            mime='text/csv'
+                        )
+
+        with admin_tab7:
+            st.header("Analitik Hasil Review Organisasi")
+            analytics_type = st.radio("Pilih tipe karyawan:", ("office", "operator"), horizontal=True, key="analytics_type")
+            analytics = get_review_analytics(analytics_type)
+
+            if analytics is None:
+                st.info(f"Belum ada data review untuk tipe '{analytics_type}'.")
+            else:
+                user_names = ready_user_directory().names
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Jumlah Review", analytics['total_reviews'])
+                col2.metric("Jumlah Skor", analytics['total_scores'])
+                col3.metric("Jumlah Reviewer", len(analytics['leniency']))
+
+                st.subheader("Rata-Rata & Simpangan Baku per Pertanyaan")
+                per_question = analytics['per_question'].rename(columns={'mean': "Rata-rata", 'std': "Simpangan Baku", 'count': "Jumlah"})
+                questions_by_key = get_question_catalog(analytics_type)
+                per_question.index = per_question.index.map(lambda key: resolve_question(str(key), analytics_type, questions_by_key).text)
+                st.dataframe(per_question.style.format({"Rata-rata": "{:.2f}", "Simpangan Baku": "{:.2f}"}), use_container_width=True)
+
+                st.subheader("Distribusi per Kelompok")
+                dimension = st.selectbox("Kelompokkan berdasarkan:", options=list(ANALYTICS_DIMENSIONS), format_func=ANALYTICS_DIMENSIONS.get, key="analytics_dimension")
+                by_dimension = analytics[dimension].rename(columns={'mean': "Rata-rata", 'std': "Simpangan Baku", 'count': "Jumlah Skor"})
+                st.bar_chart(by_dimension["Rata-rata"])
+                st.dataframe(by_dimension.style.format({"Rata-rata": "{:.2f}", "Simpangan Baku": "{:.2f}"}), use_container_width=True)
+                st.caption("Proporsi setiap nilai skor dalam kelompok:")
+                st.dataframe(analytics[f"{dimension}_distribution"].style.format("{:.0%}"), use_container_width=True)
+
+                st.subheader("Leniency Reviewer")
+                st.caption("Rata-rata z-score dari skor yang diberikan reviewer (dinormalisasi per pertanyaan). Positif = cenderung murah hati, negatif = cenderung ketat.")
+                leniency = analytics['leniency'].rename(columns={'mean': "Z-Score Rata-rata", 'count': "Jumlah Skor", 'reviews_given': "Jumlah Review"})
+                leniency.index = leniency.index.map(lambda uid: user_names.get(uid, f"UID: {uid}"))
+                st.dataframe(leniency.style.format({"Z-Score Rata-rata": "{:+.2f}"}), use_container_width=True)
+
+        with admin_tab8:
+            st.header("Diagnostik Firestore per Script Run")
+            st.caption("Dokumen dibaca/ditulis, round trip, dan waktu helper untuk setiap script run dan rerun fragment dari semua sesi sejak server dijalankan; operasi callback tombol dihitung ke run yang dipicunya. Pembacaan oleh listener (direktori pengguna & pertanyaan) dan thread latar belakang tidak termasuk.")
+            history = get_run_history()
+            with history['lock']:
+                runs = [stats.as_dict() for stats in history['runs'] if stats.duration is not None]
+
+            st.subheader("Resource Bersama (Cold Start)")
+            registry = get_resource_registry()
+            with registry['lock']:
+                resources = {name: dict(entry) for name, entry in registry['resources'].items()}
+                first_run_seconds = registry['first_run_seconds']
+            if first_run_seconds is not None:
+                st.metric("Durasi script run pertama di proses ini", f"{first_run_seconds:.2f} detik")
+            st.dataframe(pd.DataFrame([
+                {"Resource": name, "Dibuat": entry['created'], "Terakhir Dibuat": entry['created_at'].strftime('%Y-%m-%d %H:%M:%S'), "Durasi (s)": round(entry['seconds'], 3)}
+                for name, entry in resources.items()
+            ]), use_container_width=True, hide_index=True)
+            st.caption("Resource dibuat sekali per proses server dan dibuat ulang hanya jika health check-nya gagal; model Gemini baru dimuat saat rangkuman pertama diminta.")
+
+            if not runs:
+                st.info("Belum ada script run yang tercatat.")
+            else:
+                df_runs = pd.DataFrame(runs)
+                df_runs['page'] = df_runs['page'].fillna("-")
+                df_runs['over'] = df_runs['over_budget'].map(bool)
+
+                st.subheader("Ringkasan per Halaman")
+                per_page = df_runs.groupby('page').agg(
+                    runs=('reads', 'size'), reads_mean=('reads', 'mean'), reads_max=('reads', 'max'),
+                    round_trips_mean=('round_trips', 'mean'), duration_mean=('duration', 'mean'),
+                    duration_p95=('duration', lambda d: d.quantile(0.95)), over=('over', 'sum')
+                )
+                per_page['budget'] = per_page.index.map(lambda page: PAGE_BUDGETS.get(page, {}).get('reads'))
+                per_page = per_page.rename(columns={
+                    'runs': "Jumlah Run", 'reads_mean': "Rata-rata Read", 'reads_max': "Read Maks",
+                    'round_trips_mean': "Rata-rata Round Trip", 'duration_mean': "Rata-rata Durasi (s)",
+                    'duration_p95': "p95 Durasi (s)", 'over': "Melewati Batas", 'budget': "Batas Read"
+                })
+                st.dataframe(per_page.style.format(precision=2), use_container_width=True)
+
+                st.subheader("Waktu per Helper")
+                helper_rows = [
+                    {'helper': name, 'calls': entry['calls'], 'reads': entry['reads'], 'seconds': entry['seconds']}
+                    for run in runs for name, entry in run['helpers'].items()
+                ]
+                if helper_rows:
+                    per_helper = pd.DataFrame(helper_rows).groupby('helper').sum()
+                    per_helper['per_call'] = per_helper['seconds'] / per_helper['calls']
+                    per_helper = per_helper.sort_values('seconds', ascending=False).rename(columns={
+                        'calls': "Jumlah Panggilan", 'reads': "Dokumen Dibaca", 'seconds': "Total Waktu (s)", 'per_call': "Waktu per Panggilan (s)"
+                    })
+                    st.dataframe(per_helper.style.format({"Total Waktu (s)": "{:.3f}", "Waktu per Panggilan (s)": "{:.3f}"}), use_container_width=True)
+
+                st.subheader("Run Terakhir")
+                recent = df_runs.tail(50).iloc[::-1]
+                recent = pd.DataFrame({
+                    "Mulai": recent['started_at'], "Halaman": recent['page'], "Jenis": recent['kind'].map({'run': "Script run", 'fragment': "Fragment"}), "Read": recent['reads'], "Write": recent['writes'],
+                    "Round Trip": recent['round_trips'], "Durasi (s)": recent['duration'].round(3),
+                    "Melewati Batas": recent['over_budget'].map(lambda exceeded: "; ".join(exceeded))
+                })
+                st.dataframe(recent, use_container_width=True, hide_index=True)
 
+                st.download_button(
+                    label="📥 Unduh Statistik (JSON)",
+                    data=json.dumps({'budgets': PAGE_BUDGETS, 'runs': runs}, ensure_ascii=False, indent=2).encode('utf-8'),
+                    file_name=f'firestore_stats_{pd.Timestamp.now().strftime("%Y%m%d_%H%M")}.json',
+                    mime='application/json'
+                )
 
+            if st.button("🗑️ Kosongkan Riwayat", key="clear_run_history"):
+                with history['lock']:
+                    history['runs'].clear()
+                st.rerun()
 
+        with admin_tab9:
+            st.header("Hasil Ulasan Aplikasi")
+            if st.button("🔄 Muat Ulang Statistik", key="reload_feedback_stats"):
+                get_app_feedback_stats.clear()
 
+            feedback_stats = get_app_feedback_stats()
+            if not feedback_stats or not feedback_stats.get('total'):
+                st.info("Belum ada ulasan aplikasi yang masuk.")
+            else:
+                total_feedback = feedback_stats['total']
+                # Jumlah pengguna dari direktori pengguna in-process, tanpa membaca koleksi 'users'
+                user_count = len(ready_user_directory().users)
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Jumlah Ulasan", total_feedback)
+                col2.metric("Tingkat Respons", f"{total_feedback / user_count:.1%}" if user_count else "-", help=f"Dari {user_count} pengguna terdaftar.")
+                col3.metric("Rata-rata Kemudahan", f"{feedback_stats.get('rating_sum', 0) / total_feedback:.2f} / {max(FEEDBACK_RATING_LABELS)}")
+
+                st.subheader("Distribusi Tingkat Kemudahan")
+                rating_counts = feedback_stats.get('rating_counts', {})
+                distribution = pd.DataFrame({
+                    "Rating": [f"{rating} - {label}" for rating, label in FEEDBACK_RATING_LABELS.items()],
+                    "Jumlah": [rating_counts.get(str(rating), 0) for rating in FEEDBACK_RATING_LABELS],
+                }).set_index("Rating")
+                distribution["Persentase"] = distribution["Jumlah"] / total_feedback
+                st.bar_chart(distribution["Jumlah"])
+                st.dataframe(distribution.style.format({"Persentase": "{:.0%}"}), use_container_width=True)
+                st.caption(f"{feedback_stats.get('with_suggestion', 0)} dari {total_feedback} ulasan menyertakan saran tertulis.")
+
+# --- AKHIR SCRIPT RUN: catat statistik Firestore dan periksa batas halaman ---
+warn_over_budget(finish_run_stats(st.session_state.firestore_run_stats))
@@ -0,0 +1,173 @@
+# benchmarks/benchmark.py
+# Jalankan dari root repo: python benchmarks/benchmark.py [--scales 100 1000 10000] [--output hasil.json] [--compare baseline.json]
+# Mengukur waktu dan jumlah operasi Firestore helper utama app.py terhadap FakeFirestore berisi data sintetis.
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness
+
+DEFAULT_SCALES = [100, 1000, 10000]
+# Jumlah sampel untuk helper per pengguna (reviewer / reviewee) di setiap skala
+SAMPLES = 20
+# Ambang regresi untuk --compare: lebih lambat dari rasio ini, atau jumlah read bertambah
+SLOWDOWN_THRESHOLD = 1.25
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+def measure(client, func, samples=1):
+    """Menjalankan func sebanyak samples kali; mengembalikan (hasil terakhir, metrik rata-rata per panggilan)."""
+    durations, reads, writes, round_trips = [], [], [], []
+    result = None
+    for i in range(samples):
+        client.reset_stats()
+        started = time.perf_counter()
+        result = func(i)
+        durations.append(time.perf_counter() - started)
+        stats = client.stats()
+        reads.append(stats['reads'])
+        writes.append(stats['writes'])
+        round_trips.append(stats['round_trips'])
+    return result, {
+        'samples': samples, 'seconds': statistics.mean(durations), 'seconds_max': max(durations),
+        'reads': statistics.mean(reads), 'writes': statistics.mean(writes), 'round_trips': statistics.mean(round_trips)
+    }
+
+def run_results_page(client, reviewee_uid, user):
+    """Merender halaman "📊 Lihat Hasil Saya" lewat AppTest: run pertama (cache dingin) dan run kedua dengan semua penilaian dimuat."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(harness.APP_PATH, default_timeout=120)
+    harness.quiet_streamlit()
+    at.session_state.user_info = {'uid': reviewee_uid, 'email': user['email'], 'username': user['username'], 'nama': user['nama']}
+    at.run()
+    at.sidebar.radio[0].set_value("📊 Lihat Hasil Saya")
+    _, cold = measure(client, lambda i: at.run())
+    if at.exception:
+        raise RuntimeError(f"Halaman hasil gagal dirender: {at.exception[0].message}")
+    _, details = measure(client, lambda i: at.toggle(key="show_review_details").set_value(True).run())
+    return cold, details
+
+def run_cold_start(client, samples):
+    """
+    Halaman login lewat AppTest: run pertama dengan semua st.cache_resource kosong (cold start proses server)
+    dibanding rerun berikutnya, yang seharusnya tidak membuat ulang klien maupun resource bersama apa pun.
+    """
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    st.cache_resource.clear()
+    at = AppTest.from_file(harness.APP_PATH, default_timeout=120)
+    harness.quiet_streamlit()
+    _, cold = measure(client, lambda i: at.run())
+    if at.exception:
+        raise RuntimeError(f"Halaman login gagal dirender: {at.exception[0].message}")
+    _, rerun = measure(client, lambda i: at.run(), samples)
+    return cold, rerun
+
+def run_scale(employees, samples):
+    client = harness.new_client()
+    snapshot_path = os.path.join(tempfile.mkdtemp(prefix='review_snapshot_'), 'reviews_snapshot.sqlite')
+    app = harness.load_app(client, snapshot_path)
+    seeded = harness.seed_dataset(client, app, employees)
+    print(f"\n== {employees} karyawan: {seeded['assignments']} penugasan, {seeded['reviews']} review ==")
+
+    results = {'dataset': {key: seeded[key] for key in ('employees', 'assignments', 'reviews', 'aggregates')}}
+    # Direktori pengguna & cache pertanyaan dihangatkan dulu, seperti pada server yang sudah berjalan
+    _, results['warm_directory'] = measure(client, lambda i: (app.ready_user_directory(), app.get_compiled_questions('office')))
+
+    reviewers = list(seeded['users'])[:samples]
+    def assigned_reviewees(i):
+        app.st.session_state.user_lookup_cache = {}
+        return app.get_assigned_reviewees(reviewers[i % len(reviewers)])
+    _, results['get_assigned_reviewees'] = measure(client, assigned_reviewees, samples)
+
+    def reviewer_context(i):
+        app.st.session_state.user_lookup_cache = {}
+        return app.load_reviewer_context(reviewers[i % len(reviewers)])
+    _, results['load_reviewer_context'] = measure(client, reviewer_context, samples)
+
+    def completion_status(i):
+        app.get_review_completion_status.clear()
+        return app.get_review_completion_status('office')
+    _, results['get_review_completion_status'] = measure(client, completion_status, samples)
+
+    df, results['prepare_review_data_for_download_cold'] = measure(client, lambda i: app.prepare_review_data_for_download('office'))
+    _, results['prepare_review_data_for_download_warm'] = measure(client, lambda i: app.prepare_review_data_for_download('office'))
+    excel, results['build_review_excel'] = measure(client, lambda i: app.build_review_excel(df))
+    results['build_review_excel']['rows'] = len(df)
+    results['build_review_excel']['bytes'] = len(excel)
+
+    # Reviewee dengan penilaian terbanyak mewakili kasus terberat halaman hasil
+    aggregates = client.documents('review_aggregates')
+    reviewee_uid = max(aggregates, key=lambda uid: aggregates[uid]['review_count'])
+    results['results_page'], results['results_page_with_details'] = run_results_page(client, reviewee_uid, seeded['users'][reviewee_uid])
+    results['login_page_cold_start'], results['login_page_rerun'] = run_cold_start(client, samples)
+    return results
+
+def print_results(scale, results):
+    print(f"{'Kasus':<42}{'Waktu (ms)':>12}{'Read':>10}{'Write':>8}{'Round trip':>12}")
+    for case, metrics in results.items():
+        if case == 'dataset':
+            continue
+        print(f"{case:<42}{metrics['seconds'] * 1000:>12.1f}{metrics['reads']:>10.1f}{metrics['writes']:>8.1f}{metrics['round_trips']:>12.1f}")
+
+def compare(current, baseline_path, threshold):
+    """Membandingkan hasil dengan baseline; mengembalikan daftar regresi (lebih lambat dari threshold atau read bertambah)."""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = []
+    print(f"\n== Perbandingan dengan {baseline_path} ==")
+    for scale, results in current['scales'].items():
+        for case, metrics in results.items():
+            before = baseline.get('scales', {}).get(scale, {}).get(case)
+            if case == 'dataset' or not before:
+                continue
+            if before['samples'] != metrics['samples']:
+                print(f"{scale:>6} {case:<42} dilewati (jumlah sampel berbeda)")
+                continue
+            ratio = metrics['seconds'] / before['seconds'] if before['seconds'] else 1.0
+            read_delta = metrics['reads'] - before['reads']
+            flag = ""
+            if ratio > threshold or read_delta > 0:
+                flag = "  << REGRESI"
+                regressions.append((scale, case, ratio, read_delta))
+            print(f"{scale:>6} {case:<42} waktu x{ratio:.2f}  read {read_delta:+.1f}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark helper app.py terhadap FakeFirestore berisi data sintetis.")
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES, help="Jumlah karyawan per skala.")
+    parser.add_argument('--samples', type=int, default=SAMPLES, help="Jumlah sampel untuk helper per pengguna.")
+    parser.add_argument('--output', help="Path file JSON hasil (default: benchmarks/results/benchmark_<waktu>.json).")
+    parser.add_argument('--compare', help="File JSON hasil sebelumnya sebagai baseline.")
+    parser.add_argument('--threshold', type=float, default=SLOWDOWN_THRESHOLD, help="Rasio waktu yang dianggap regresi.")
+    args = parser.parse_args()
+
+    output = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'platform': platform.platform(), 'scales': {}
+    }
+    for employees in args.scales:
+        results = run_scale(employees, args.samples)
+        output['scales'][str(employees)] = results
+        print_results(employees, results)
+
+    output_path = args.output or os.path.join(RESULTS_DIR, f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(output, f, indent=2)
+    print(f"\nHasil disimpan ke {output_path}")
+
+    if args.compare and compare(output, args.compare, args.threshold):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# benchmarks/check_instrumentation.py
+# Jalankan dari root repo: python benchmarks/check_instrumentation.py [--employees 200]
+# Memastikan proxy InstrumentedFirestore di app.py mencatat read/write yang sama persis dengan yang ditagih FakeFirestore
+# untuk login, kirim review, dan halaman admin (semuanya lewat AppTest, termasuk run lanjutan setelah st.rerun).
+
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness
+from load_test import ReviewerSession
+
+DEFAULT_EMPLOYEES = 200
+ADMIN_USER = {'uid': 'admin', 'email': 'admin@performance.review', 'username': 'Data Rahsa', 'nama': 'Data Rahsa'}
+
+def app_run_history():
+    """
+    Riwayat FirestoreStats milik script yang dijalankan AppTest (modul '__main__'). get_run_history adalah st.cache_resource,
+    jadi dicari langsung di cache resource Streamlit; modul app hasil harness.load_app punya cache sendiri.
+    """
+    from streamlit.runtime.caching.cache_resource_api import _resource_caches
+    for cache in _resource_caches._function_caches.get(None, {}).values():
+        if cache.display_name == '__main__.get_run_history':
+            return next(iter(cache._mem_cache.values())).value
+    return {'runs': []}
+
+def measure_step(client, at, name, action):
+    """Menjalankan satu langkah AppTest; mengembalikan operasi menurut proxy (semua run baru) dan menurut FakeFirestore."""
+    before = {id(stats) for stats in app_run_history()['runs']}
+    client.reset_stats()
+    action()
+    if at.exception:
+        raise RuntimeError(f"{name}: {at.exception[0].message}")
+    billed = client.stats()
+    runs = [stats for stats in app_run_history()['runs'] if id(stats) not in before]
+    return {
+        'step': name, 'runs': len(runs),
+        'proxy': {'reads': sum(stats.reads for stats in runs), 'writes': sum(stats.writes for stats in runs)},
+        # Read listener on_snapshot tidak milik script run mana pun, jadi tidak tercatat di FirestoreStats
+        'fake': {'reads': billed['reads'] - billed['listener_reads'], 'writes': billed['writes']},
+    }
+
+def run_checks(employees):
+    from streamlit.testing.v1 import AppTest
+
+    client = harness.new_client()
+    app = harness.load_app(client, os.path.join(tempfile.mkdtemp(prefix='review_snapshot_'), 'reviews_snapshot.sqlite'))
+    seeded = harness.seed_dataset(client, app, employees)
+    reviewer_uid, reviewee_uid = seeded['pending'][0]
+    session = ReviewerSession(seeded['users'][reviewer_uid], [reviewee_uid], seeded['users'])
+    results = []
+
+    at = session.at = AppTest.from_file(harness.APP_PATH, default_timeout=120)
+    at.run()
+    harness.quiet_streamlit()
+    at.text_input[0].input(session.user['username'])
+    at.text_input[1].input("check")
+    login = next(button for button in at.button if button.label == "Login")
+    results.append(measure_step(client, at, 'login', lambda: login.click().run()))
+
+    select, _ = session.pending_names()
+    select.set_value(reviewee_uid).run()
+    session.fill_review_form(seeded['users'][reviewee_uid]['tipe_karyawan'])
+    submit = next(button for button in at.button if button.label == "Kirim Review")
+    results.append(measure_step(client, at, 'kirim_review', lambda: submit.click().run()))
+    if client.documents('reviews').get(app.review_id_for(app.REVIEW_CYCLE_ID, reviewer_uid, reviewee_uid)) is None:
+        raise RuntimeError("kirim_review: review tidak tersimpan")
+
+    admin = AppTest.from_file(harness.APP_PATH, default_timeout=120)
+    admin.session_state.user_info = ADMIN_USER
+    results.append(measure_step(client, admin, 'halaman_admin', admin.run))
+    harness.quiet_streamlit()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Membandingkan hitungan InstrumentedFirestore dengan tagihan FakeFirestore.")
+    parser.add_argument('--employees', type=int, default=DEFAULT_EMPLOYEES, help="Jumlah karyawan sintetis.")
+    args = parser.parse_args()
+
+    mismatches = 0
+    print(f"{'Langkah':<16}{'Run':>5}{'Read proxy':>12}{'Read fake':>11}{'Write proxy':>13}{'Write fake':>12}")
+    for result in run_checks(args.employees):
+        proxy, fake = result['proxy'], result['fake']
+        ok = proxy == fake and (proxy['reads'] or proxy['writes'])
+        mismatches += not ok
+        print(f"{result['step']:<16}{result['runs']:>5}{proxy['reads']:>12}{fake['reads']:>11}{proxy['writes']:>13}{fake['writes']:>12}"
+              f"{'' if ok else '  << TIDAK COCOK'}")
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,465 @@
+# benchmarks/fake_firestore.py
+# Pengganti Firestore di memori untuk benchmark & load test: mendukung subset API yang dipakai app.py
+# dan mencatat dokumen dibaca/ditulis serta round trip, dengan opsi latensi buatan per round trip.
+# Referensi, query, batch, dan transaksi memakai nama kelas Firestore asli, karena proxy InstrumentedFirestore
+# di app.py mencatat operasi berdasarkan nama kelas; harness.install_fake_firestore mendaftarkan kelas-kelas ini.
+
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+from google.api_core.exceptions import AlreadyExists, Aborted, InvalidArgument, NotFound
+from google.cloud.firestore_v1.transforms import DELETE_FIELD, Sentinel, Increment
+
+# Batas operasi per batched write / transaksi, sama dengan Firestore
+WRITE_LIMIT = 500
+
+class FakeChangeType:
+    def __init__(self, name):
+        self.name = name
+
+class FakeChange:
+    def __init__(self, type_name, document):
+        self.type = FakeChangeType(type_name)
+        self.document = document
+
+class FakeAggregationResult:
+    def __init__(self, alias, value):
+        self.alias = alias
+        self.value = value
+
+class FakeWatch:
+    def __init__(self, client, collection, callback):
+        self._client = client
+        self._collection = collection
+        self._callback = callback
+        self.is_active = True
+
+    def unsubscribe(self):
+        self.is_active = False
+        with self._client._lock:
+            self._client._listeners.discard(self)
+
+class FakeSnapshot:
+    """Setara DocumentSnapshot: id, reference, exists, to_dict(), get()."""
+
+    def __init__(self, reference, data, field_paths=None):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        if data is not None and field_paths is not None:
+            self._data = {key: value for key, value in data.items() if key in field_paths}
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        value = self._data
+        for part in field_path.split('.'):
+            value = value[part]
+        return value
+
+class DocumentReference:
+    def __init__(self, client, collection, doc_id):
+        self._client = client
+        self._collection = collection
+        self.id = doc_id
+        self.path = f"{collection}/{doc_id}"
+
+    def __eq__(self, other):
+        return isinstance(other, DocumentReference) and self.path == other.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def get(self, field_paths=None, transaction=None, **kwargs):
+        self._client._round_trip('DocumentReference.get', reads=1)
+        with self._client._lock:
+            data, version = self._client._read(self)
+        if transaction is not None:
+            transaction._track(self, version)
+        return FakeSnapshot(self, data, field_paths)
+
+    def set(self, data, merge=False):
+        self._client._commit_writes('DocumentReference.set', [('set', self, data, merge)])
+
+    def update(self, data):
+        self._client._commit_writes('DocumentReference.update', [('update', self, data, False)])
+
+    def create(self, data):
+        self._client._commit_writes('DocumentReference.create', [('create', self, data, False)])
+
+    def delete(self):
+        self._client._commit_writes('DocumentReference.delete', [('delete', self, None, False)])
+
+class Query:
+    """Query tak berubah (setiap method mengembalikan Query baru), dievaluasi dengan scan koleksi di memori."""
+
+    def __init__(self, client, collection, filters=(), orders=(), limit=None, cursor=None, projection=None):
+        self._client = client
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._cursor = cursor
+        self._projection = projection
+
+    def _copy(self, **changes):
+        state = {'filters': self._filters, 'orders': self._orders, 'limit': self._limit, 'cursor': self._cursor, 'projection': self._projection}
+        state.update(changes)
+        return Query(self._client, self._collection, **state)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction='ASCENDING'):
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, document_fields):
+        return self._copy(cursor=document_fields)
+
+    def select(self, field_paths):
+        return self._copy(projection=list(field_paths))
+
+    def count(self, alias=None):
+        return AggregationQuery(self, alias)
+
+    def _matches(self, doc_id, data):
+        for field_path, op_string, value in self._filters:
+            current = doc_id if field_path == '__name__' else data.get(field_path, _MISSING)
+            if current is _MISSING or not _compare(current, op_string, value):
+                return False
+        return True
+
+    def _evaluate(self):
+        with self._client._lock:
+            rows = [(doc_id, data, self._client._versions.get(f"{self._collection}/{doc_id}", 0))
+                    for doc_id, data in self._client._collections.get(self._collection, {}).items()
+                    if self._matches(doc_id, data)]
+        orders = self._orders or (('__name__', 'ASCENDING'),)
+        for field, direction in reversed(orders):
+            rows.sort(key=lambda row: _orderable(row[0] if field == '__name__' else row[1].get(field)), reverse=(direction == 'DESCENDING'))
+        if self._cursor is not None:
+            cursor = self._cursor
+            cursor_values = [cursor.id if field == '__name__' else cursor.to_dict().get(field) for field, _ in orders] \
+                if isinstance(cursor, FakeSnapshot) else [cursor.get(field) for field, _ in orders]
+            cursor_key = tuple(_orderable(value) for value in cursor_values)
+            rows = [row for row in rows if tuple(_orderable(row[0] if field == '__name__' else row[1].get(field)) for field, _ in orders) > cursor_key]
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        return rows
+
+    def stream(self, transaction=None, **kwargs):
+        rows = self._evaluate()
+        # Query ditagih minimal 1 read walau tidak ada hasil
+        self._client._round_trip('Query.stream', reads=max(len(rows), 1))
+        for doc_id, data, version in rows:
+            reference = DocumentReference(self._client, self._collection, doc_id)
+            if transaction is not None:
+                transaction._track(reference, version)
+            yield FakeSnapshot(reference, dict(data), self._projection)
+
+    def get(self, transaction=None, **kwargs):
+        return list(self.stream(transaction=transaction))
+
+    def on_snapshot(self, callback):
+        return self._client._listen(self._collection, callback)
+
+class CollectionReference(Query):
+    def __init__(self, client, name):
+        super().__init__(client, name)
+        self.id = name
+
+    def document(self, doc_id=None):
+        return DocumentReference(self._client, self._collection, doc_id or uuid.uuid4().hex[:20])
+
+    def list_documents(self):
+        with self._client._lock:
+            doc_ids = list(self._client._collections.get(self._collection, {}))
+        self._client._round_trip('CollectionReference.list_documents', reads=len(doc_ids))
+        return [DocumentReference(self._client, self._collection, doc_id) for doc_id in doc_ids]
+
+class AggregationQuery:
+    def __init__(self, query, alias):
+        self._query = query
+        self._alias = alias
+
+    def get(self, **kwargs):
+        rows = self._query._evaluate()
+        # count() ditagih 1 read per 1000 entri indeks, minimal 1
+        self._query._client._round_trip('AggregationQuery.get', reads=max(1, -(-len(rows) // 1000)))
+        return [[FakeAggregationResult(self._alias, len(rows))]]
+
+class WriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference, data, merge=False):
+        self._writes.append(('set', reference, data, merge))
+
+    def update(self, reference, data):
+        self._writes.append(('update', reference, data, False))
+
+    def create(self, reference, data):
+        self._writes.append(('create', reference, data, False))
+
+    def delete(self, reference):
+        self._writes.append(('delete', reference, None, False))
+
+    def commit(self):
+        return self._client._commit_writes('WriteBatch.commit', self._writes)
+
+class Transaction:
+    """Transaksi optimistis: versi dokumen yang dibaca diperiksa saat commit, bentrok menghasilkan Aborted (dicoba ulang oleh @firestore.transactional)."""
+
+    def __init__(self, client, max_attempts=5, read_only=False):
+        self._client = client
+        self._max_attempts = max_attempts
+        self._read_only = read_only
+        self._id = None
+        self._writes = []
+        self._read_versions = {}
+
+    @property
+    def in_progress(self):
+        return self._id is not None
+
+    def _track(self, reference, version):
+        self._read_versions.setdefault(reference.path, version)
+
+    def _clean_up(self):
+        self._id = None
+        self._writes = []
+        self._read_versions = {}
+
+    def _begin(self, retry_id=None):
+        self._client._round_trip('Transaction.begin')
+        self._id = uuid.uuid4().hex
+
+    def _rollback(self):
+        if self._id is not None:
+            self._client._round_trip('Transaction.rollback')
+        self._clean_up()
+
+    def _commit(self):
+        try:
+            return self._client._commit_writes('Transaction.commit', self._writes, self._read_versions)
+        finally:
+            self._clean_up()
+
+    def get(self, ref_or_query, **kwargs):
+        if isinstance(ref_or_query, DocumentReference):
+            return iter([ref_or_query.get(transaction=self)])
+        return ref_or_query.stream(transaction=self)
+
+    def get_all(self, references, **kwargs):
+        return self._client.get_all(references, transaction=self)
+
+    def set(self, reference, data, merge=False):
+        self._writes.append(('set', reference, data, merge))
+
+    def update(self, reference, data):
+        self._writes.append(('update', reference, data, False))
+
+    def create(self, reference, data):
+        self._writes.append(('create', reference, data, False))
+
+    def delete(self, reference):
+        self._writes.append(('delete', reference, None, False))
+
+class FakeFirestore:
+    """
+    Pengganti firestore.Client di memori. Penghitung 'reads', 'writes', 'round_trips' dan per-operasi bisa
+    dibaca lewat stats() dan dikosongkan dengan reset_stats(); latency menambahkan jeda per round trip.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self._lock = threading.RLock()
+        self._collections = {}
+        self._versions = {}
+        self._listeners = set()
+        self.reset_stats()
+
+    # --- API yang dipakai app.py ---
+
+    def collection(self, name):
+        return CollectionReference(self, name)
+
+    def document(self, path):
+        collection, doc_id = path.split('/', 1)
+        return DocumentReference(self, collection, doc_id)
+
+    def get_all(self, references, field_paths=None, transaction=None, **kwargs):
+        references = list(references)
+        self._round_trip('Client.get_all', reads=len(references))
+        for reference in references:
+            with self._lock:
+                data, version = self._read(reference)
+            if transaction is not None:
+                transaction._track(reference, version)
+            yield FakeSnapshot(reference, data, field_paths)
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def transaction(self, max_attempts=5, read_only=False):
+        return Transaction(self, max_attempts, read_only)
+
+    # --- Seed & statistik ---
+
+    def seed(self, collection, doc_id, data):
+        """Menulis dokumen langsung tanpa dihitung sebagai operasi (untuk menyiapkan data benchmark)."""
+        with self._lock:
+            self._collections.setdefault(collection, {})[doc_id] = _apply_transforms({}, data)
+            path = f"{collection}/{doc_id}"
+            self._versions[path] = self._versions.get(path, 0) + 1
+
+    def documents(self, collection):
+        with self._lock:
+            return {doc_id: dict(data) for doc_id, data in self._collections.get(collection, {}).items()}
+
+    def reset_stats(self):
+        with self._lock:
+            # 'listener_reads' (bagian dari 'reads') ditagih ke listener on_snapshot, bukan ke script run mana pun
+            self._stats = {'reads': 0, 'writes': 0, 'round_trips': 0, 'aborted': 0, 'listener_reads': 0, 'operations': Counter()}
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['operations'] = dict(self._stats['operations'])
+            return stats
+
+    # --- Internal ---
+
+    def _round_trip(self, operation, reads=0, writes=0):
+        with self._lock:
+            self._stats['reads'] += reads
+            self._stats['writes'] += writes
+            self._stats['round_trips'] += 1
+            self._stats['operations'][operation] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _read(self, reference):
+        data = self._collections.get(reference._collection, {}).get(reference.id)
+        return (dict(data) if data is not None else None), self._versions.get(reference.path, 0)
+
+    def _commit_writes(self, operation, writes, read_versions=None):
+        if len(writes) > WRITE_LIMIT:
+            raise InvalidArgument(f"maximum {WRITE_LIMIT} writes allowed per request")
+        self._round_trip(operation, writes=len(writes))
+        changes = []
+        with self._lock:
+            for path, version in (read_versions or {}).items():
+                if self._versions.get(path, 0) != version:
+                    self._stats['aborted'] += 1
+                    raise Aborted(f"Transaction contention on {path}")
+            # Prasyarat diperiksa dulu agar commit tetap atomik: satu tulisan gagal, tidak ada yang diterapkan
+            for action, reference, data, merge in writes:
+                existing = self._collections.get(reference._collection, {}).get(reference.id)
+                if action == 'create' and existing is not None:
+                    raise AlreadyExists(f"Document already exists: {reference.path}")
+                if action == 'update' and existing is None:
+                    raise NotFound(f"No document to update: {reference.path}")
+            for action, reference, data, merge in writes:
+                documents = self._collections.setdefault(reference._collection, {})
+                existing = documents.get(reference.id)
+                if action == 'delete':
+                    documents.pop(reference.id, None)
+                    changes.append((reference._collection, FakeChange('REMOVED', FakeSnapshot(reference, {}))))
+                else:
+                    base = existing if (merge or action == 'update') and existing is not None else {}
+                    documents[reference.id] = _apply_transforms(base, data, dotted=(action == 'update'), merge=merge)
+                    changes.append((reference._collection, FakeChange('MODIFIED' if existing is not None else 'ADDED', FakeSnapshot(reference, dict(documents[reference.id])))))
+                self._versions[reference.path] = self._versions.get(reference.path, 0) + 1
+            listeners = list(self._listeners)
+        self._notify(listeners, changes)
+        return [None] * len(writes)
+
+    def _listen(self, collection, callback):
+        watch = FakeWatch(self, collection, callback)
+        with self._lock:
+            documents = self._collections.get(collection, {})
+            snapshots = [FakeSnapshot(DocumentReference(self, collection, doc_id), dict(data)) for doc_id, data in documents.items()]
+            self._listeners.add(watch)
+            self._stats['reads'] += len(snapshots)
+            self._stats['listener_reads'] += len(snapshots)
+            self._stats['operations']['listen'] += 1
+        callback(snapshots, [FakeChange('ADDED', snapshot) for snapshot in snapshots], datetime.now(timezone.utc))
+        return watch
+
+    def _notify(self, listeners, changes):
+        for watch in listeners:
+            relevant = [change for collection, change in changes if collection == watch._collection]
+            if relevant and watch.is_active:
+                with self._lock:
+                    self._stats['reads'] += len(relevant)
+                    self._stats['listener_reads'] += len(relevant)
+                watch._callback([], relevant, datetime.now(timezone.utc))
+
+_MISSING = object()
+
+def _orderable(value):
+    """Kunci urut yang aman untuk nilai campuran (None di depan, lalu per tipe)."""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, datetime):
+        return (3, value)
+    return (4, str(value))
+
+def _compare(current, op_string, value):
+    if op_string == '==':
+        return current == value
+    if op_string == '!=':
+        return current != value
+    if op_string == 'in':
+        return current in value
+    if op_string == 'not-in':
+        return current not in value
+    if op_string == 'array_contains':
+        return value in (current or [])
+    if op_string == 'array_contains_any':
+        return any(item in (current or []) for item in value)
+    if _orderable(current)[0] != _orderable(value)[0]:
+        return False
+    return {'<': current < value, '<=': current <= value, '>': current > value, '>=': current >= value}[op_string]
+
+def _apply_transforms(base, data, dotted=False, merge=False):
+    """Menulis data ke salinan dokumen seperti server: SERVER_TIMESTAMP, Increment, DELETE_FIELD, dan map digabung jika merge=True."""
+    result = dict(base)
+    for key, value in data.items():
+        target, field = result, key
+        if dotted and '.' in key:
+            *parents, field = key.split('.')
+            for parent in parents:
+                target = target.setdefault(parent, {})
+        if value is DELETE_FIELD:
+            target.pop(field, None)
+        elif isinstance(value, Sentinel):
+            target[field] = datetime.now(timezone.utc)
+        elif isinstance(value, Increment):
+            target[field] = (target.get(field) or 0) + value.value
+        elif isinstance(value, dict):
+            # Transform di dalam map (mis. Increment pada histogram) juga diterapkan, seperti di server
+            existing = target.get(field) if merge and isinstance(target.get(field), dict) else {}
+            target[field] = _apply_transforms(existing, value, merge=merge)
+        else:
+            target[field] = value
+    return result
@@ -0,0 +1,148 @@
+# benchmarks/harness.py
+# Utilitas bersama benchmark & load test: memuat app.py dengan FakeFirestore dan mengisi data sintetis.
+
+import importlib.util
+import os
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+
+import firebase_admin
+from firebase_admin import firestore
+from google.cloud.firestore_v1 import aggregation
+
+import fake_firestore
+from fake_firestore import FakeFirestore
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT_DIR, 'app.py')
+
+# Komposisi data sintetis per karyawan
+OFFICE_RATIO = 0.7
+ASSIGNMENTS_PER_REVIEWER = 5
+COMPLETED_RATIO = 0.8
+OFFICE_QUESTIONS = 10
+OPERATOR_QUESTIONS = 6
+ORGANIZATIONS = ["Finance", "Marketing", "Operations", "HR", "Produksi", "Gudang"]
+JOB_LEVELS = ["Staff", "Senior Staff", "Supervisor", "Manager"]
+
+def quiet_streamlit():
+    """Meredam peringatan 'missing ScriptRunContext' dari mode bare; AppTest mengembalikan level log ke default, jadi panggil ulang sesudahnya."""
+    from streamlit import config
+    from streamlit.logger import set_log_level
+    config.get_config_options() # Parse config dulu; parsing belakangan akan mengembalikan level log dari 'logger.level'
+    set_log_level('error')
+
+def install_fake_firestore(client, snapshot_path):
+    """Mengarahkan firebase_admin ke FakeFirestore; berlaku juga untuk script yang dijalankan AppTest di proses yang sama."""
+    os.environ['REVIEW_SNAPSHOT_PATH'] = snapshot_path
+    firebase_admin.get_app = lambda *args, **kwargs: None
+    firestore.client = lambda *args, **kwargs: client
+    # InstrumentedFirestore._WRAPPED_TYPES dibaca dari nama-nama ini setiap app.py dieksekusi, jadi objek FakeFirestore
+    # ikut dibungkus proxy dan tercatat di FirestoreStats seperti objek Firestore asli
+    firestore.Client = FakeFirestore
+    for name in ('CollectionReference', 'DocumentReference', 'Query', 'WriteBatch', 'Transaction'):
+        setattr(firestore, name, getattr(fake_firestore, name))
+    aggregation.AggregationQuery = fake_firestore.AggregationQuery
+
+def load_app(client, snapshot_path):
+    """Mengeksekusi app.py sebagai modul (mode bare Streamlit) dengan FakeFirestore, lalu mengembalikan modulnya."""
+    import streamlit as st
+    quiet_streamlit()
+    install_fake_firestore(client, snapshot_path)
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    for key in list(st.session_state.keys()):
+        del st.session_state[key]
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+    spec = importlib.util.spec_from_file_location('app', APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # Di mode bare, st.form() menandai main_dg singleton sebagai form dan tidak pernah melepasnya;
+    # tanpa reset ini AppTest berikutnya di proses yang sama menganggap seluruh halaman berada di dalam form.
+    from streamlit.delta_generator_singletons import get_dg_singleton_instance
+    get_dg_singleton_instance().main_dg._form_data = None
+    return module
+
+def question_schema(employee_type, count):
+    """Dokumen review_questions/{tipe} dengan ID pertanyaan q1..qn."""
+    if employee_type == 'office':
+        questions = [f"Question {i} | Pertanyaan {i}" for i in range(1, count + 1)]
+    else:
+        questions = [f"Pertanyaan {i};Kurang;Cukup;Baik" for i in range(1, count + 1)]
+    question_ids = [f"q{i}" for i in range(1, count + 1)]
+    return {'questions': questions, 'question_ids': question_ids, 'catalog': dict(zip(question_ids, questions)), 'version': 1}
+
+def seed_dataset(client, app, employees, seed=42, cycle_id=None):
+    """
+    Mengisi FakeFirestore dengan karyawan sintetis beserta indeks username, pertanyaan, penugasan, review, dan agregat.
+    Mengembalikan dict ringkasan (uid per tipe, pasangan penugasan yang belum selesai, jumlah dokumen).
+    """
+    rng = random.Random(seed)
+    cycle_id = cycle_id or app.REVIEW_CYCLE_ID
+    schemas = {'office': question_schema('office', OFFICE_QUESTIONS), 'operator': question_schema('operator', OPERATOR_QUESTIONS)}
+    for employee_type, schema in schemas.items():
+        client.seed('review_questions', employee_type, schema)
+
+    users = {}
+    for i in range(employees):
+        employee_type = 'office' if rng.random() < OFFICE_RATIO else 'operator'
+        uid = f"uid{i:06d}"
+        nama = f"Karyawan {i:06d}"
+        data = {
+            'uid': uid, 'employee_id': f"E{i:06d}", 'nama': nama, 'username': nama, 'email': app.dummy_email_for(uid),
+            'tipe_karyawan': employee_type, 'job_position': rng.choice(["Analyst", "Officer", "Operator", "Admin"]),
+            'organization': rng.choice(ORGANIZATIONS), 'job_level': rng.choice(JOB_LEVELS), 'app_feedback_submitted': False
+        }
+        users[uid] = data
+        client.seed('users', uid, data)
+        client.seed('usernames', app.normalize_username(nama), app.username_index_entry(data))
+
+    uids = list(users)
+    by_type = {'office': [], 'operator': []}
+    for uid, data in users.items():
+        by_type[data['tipe_karyawan']].append(uid)
+
+    aggregates, pending, started = {}, [], datetime(2026, 1, 7, tzinfo=timezone.utc)
+    review_count = assignment_count = 0
+    for reviewer_uid in uids:
+        for reviewee_uid in rng.sample(uids, min(ASSIGNMENTS_PER_REVIEWER + 1, len(uids))):
+            if reviewee_uid == reviewer_uid:
+                continue
+            reviewee_type = users[reviewee_uid]['tipe_karyawan']
+            completed = rng.random() < COMPLETED_RATIO
+            assignment_id = app.assignment_id_for(reviewee_type, reviewer_uid, reviewee_uid)
+            client.seed('review_assignments', assignment_id, {
+                'reviewer_uid': reviewer_uid, 'reviewee_uid': reviewee_uid, 'assignment_type': reviewee_type, 'completed': completed,
+                'completed_cycle_id': cycle_id if completed else None
+            })
+            assignment_count += 1
+            if not completed:
+                pending.append((reviewer_uid, reviewee_uid))
+                continue
+            max_score = 5 if reviewee_type == 'office' else 3
+            responses = {question_id: rng.randint(1, max_score) for question_id in schemas[reviewee_type]['question_ids']}
+            responses['Komentar'] = f"Komentar sintetis {review_count} untuk {users[reviewee_uid]['nama']}."
+            if reviewee_type == 'office':
+                responses['Saran Pengembangan'] = "Mengikuti pelatihan lanjutan."
+            client.seed('reviews', app.review_id_for(cycle_id, reviewer_uid, reviewee_uid), {
+                'reviewer_uid': reviewer_uid, 'reviewee_uid': reviewee_uid, 'responses': responses,
+                'reviewee_type': reviewee_type, 'cycle_id': cycle_id, 'timestamp': started + timedelta(seconds=review_count)
+            })
+            previous = aggregates.get(reviewee_uid)
+            aggregates[reviewee_uid] = app.accumulate_review(previous, reviewee_uid, reviewee_type, responses)
+            # Review di-seed dari yang terlama, jadi entri baru ditaruh di depan seperti di submit_review_transaction
+            aggregates[reviewee_uid]['comments_bundle'] = app.cap_comments_bundle(app.build_comments_bundle([{'responses': responses}]) + (previous or {}).get('comments_bundle', ""))
+            review_count += 1
+
+    for reviewee_uid, aggregate in aggregates.items():
+        client.seed('review_aggregates', reviewee_uid, aggregate)
+
+    return {
+        'employees': employees, 'users': users, 'by_type': by_type, 'pending': pending,
+        'assignments': assignment_count, 'reviews': review_count, 'aggregates': len(aggregates)
+    }
+
+def new_client(latency=0.0):
+    return FakeFirestore(latency=latency)
@@ -0,0 +1,294 @@
+# benchmarks/load_test.py
+# Jalankan dari root repo: python benchmarks/load_test.py [--employees 1000] [--sessions 50] [--concurrency 10] [--latency-ms 20] [--output hasil.json]
+# Uji beban reviewer bersamaan: setiap sesi AppTest login, membuka "📝 Beri Review", memilih reviewee, lalu mengirim review.
+# Semua sesi berjalan di satu proses terhadap satu FakeFirestore, seperti sesi-sesi Streamlit di satu proses server.
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness
+
+DEFAULT_EMPLOYEES = 1000
+DEFAULT_SESSIONS = 50
+DEFAULT_CONCURRENCY = 10
+REVIEWS_PER_SESSION = 1
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+# Langkah per sesi, sesuai urutan yang dialami reviewer
+STEPS = ['buka_login', 'login', 'pilih_reviewee', 'kirim_review']
+COMMENT = "Karyawan ini menyelesaikan pekerjaannya dengan baik dan tepat waktu."
+SUGGESTION = "Mengikuti pelatihan lanjutan sesuai bidangnya."
+
+def prepare_concurrent_apptest():
+    """
+    AppTest dirancang untuk satu sesi per proses; tiga penyesuaian agar beberapa sesi bisa berjalan bersamaan:
+    - AppTest mengompilasi ulang app.py di setiap run, dan ast.parse di CPython 3.11 tidak aman dipanggil dari
+      beberapa thread sekaligus ("AST constructor recursion depth mismatch"). Bytecode dikompilasi sekali di bawah
+      lock lalu dipakai bersama semua sesi, seperti ScriptCache server Streamlit.
+    - Setiap run memasang mock Runtime global lalu mengosongkannya saat selesai, sehingga run lain yang masih berjalan
+      kehilangan Runtime-nya; mock terakhir dipertahankan sebagai cadangan.
+    - Setiap run menyalakan opsi 'global.appTest' dengan menambal config.get_option secara global selama run. Run yang
+      selesai lebih dulu mengembalikan get_option asli saat run lain masih berjalan, sehingga widget run itu tidak
+      menyimpan format_func-nya dan aksesnya gagal dengan KeyError '$$ID-...'. Opsi ini dinyalakan sekali untuk seluruh proses.
+    """
+    from streamlit import config
+    from streamlit.runtime.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test
+    from streamlit.testing.v1.util import build_mock_config_get_option
+
+    compile_lock = threading.Lock()
+    compiled = {}
+    get_bytecode = ScriptCache.get_bytecode
+    def shared_get_bytecode(self, script_path):
+        with compile_lock:
+            if script_path not in compiled:
+                compiled[script_path] = get_bytecode(self, script_path)
+            return compiled[script_path]
+    ScriptCache.get_bytecode = shared_get_bytecode
+
+    last_runtime = {'instance': None}
+    def current_runtime(cls):
+        if cls._instance is not None:
+            last_runtime['instance'] = cls._instance
+        return last_runtime['instance']
+    def instance(cls):
+        runtime = current_runtime(cls)
+        if runtime is None:
+            raise RuntimeError("Runtime hasn't been created!")
+        return runtime
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: current_runtime(cls) is not None)
+
+    config.get_option = build_mock_config_get_option({'global.appTest': True})
+    app_test.patch_config_options = lambda config_overrides: contextlib.nullcontext()
+
+def percentiles(values):
+    """p50/p95/p99 (detik) dari daftar durasi."""
+    if not values:
+        return {'count': 0}
+    if len(values) == 1:
+        cuts = [values[0]] * 99
+    else:
+        cuts = statistics.quantiles(values, n=100, method='inclusive')
+    return {'count': len(values), 'mean': statistics.mean(values), 'p50': cuts[49], 'p95': cuts[94], 'p99': cuts[98], 'max': max(values)}
+
+class AppFailure(Exception):
+    """Kegagalan yang berasal dari app.py (exception script, st.error, atau alur yang tidak sesuai), bukan dari harness uji."""
+
+class ReviewerSession:
+    """
+    Satu reviewer yang diperankan lewat AppTest; mencatat durasi per langkah. Jika client diberikan (sesi kalibrasi yang
+    berjalan sendirian), operasi Firestore per langkah juga dicatat dari penghitung FakeFirestore.
+    """
+
+    def __init__(self, user, reviewee_uids, users, client=None):
+        self.user = user
+        self.reviewee_uids = reviewee_uids
+        self.users = users
+        self.client = client
+        self.timings = []  # (langkah, detik, operasi Firestore atau None)
+        self.submitted = 0
+        self.error = None          # AppFailure: masalah app yang sebenarnya
+        self.harness_error = None  # Exception lain: masalah AppTest/harness, tidak memengaruhi kode keluar
+        self.at = None
+
+    def step(self, name, action):
+        if self.client:
+            self.client.reset_stats()
+        started = time.perf_counter()
+        action()
+        duration = time.perf_counter() - started
+        if self.at.exception:
+            raise AppFailure(f"{name}: {self.at.exception[0].message}")
+        operations = None
+        if self.client:
+            stats = self.client.stats()
+            operations = {key: stats[key] for key in ('reads', 'writes', 'round_trips')}
+        self.timings.append((name, duration, operations))
+
+    def button(self, step, label):
+        button = next((button for button in self.at.button if button.label == label), None)
+        if button is None:
+            raise AppFailure(f"{step}: tombol '{label}' tidak ditampilkan")
+        return button
+
+    def pending_names(self):
+        """Nama di dropdown reviewee; kosong jika semua penugasan sudah dinilai (dropdown tidak ditampilkan)."""
+        select = next((selectbox for selectbox in self.at.selectbox if selectbox.label.startswith("Pilih Karyawan")), None)
+        return (select, select.options) if select else (None, [])
+
+    def fill_review_form(self, reviewee_type):
+        for text_area in self.at.text_area:
+            text_area.input(SUGGESTION if text_area.label == 'dev_suggestion_office' else COMMENT)
+        if reviewee_type == 'operator':
+            for radio in self.at.radio:
+                if radio.key and radio.key.startswith('q_'):
+                    radio.set_value(random.choice(radio.options))
+        # Slider office dibiarkan di nilai default (3)
+
+    def run(self):
+        from streamlit.testing.v1 import AppTest
+        try:
+            self.at = AppTest.from_file(harness.APP_PATH, default_timeout=120)
+            self.step('buka_login', self.at.run)
+
+            username, password = self.at.text_input[0], self.at.text_input[1]
+            username.input(self.user['username'])
+            password.input("load-test")
+            login = self.button('login', "Login")
+            self.step('login', lambda: login.click().run())
+            if not self.at.session_state.user_info:
+                raise AppFailure("login: sesi tidak masuk")
+
+            for reviewee_uid in self.reviewee_uids:
+                select, names = self.pending_names()
+                if self.users[reviewee_uid]['nama'] not in names:
+                    raise AppFailure(f"pilih_reviewee: {reviewee_uid} tidak ada di daftar reviewee")
+                self.step('pilih_reviewee', lambda: select.set_value(reviewee_uid).run())
+                self.fill_review_form(self.users[reviewee_uid]['tipe_karyawan'])
+                submit = self.button('kirim_review', "Kirim Review")
+                self.step('kirim_review', lambda: submit.click().run())
+                errors = [element.value for element in self.at.error]
+                if errors:
+                    raise AppFailure(f"kirim_review: {errors[0]}")
+                if self.users[reviewee_uid]['nama'] in self.pending_names()[1]:
+                    raise AppFailure(f"kirim_review: {reviewee_uid} masih ada di daftar setelah dikirim")
+                self.submitted += 1
+        except AppFailure as e:
+            self.error = str(e)
+        except Exception as e:
+            self.harness_error = f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+        return self
+
+def check_consistency(client, cycle_id, seeded, submitted):
+    """Memastikan tidak ada review yang hilang atau tergandakan: jumlah review, agregat, dan penugasan selesai harus cocok."""
+    reviews = [review for review in client.documents('reviews').values() if review.get('cycle_id') == cycle_id]
+    aggregate_total = sum(aggregate.get('review_count', 0) for aggregate in client.documents('review_aggregates').values())
+    completed = sum(1 for assignment in client.documents('review_assignments').values() if assignment.get('completed_cycle_id') == cycle_id)
+    expected = seeded['reviews'] + submitted
+    return {
+        'reviews': len(reviews), 'aggregate_review_count': aggregate_total, 'completed_assignments': completed,
+        'expected': expected, 'ok': len(reviews) == aggregate_total == completed == expected
+    }
+
+def run_load_test(employees, sessions, concurrency, reviews_per_session, latency, seed=42):
+    client = harness.new_client()
+    snapshot_path = os.path.join(tempfile.mkdtemp(prefix='review_snapshot_'), 'reviews_snapshot.sqlite')
+    app = harness.load_app(client, snapshot_path)
+    seeded = harness.seed_dataset(client, app, employees, seed=seed)
+    client.latency = latency
+    prepare_concurrent_apptest()
+
+    pending = {}
+    for reviewer_uid, reviewee_uid in seeded['pending']:
+        pending.setdefault(reviewer_uid, []).append(reviewee_uid)
+    reviewers = sorted(pending)
+    random.Random(seed).shuffle(reviewers)
+    # Reviewer pertama dipakai untuk sesi kalibrasi, sisanya untuk sesi bersamaan
+    calibration_uid, reviewers = reviewers[0], reviewers[1:sessions + 1]
+    if len(reviewers) < sessions:
+        print(f"Hanya {len(reviewers)} reviewer dengan penugasan tertunda; jumlah sesi disesuaikan.")
+    print(f"== {employees} karyawan, {len(reviewers)} sesi, {concurrency} bersamaan, latensi {latency * 1000:.0f} ms ==")
+
+    # Sesi kalibrasi berjalan sendirian agar operasi Firestore per langkah bisa dihitung tepat;
+    # sekaligus menghangatkan cache bersama (direktori pengguna, skema pertanyaan) seperti server yang sudah berjalan.
+    calibration = ReviewerSession(seeded['users'][calibration_uid], pending[calibration_uid][:1], seeded['users'], client).run()
+    harness.quiet_streamlit()
+    if calibration.error or calibration.harness_error:
+        raise RuntimeError(f"Sesi kalibrasi gagal: {calibration.error or calibration.harness_error}")
+
+    sessions = [ReviewerSession(seeded['users'][uid], pending[uid][:reviews_per_session], seeded['users']) for uid in reviewers]
+    client.reset_stats()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        finished = list(executor.map(lambda session: session.run(), sessions))
+    wall = time.perf_counter() - started
+    totals = client.stats()
+    harness.quiet_streamlit()
+
+    submitted = sum(session.submitted for session in finished)
+    durations = {step: [] for step in STEPS}
+    for session in finished:
+        for step, duration, _ in session.timings:
+            durations[step].append(duration)
+    per_review = {key: (totals[key] / submitted if submitted else None) for key in ('reads', 'writes', 'round_trips')}
+    return {
+        'config': {'employees': employees, 'sessions': len(finished), 'concurrency': concurrency,
+                   'reviews_per_session': reviews_per_session, 'latency_ms': latency * 1000},
+        'wall_seconds': wall, 'submitted_reviews': submitted,
+        'throughput_reviews_per_second': submitted / wall if wall else None,
+        'steps': {step: percentiles(durations[step]) for step in STEPS},
+        'firestore': {
+            'per_step': {step: operations for step, _, operations in calibration.timings},
+            'totals': totals, 'per_submitted_review': per_review
+        },
+        'failures': [{'reviewer_uid': session.user['uid'], 'error': session.error} for session in finished if session.error],
+        'harness_errors': [{'reviewer_uid': session.user['uid'], 'error': session.harness_error} for session in finished if session.harness_error],
+        'consistency': check_consistency(client, app.REVIEW_CYCLE_ID, seeded, submitted + calibration.submitted),
+    }
+
+def print_report(report):
+    print(f"\nReview terkirim: {report['submitted_reviews']} dalam {report['wall_seconds']:.1f} detik "
+          f"({report['throughput_reviews_per_second'] or 0:.2f} review/detik)")
+    per_step = report['firestore']['per_step']
+    print(f"{'Langkah':<18}{'n':>6}{'p50 (ms)':>11}{'p95 (ms)':>11}{'p99 (ms)':>11}{'maks (ms)':>11}{'Read':>8}{'Write':>8}{'Round trip':>12}")
+    for step, metrics in report['steps'].items():
+        if not metrics['count']:
+            continue
+        operations = per_step.get(step, {'reads': 0, 'writes': 0, 'round_trips': 0})
+        print(f"{step:<18}{metrics['count']:>6}{metrics['p50'] * 1000:>11.0f}{metrics['p95'] * 1000:>11.0f}"
+              f"{metrics['p99'] * 1000:>11.0f}{metrics['max'] * 1000:>11.0f}"
+              f"{operations['reads']:>8}{operations['writes']:>8}{operations['round_trips']:>12}")
+    firestore = report['firestore']
+    if report['submitted_reviews']:
+        per_review = firestore['per_submitted_review']
+        print(f"Firestore per review terkirim (seluruh alur, di bawah beban): {per_review['reads']:.1f} read, {per_review['writes']:.1f} write, "
+              f"{per_review['round_trips']:.1f} round trip; transaksi diulang: {firestore['totals']['aborted']}")
+    consistency = report['consistency']
+    print(f"Konsistensi: {consistency['reviews']} review, {consistency['aggregate_review_count']} di agregat, "
+          f"{consistency['completed_assignments']} penugasan selesai (harapan {consistency['expected']}) -> {'OK' if consistency['ok'] else 'TIDAK COCOK'}")
+    for failure in report['failures']:
+        print(f"GAGAL {failure['reviewer_uid']}: {failure['error']}")
+    # Galat harness (AppTest) dilaporkan terpisah; sesi itu berhenti lebih awal tetapi review yang sudah terkirim tetap ikut dicek konsistensinya
+    for failure in report['harness_errors']:
+        print(f"GALAT HARNESS {failure['reviewer_uid']}: {failure['error']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Uji beban reviewer bersamaan terhadap app.py dengan AppTest dan FakeFirestore.")
+    parser.add_argument('--employees', type=int, default=DEFAULT_EMPLOYEES, help="Jumlah karyawan sintetis.")
+    parser.add_argument('--sessions', type=int, default=DEFAULT_SESSIONS, help="Jumlah sesi reviewer.")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="Jumlah sesi yang berjalan bersamaan.")
+    parser.add_argument('--reviews-per-session', type=int, default=REVIEWS_PER_SESSION, help="Review yang dikirim tiap sesi.")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Latensi buatan per round trip Firestore (ms).")
+    parser.add_argument('--output', help="Path file JSON hasil (default: benchmarks/results/load_test_<waktu>.json).")
+    args = parser.parse_args()
+
+    report = run_load_test(args.employees, args.sessions, args.concurrency, args.reviews_per_session, args.latency_ms / 1000)
+    report.update({'generated_at': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(), 'platform': platform.platform()})
+    print_report(report)
+
+    output_path = args.output or os.path.join(RESULTS_DIR, f"load_test_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nHasil disimpan ke {output_path}")
+
+    if report['failures'] or not report['consistency']['ok']:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
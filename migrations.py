@@ -0,0 +1,351 @@
+# migrations.py
+# Jalankan dengan: python migrations.py <perintah> [--dry-run] [--credentials service-account.json]
+# Tanpa --credentials, kredensial dibaca dari [firebase_credentials] di .streamlit/secrets.toml
+
+import argparse
+from datetime import datetime, timezone
+import firebase_admin
+from firebase_admin import credentials, firestore
+
+# Batas jumlah operasi tulis per batched write Firestore
+BATCH_LIMIT = 500
+# Siklus yang diberikan ke review lama tanpa 'cycle_id' (samakan dengan REVIEW_CYCLE_ID di app.py)
+DEFAULT_CYCLE_ID = "2025-H2"
+# Batas bundel komentar di agregat (samakan dengan SUMMARY_BUNDLE_MAX_REVIEWS & SUMMARY_BUNDLE_MAX_CHARS di app.py)
+SUMMARY_BUNDLE_MAX_REVIEWS = 200
+SUMMARY_BUNDLE_MAX_CHARS = 200_000
+
+def init_db(credentials_path=None):
+    """Menginisialisasi Firebase Admin dengan kredensial yang sama seperti app.py."""
+    if credentials_path:
+        cred = credentials.Certificate(credentials_path)
+    else:
+        import streamlit as st
+        creds_dict = dict(st.secrets["firebase_credentials"])
+        if 'private_key' in creds_dict:
+            creds_dict['private_key'] = creds_dict['private_key'].replace('\\n', '\n')
+        cred = credentials.Certificate(creds_dict)
+    firebase_admin.initialize_app(cred)
+    return firestore.client()
+
+def commit_in_batches(db, operations, dry_run=False):
+    """Menjalankan daftar (ref, data) sebagai update dalam batched write berisi maksimal BATCH_LIMIT operasi."""
+    if dry_run:
+        return len(operations)
+    for start in range(0, len(operations), BATCH_LIMIT):
+        batch = db.batch()
+        for ref, data in operations[start:start + BATCH_LIMIT]:
+            batch.update(ref, data)
+        batch.commit()
+    return len(operations)
+
+# --- PERINTAH MIGRASI ---
+
+def backfill_completion(db, dry_run=False):
+    """
+    Mengisi 'completed' dan 'completed_cycle_id' (siklus terbaru yang reviewnya sudah masuk) pada penugasan
+    berdasarkan review yang ada; app.py menghitung penugasan selesai dengan membandingkan completed_cycle_id ke REVIEW_CYCLE_ID.
+    """
+    completed_cycles = {}
+    for doc in db.collection('reviews').select(['reviewer_uid', 'reviewee_uid', 'cycle_id']).stream():
+        data = doc.to_dict()
+        pair = (data.get('reviewer_uid'), data.get('reviewee_uid'))
+        completed_cycles[pair] = max(completed_cycles.get(pair, ''), data.get('cycle_id') or DEFAULT_CYCLE_ID)
+
+    operations = []
+    for doc in db.collection('review_assignments').stream():
+        data = doc.to_dict()
+        completed_cycle_id = completed_cycles.get((data.get('reviewer_uid'), data.get('reviewee_uid')))
+        if data.get('completed') != bool(completed_cycle_id) or data.get('completed_cycle_id') != completed_cycle_id:
+            operations.append((doc.reference, {'completed': bool(completed_cycle_id), 'completed_cycle_id': completed_cycle_id}))
+
+    count = commit_in_batches(db, operations, dry_run)
+    print(f"{count} penugasan {'akan' if dry_run else 'telah'} diperbarui.")
+
+def backfill_review_type(db, dry_run=False, cycle_id=DEFAULT_CYCLE_ID):
+    """Mengisi 'reviewee_type' dan 'cycle_id' pada review lama agar ekspor bisa difilter di sisi server."""
+    user_types = {doc.id: doc.to_dict().get('tipe_karyawan') for doc in db.collection('users').select(['tipe_karyawan']).stream()}
+
+    operations, orphaned = [], 0
+    for doc in db.collection('reviews').select(['reviewee_uid', 'reviewee_type', 'cycle_id']).stream():
+        data = doc.to_dict()
+        updates = {}
+        if not data.get('reviewee_type'):
+            reviewee_type = user_types.get(data.get('reviewee_uid'))
+            if reviewee_type:
+                updates['reviewee_type'] = reviewee_type
+            else:
+                orphaned += 1 # Reviewee sudah dihapus, tipe tidak diketahui
+        if not data.get('cycle_id'):
+            updates['cycle_id'] = cycle_id
+        if updates:
+            operations.append((doc.reference, updates))
+
+    count = commit_in_batches(db, operations, dry_run)
+    print(f"{count} review {'akan' if dry_run else 'telah'} diperbarui.")
+    if orphaned:
+        print(f"{orphaned} review dilewati karena reviewee tidak ditemukan di koleksi 'users'.")
+
+def normalize_username(username):
+    """Sama dengan normalize_username di app.py."""
+    return " ".join(username.split()).lower().replace('/', '_')
+
+def backfill_usernames(db, dry_run=False):
+    """Membuat indeks usernames/{username_ternormalisasi} untuk pengguna lama; username bentrok dilaporkan, tidak ditulis."""
+    by_username = {}
+    for doc in db.collection('users').select(['uid', 'username', 'nama', 'email']).stream():
+        data = doc.to_dict()
+        if data.get('username'):
+            by_username.setdefault(normalize_username(data['username']), []).append((doc.id, data))
+
+    existing = {ref.id for ref in db.collection('usernames').list_documents()}
+    writes, conflicts = [], []
+    for key, users in by_username.items():
+        if len(users) > 1:
+            conflicts.append((key, [uid for uid, _ in users]))
+            continue
+        if key in existing:
+            continue
+        uid, data = users[0]
+        writes.append((db.collection('usernames').document(key), {
+            'uid': data.get('uid', uid), 'username': data['username'],
+            'nama': data.get('nama'), 'email': data.get('email')
+        }))
+
+    if not dry_run:
+        for start in range(0, len(writes), BATCH_LIMIT):
+            batch = db.batch()
+            for ref, data in writes[start:start + BATCH_LIMIT]:
+                batch.create(ref, data)
+            batch.commit()
+    print(f"{len(writes)} entri indeks username {'akan' if dry_run else 'telah'} dibuat.")
+    for key, uids in conflicts:
+        print(f"Username bentrok '{key}': {', '.join(uids)} (perbaiki manual, lalu jalankan ulang).")
+
+def rekey_assignments(db, dry_run=False):
+    """Memindahkan penugasan lama (ID acak) ke ID deterministik {tipe}_{reviewer}_{reviewee}; duplikat digabung."""
+    groups = {}
+    for doc in db.collection('review_assignments').stream():
+        data = doc.to_dict()
+        new_id = f"{data.get('assignment_type')}_{data.get('reviewer_uid')}_{data.get('reviewee_uid')}"
+        groups.setdefault(new_id, []).append((doc, data))
+
+    operations = [] # (aksi, ref, data)
+    for new_id, docs in groups.items():
+        if len(docs) == 1 and docs[0][0].id == new_id:
+            continue
+        merged = dict(docs[0][1])
+        merged['completed'] = any(data.get('completed') for _, data in docs)
+        merged['completed_cycle_id'] = max((data.get('completed_cycle_id') for _, data in docs if data.get('completed_cycle_id')), default=None)
+        operations.append(('set', db.collection('review_assignments').document(new_id), merged))
+        operations.extend(('delete', doc.reference, None) for doc, _ in docs if doc.id != new_id)
+
+    if not dry_run:
+        for start in range(0, len(operations), BATCH_LIMIT):
+            batch = db.batch()
+            for action, ref, data in operations[start:start + BATCH_LIMIT]:
+                if action == 'set':
+                    batch.set(ref, data)
+                else:
+                    batch.delete(ref)
+            batch.commit()
+    moved = sum(1 for action, _, _ in operations if action == 'delete')
+    print(f"{moved} penugasan lama {'akan' if dry_run else 'telah'} dipindahkan ke ID deterministik.")
+
+def rekey_reviews(db, dry_run=False):
+    """
+    Memindahkan review lama (ID acak) ke ID deterministik {siklus}_{reviewer}_{reviewee} (sama dengan review_id_for di app.py).
+    Duplikat untuk pasangan & siklus yang sama digabung: review dengan timestamp terbaru yang dipertahankan.
+    """
+    groups, missing_cycle = {}, 0
+    for doc in db.collection('reviews').stream():
+        data = doc.to_dict()
+        if not data.get('cycle_id'):
+            missing_cycle += 1 # Jalankan backfill-review-type dulu
+            continue
+        new_id = f"{data['cycle_id']}_{data.get('reviewer_uid')}_{data.get('reviewee_uid')}"
+        groups.setdefault(new_id, []).append((doc, data))
+
+    operations, duplicates = [], 0 # (aksi, ref, data)
+    for new_id, docs in groups.items():
+        if len(docs) == 1 and docs[0][0].id == new_id:
+            continue
+        duplicates += len(docs) - 1
+        _, newest = max(docs, key=lambda item: item[1].get('timestamp') or datetime.min.replace(tzinfo=timezone.utc))
+        operations.append(('set', db.collection('reviews').document(new_id), newest))
+        operations.extend(('delete', doc.reference, None) for doc, _ in docs if doc.id != new_id)
+
+    if not dry_run:
+        for start in range(0, len(operations), BATCH_LIMIT):
+            batch = db.batch()
+            for action, ref, data in operations[start:start + BATCH_LIMIT]:
+                if action == 'set':
+                    batch.set(ref, data)
+                else:
+                    batch.delete(ref)
+            batch.commit()
+    moved = sum(1 for action, _, _ in operations if action == 'delete')
+    print(f"{moved} review lama {'akan' if dry_run else 'telah'} dipindahkan ke ID deterministik ({duplicates} duplikat digabung).")
+    if missing_cycle:
+        print(f"{missing_cycle} review dilewati karena 'cycle_id' kosong; jalankan 'backfill-review-type' lalu ulangi.")
+    if duplicates and not dry_run:
+        print("Jalankan 'rebuild-aggregates' agar agregat tidak lagi menghitung duplikat.")
+
+def comments_entry(responses):
+    """Satu entri bundel komentar untuk rangkuman AI (sama dengan build_comments_bundle di app.py)."""
+    comments = {k: v for k, v in responses.items() if isinstance(v, str)}
+    if not comments:
+        return ""
+    entry = ""
+    comment_text = comments.get('Komentar') or comments.get('Komentar Umum')
+    if comment_text:
+        entry += f"- Komentar: {comment_text}\n"
+    if 'Saran Pengembangan' in comments:
+        entry += f"- Saran Pengembangan: {comments['Saran Pengembangan']}\n"
+    return entry + "---\n"
+
+def rebuild_aggregates(db, dry_run=False):
+    """
+    Menghitung ulang review_aggregates/{reviewee_uid} dari seluruh review (sama dengan accumulate_review di app.py),
+    termasuk bundel komentar terbaru-dulu yang dipakai halaman hasil untuk mencari rangkuman AI di cache.
+    """
+    aggregates = {}
+    reviews = [doc.to_dict() for doc in db.collection('reviews').stream()]
+    reviews.sort(key=lambda data: data.get('timestamp') or datetime.min.replace(tzinfo=timezone.utc), reverse=True)
+    for data in reviews:
+        aggregate = aggregates.setdefault(data.get('reviewee_uid'), {
+            'reviewee_uid': data.get('reviewee_uid'), 'reviewee_type': data.get('reviewee_type'),
+            'review_count': 0, 'questions': {}, 'score_sum': 0, 'score_count': 0, 'comments_bundle': "", 'bundle_entries': 0
+        })
+        aggregate['review_count'] += 1
+        # Review sudah terurut terbaru dulu, jadi cukup berhenti menambah entri saat batas tercapai (sama dengan cap_comments_bundle di app.py)
+        entry = comments_entry(data.get('responses', {}))
+        if entry and aggregate['bundle_entries'] < SUMMARY_BUNDLE_MAX_REVIEWS:
+            if len(aggregate['comments_bundle']) + len(entry) <= SUMMARY_BUNDLE_MAX_CHARS:
+                aggregate['comments_bundle'] += entry
+                aggregate['bundle_entries'] += 1
+            else:
+                aggregate['bundle_entries'] = SUMMARY_BUNDLE_MAX_REVIEWS
+        for question, score in data.get('responses', {}).items():
+            if isinstance(score, (int, float)):
+                stats = aggregate['questions'].setdefault(question, {'sum': 0, 'count': 0, 'sum_sq': 0})
+                stats['sum'] += score
+                stats['count'] += 1
+                stats['sum_sq'] += score * score
+                aggregate['score_sum'] += score
+                aggregate['score_count'] += 1
+
+    if not dry_run:
+        items = list(aggregates.items())
+        for start in range(0, len(items), BATCH_LIMIT):
+            batch = db.batch()
+            for reviewee_uid, aggregate in items[start:start + BATCH_LIMIT]:
+                del aggregate['bundle_entries']
+                aggregate['overall_average'] = aggregate['score_sum'] / aggregate['score_count'] if aggregate['score_count'] else None
+                aggregate['updated_at'] = firestore.SERVER_TIMESTAMP
+                batch.set(db.collection('review_aggregates').document(reviewee_uid), aggregate)
+            batch.commit()
+    print(f"{len(aggregates)} dokumen agregat reviewee {'akan' if dry_run else 'telah'} ditulis ulang.")
+
+def rebuild_feedback_stats(db, dry_run=False):
+    """Menghitung ulang app_feedback_stats/summary dari seluruh app_feedback (sama dengan submit_app_feedback_transaction di app.py)."""
+    stats = {'total': 0, 'rating_sum': 0, 'rating_counts': {}, 'with_suggestion': 0}
+    for doc in db.collection('app_feedback').select(['ease_of_use_rating', 'suggestion']).stream():
+        data = doc.to_dict()
+        rating = data.get('ease_of_use_rating')
+        if not isinstance(rating, int):
+            continue
+        stats['total'] += 1
+        stats['rating_sum'] += rating
+        stats['rating_counts'][str(rating)] = stats['rating_counts'].get(str(rating), 0) + 1
+        if (data.get('suggestion') or '').strip():
+            stats['with_suggestion'] += 1
+
+    if not dry_run:
+        stats['updated_at'] = firestore.SERVER_TIMESTAMP
+        db.collection('app_feedback_stats').document('summary').set(stats)
+    print(f"Statistik ulasan aplikasi {'akan' if dry_run else 'telah'} ditulis ulang dari {stats['total']} ulasan.")
+
+def next_question_id(catalog):
+    """Sama dengan next_question_id di app.py."""
+    numbers = [int(key[1:]) for key in catalog if key[1:].isdigit()]
+    return f"q{max(numbers, default=0) + 1}"
+
+def compact_question_ids(db, dry_run=False):
+    """
+    Memberi ID pendek (q1, q2, ...) pada review_questions lalu mengganti key 'responses' review lama (teks pertanyaan lengkap)
+    dengan ID tersebut. Teks pertanyaan yang sudah dihapus dari daftar masuk katalog sebagai ID baru agar jawabannya tidak hilang.
+    """
+    schemas = {}
+    for doc in db.collection('review_questions').stream():
+        data = doc.to_dict()
+        questions = data.get('questions', [])
+        catalog = dict(data.get('catalog', {}))
+        question_ids = list(data.get('question_ids', []))
+        if len(question_ids) != len(questions):
+            text_to_id = {text: key for key, text in catalog.items()}
+            question_ids = []
+            for text in questions:
+                question_id = text_to_id.get(text) or next_question_id(catalog)
+                catalog[question_id] = text
+                question_ids.append(question_id)
+        schemas[doc.id] = {'ref': doc.reference, 'questions': questions, 'question_ids': question_ids, 'catalog': catalog}
+
+    operations, skipped = [], 0
+    for doc in db.collection('reviews').select(['reviewee_type', 'responses']).stream():
+        data = doc.to_dict()
+        schema = schemas.get(data.get('reviewee_type'))
+        if not schema:
+            skipped += 1 # Tanpa 'reviewee_type' (jalankan backfill-review-type dulu) atau tipe tanpa daftar pertanyaan
+            continue
+        catalog = schema['catalog']
+        text_to_id = {text: key for key, text in catalog.items()}
+        responses, changed = {}, False
+        for key, value in data.get('responses', {}).items():
+            if isinstance(value, (int, float)) and key not in catalog:
+                if key not in text_to_id:
+                    text_to_id[key] = next_question_id(catalog)
+                    catalog[text_to_id[key]] = key
+                key, changed = text_to_id[key], True
+            responses[key] = value
+        if changed:
+            operations.append((doc.reference, {'responses': responses}))
+
+    if not dry_run:
+        for schema in schemas.values():
+            schema['ref'].set({
+                'questions': schema['questions'], 'question_ids': schema['question_ids'], 'catalog': schema['catalog'],
+                'version': firestore.Increment(1)
+            }, merge=True)
+    count = commit_in_batches(db, operations, dry_run)
+    print(f"{len(schemas)} daftar pertanyaan dan {count} review {'akan' if dry_run else 'telah'} diperbarui ke ID pertanyaan.")
+    if skipped:
+        print(f"{skipped} review dilewati karena 'reviewee_type' kosong atau tidak punya daftar pertanyaan.")
+    if count and not dry_run:
+        print("Jalankan 'rebuild-aggregates' agar agregat memakai ID pertanyaan yang sama.")
+
+COMMANDS = {
+    'backfill-completion': backfill_completion,
+    'backfill-review-type': backfill_review_type,
+    'backfill-usernames': backfill_usernames,
+    'rekey-assignments': rekey_assignments,
+    'rekey-reviews': rekey_reviews,
+    'rebuild-aggregates': rebuild_aggregates,
+    'compact-question-ids': compact_question_ids,
+    'rebuild-feedback-stats': rebuild_feedback_stats,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrasi/backfill data Firestore Aplikasi Performance Review.")
+    parser.add_argument('command', choices=sorted(COMMANDS))
+    parser.add_argument('--dry-run', action='store_true', help="Hanya tampilkan jumlah perubahan, tanpa menulis.")
+    parser.add_argument('--credentials', help="Path file JSON service account (opsional).")
+    parser.add_argument('--cycle-id', default=DEFAULT_CYCLE_ID, help="Siklus untuk review lama tanpa 'cycle_id' (backfill-review-type).")
+    args = parser.parse_args()
+
+    db = init_db(args.credentials)
+    options = {'cycle_id': args.cycle_id} if args.command == 'backfill-review-type' else {}
+    COMMANDS[args.command](db, dry_run=args.dry_run, **options)
+
+if __name__ == '__main__':
+    main()